@@ -3,6 +3,8 @@ from pydantic import BaseModel
 from typing import List, Optional
 from datetime import datetime
 
+from app.services.ids import new_id
+
 router = APIRouter()
 
 class AlertCreate(BaseModel):
@@ -22,7 +24,7 @@ class AlertResponse(BaseModel):
 @router.post("/", response_model=AlertResponse)
 async def create_alert(alert: AlertCreate):
     return {
-        "id": f"ALT{datetime.now().strftime('%Y%m%d%H%M%S')}",
+        "id": new_id("ALT"),
         "type": alert.type,
         "location": alert.location,
         "severity": alert.severity,
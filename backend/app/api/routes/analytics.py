@@ -1,19 +1,20 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel
 from typing import List
-from datetime import datetime
 
 router = APIRouter()
 
+
+def _get_snapshots(request: Request):
+    snapshots = getattr(request.app.state, "temple_snapshots", None)
+    if snapshots is None:
+        raise HTTPException(status_code=503, detail="Temple snapshots not initialized")
+    return snapshots
+
+
 @router.get("/temple/{temple_slug}")
-async def get_temple_analytics(temple_slug: str):
-    return {
-        "currentCount": 3500,
-        "capacity": 5000,
-        "crowdLevel": "medium",
-        "timestamp": datetime.now().isoformat(),
-        "zones": []
-    }
+async def get_temple_analytics(temple_slug: str, request: Request):
+    return _get_snapshots(request).response(temple_slug, "analytics", request.headers.get("if-none-match"))
 
 @router.get("/temple/{temple_slug}/footfall")
 async def get_footfall(temple_slug: str):
@@ -1,46 +1,179 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException, Request, Response
+from pydantic import BaseModel, Field
 from typing import List, Optional
-from datetime import datetime
+import asyncio
+
+from app.services.booking_store import Booking, BookingStore
+from app.services.group_commit import GroupCommitWriter
+from app.services.slot_inventory import SlotFullError, SlotInventory
 
 router = APIRouter()
 
+
+def _get_inventory(request: Request) -> SlotInventory:
+    inventory = getattr(request.app.state, "slot_inventory", None)
+    if inventory is None:
+        raise HTTPException(status_code=503, detail="Slot inventory not initialized")
+    return inventory
+
+
+def _get_store(request: Request) -> BookingStore:
+    store = getattr(request.app.state, "booking_store", None)
+    if store is None:
+        raise HTTPException(status_code=503, detail="Booking store not initialized")
+    return store
+
+
+def _get_writer(request: Request) -> GroupCommitWriter:
+    writer = getattr(request.app.state, "booking_writer", None)
+    if writer is None:
+        raise HTTPException(status_code=503, detail="Booking writer not initialized")
+    return writer
+
+
 class BookingCreate(BaseModel):
     templeId: str
-    date: str
+    date: str  # YYYY-MM-DD
     timeSlot: str
     name: str
     phone: str
-    numberOfPeople: int = 1
+    numberOfPeople: int = Field(1, ge=1)
+    darshanType: Optional[str] = None  # defaults to the first configured type
+    userId: Optional[str] = None
 
 class BookingResponse(BaseModel):
     id: str
     templeId: str
     date: str
     timeSlot: str
+    darshanType: str
     queueNumber: int
     status: str
+    numberOfPeople: int = 1
+    name: Optional[str] = None
+    userId: Optional[str] = None
+    createdAt: Optional[str] = None
+
+
+def _to_response(rec: Booking) -> BookingResponse:
+    return BookingResponse(
+        id=rec.id,
+        templeId=rec.temple,
+        date=rec.date,
+        timeSlot=rec.time_slot,
+        darshanType=rec.darshan_type,
+        queueNumber=rec.queue_number,
+        status=rec.status,
+        numberOfPeople=rec.people,
+        name=rec.name,
+        userId=rec.user_id,
+        createdAt=rec.created_at,
+    )
 
 @router.post("/", response_model=BookingResponse)
-async def create_booking(booking: BookingCreate):
-    # Mock booking creation
-    return {
-        "id": f"BKG{datetime.now().strftime('%Y%m%d%H%M%S')}",
-        "templeId": booking.templeId,
-        "date": booking.date,
-        "timeSlot": booking.timeSlot,
-        "queueNumber": 123,
-        "status": "confirmed"
-    }
-
-@router.get("/")
-async def get_bookings(userId: Optional[str] = None):
-    return []
+async def create_booking(booking: BookingCreate, request: Request):
+    inventory = _get_inventory(request)
+    store = _get_store(request)
+    writer = _get_writer(request)
+    darshan_type = (booking.darshanType or inventory.default_type).strip().lower()
+    try:
+        day = inventory.check_date(booking.date)
+        reservation = inventory.reserve(
+            booking.templeId, day, booking.timeSlot, booking.numberOfPeople, darshan_type
+        )
+    except SlotFullError as e:
+        detail = "Slot is full" if e.remaining <= 0 else f"Only {e.remaining} places left in this slot"
+        raise HTTPException(status_code=409, detail=detail)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    pending = store.new_booking(
+        temple=booking.templeId,
+        date=day,
+        time_slot=booking.timeSlot,
+        darshan_type=darshan_type,
+        people=booking.numberOfPeople,
+        queue_number=reservation.queue_number,
+        name=booking.name,
+        phone=booking.phone,
+        user_id=booking.userId,
+    )
+    # Acknowledged only once the batch this booking was committed with is on disk.
+    try:
+        rec = await asyncio.wrap_future(writer.submit(pending))
+    except Exception:
+        inventory.release(booking.templeId, day, booking.timeSlot, booking.numberOfPeople, darshan_type)
+        raise
+    return _to_response(rec)
+
+# Handlers that call the store are plain ``def``: FastAPI runs them in its
+# threadpool, so a log write or a wait for the store lock never stalls the
+# event loop (and every other request with it).
+@router.get("/", response_model=List[BookingResponse])
+def get_bookings(
+    request: Request,
+    response: Response,
+    userId: Optional[str] = None,
+    phone: Optional[str] = None,
+    templeId: Optional[str] = None,
+    date: Optional[str] = None,
+    status: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = 20,
+):
+    """Newest first. When there are more, ``X-Next-Cursor`` holds the
+    ``cursor`` for the next page. Without userId, phone, templeId and date,
+    or status the list is empty."""
+    page, next_cursor = _get_store(request).find(
+        user_id=userId, phone=phone, temple=templeId, date=date, status=status, cursor=cursor, limit=limit
+    )
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return [_to_response(rec) for rec in page]
 
 @router.get("/available-slots")
-async def get_available_slots(date: str, darshanType: str):
-    return [
-        "06:00 AM - 08:00 AM",
-        "08:00 AM - 10:00 AM",
-        "10:00 AM - 12:00 PM"
-    ]
+async def get_available_slots(date: str, darshanType: str, request: Request, templeId: Optional[str] = None):
+    inventory = _get_inventory(request)
+    try:
+        if not templeId:
+            return list(inventory.slots)
+        return inventory.available_slots(templeId, inventory.check_date(date), darshanType)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/available-slots/range")
+async def get_available_slots_range(
+    templeId: str, startDate: str, endDate: str, request: Request, darshanType: Optional[str] = None
+):
+    """Available slots for every bookable date in [startDate, endDate]:
+    ``{"2024-05-01": ["06:00 AM - 08:00 AM", ...], ...}``."""
+    try:
+        return _get_inventory(request).available_range(templeId, startDate, endDate, darshanType)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/cache/metrics")
+async def get_booking_cache_metrics(request: Request):
+    return _get_store(request).cache_metrics()
+
+@router.get("/writer/metrics")
+async def get_booking_writer_metrics(request: Request):
+    return _get_writer(request).metrics()
+
+@router.get("/{booking_id}", response_model=BookingResponse)
+def get_booking(booking_id: str, request: Request):
+    rec = _get_store(request).get(booking_id)
+    if rec is None:
+        raise HTTPException(status_code=404, detail="Booking not found")
+    return _to_response(rec)
+
+@router.delete("/{booking_id}", response_model=BookingResponse)
+def cancel_booking(booking_id: str, request: Request):
+    """Cancel a booking and give its places back to the slot."""
+    rec, changed = _get_store(request).cancel(booking_id)
+    if rec is None:
+        raise HTTPException(status_code=404, detail="Booking not found")
+    if changed:
+        _get_inventory(request).release(rec.temple, rec.date, rec.time_slot, rec.people, rec.darshan_type)
+    return _to_response(rec)
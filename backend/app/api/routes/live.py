@@ -1,18 +1,57 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException, Request, WebSocket
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from datetime import datetime, timezone
-import random
+import asyncio
+import os
+import sys
 import time
-from typing import Dict, Optional
+from typing import Optional, Tuple
+
+from app.services.booking_store import BookingStore
+from app.services.bounded_cache import BoundedCache
+from app.services.dispatch_schedule import slot_end_at
+from app.services.live_updates import LiveChannel
+from app.services.queue_engine import QueueEngine
+from app.services.temple_snapshots import TempleSnapshotCache
 
 router = APIRouter()
 
 
+def _get_engine(request: Request):
+    engine = getattr(request.app.state, "queue_engine", None)
+    if engine is None:
+        raise HTTPException(status_code=503, detail="Queue engine not initialized")
+    return engine
+
+
+def _get_bookings(request) -> Optional[BookingStore]:
+    # Optional: without it, queue status trusts the temple and number sent.
+    return getattr(request.app.state, "booking_store", None)
+
+
+def _get_snapshots(request: Request) -> TempleSnapshotCache:
+    snapshots = getattr(request.app.state, "temple_snapshots", None)
+    if snapshots is None:
+        raise HTTPException(status_code=503, detail="Temple snapshots not initialized")
+    return snapshots
+
+
+def _get_channel(request) -> LiveChannel:
+    # Works for both Request and WebSocket (both carry .app).
+    channel = getattr(request.app.state, "live_channel", None)
+    if channel is None:
+        raise HTTPException(status_code=503, detail="Live channel not initialized")
+    return channel
+
+
 class QueueStatusRequest(BaseModel):
     bookingId: str = Field(..., min_length=3)
     temple: str = Field(..., min_length=2)
     queueNumber: int = Field(..., ge=1)
     createdAt: Optional[str] = None
+    # Booked slot, e.g. "06:00 AM - 08:00 AM"; the booking's state expires when it ends.
+    timeSlot: Optional[str] = None
 
 
 class QueueStatusResponse(BaseModel):
@@ -26,85 +65,185 @@ class QueueStatusResponse(BaseModel):
     lastUpdated: str
 
 
-_queue_state: Dict[str, Dict[str, object]] = {}
+class EntryEventRequest(BaseModel):
+    count: int = Field(..., ge=1)
+    # Epoch seconds of the scan, today; defaults to when the event is received.
+    at: Optional[float] = None
+
+
+class EntryEventResponse(BaseModel):
+    temple: str
+    admitted: int
+    issued: int
+    ratePerMinute: float
+    lastEntryAt: Optional[float] = None
+
+
+# bookingId -> (temple, queue number, position when first seen, time slot, when
+# first seen). Pinned so the progress bar has a fixed starting point and a
+# booking can't change queues; the slot (or first poll) anchors the estimate
+# until the temple reports entries.
+# Bounded and LRU-evicted, so polling with made-up booking ids can't grow it;
+# entries also expire when their slot ends or after QUEUE_STATE_IDLE_HOURS.
+_queue_state: BoundedCache[Tuple[str, int, int, Optional[str], float]] = BoundedCache(
+    max_entries=int(os.getenv("QUEUE_STATE_MAX_ENTRIES", "100000")),
+    idle_ttl_seconds=float(os.getenv("QUEUE_STATE_IDLE_HOURS", "6")) * 3600,
+)
 
 
 def _now_iso() -> str:
     return datetime.now(timezone.utc).isoformat()
 
 
-def _init_queue_state(req: QueueStatusRequest) -> Dict[str, object]:
-    # Pick a stable movement speed for this booking.
-    speed = random.choice(["Slow", "Normal", "Fast"])
-    # Base total should be >= starting position for a nice progress bar.
-    total = int(req.queueNumber + random.randint(30, 120))
-    return {
-        "created_epoch": time.time(),
-        "start_position": int(req.queueNumber),
-        "total": total,
-        "speed": speed,
-    }
+def _build_queue_status(
+    engine: QueueEngine,
+    bookings: Optional[BookingStore],
+    booking_id: str,
+    temple: str,
+    queue_number: int,
+    time_slot: Optional[str] = None,
+) -> QueueStatusResponse:
+    pin = _queue_state.get(booking_id)
+    if pin is None:
+        # A stored booking's own temple and number win over what was sent.
+        booking = bookings.get(booking_id) if bookings is not None else None
+        if booking is not None:
+            temple, queue_number, time_slot = booking.temple, booking.queue_number, booking.time_slot
+        first_seen = time.time()
+        estimate = engine.estimate(temple, queue_number, first_seen, time_slot=time_slot, since=first_seen)
+        slot = sys.intern(time_slot) if time_slot else None
+        pin = (sys.intern(temple), int(queue_number), estimate.position, slot, first_seen)
+        _queue_state.put(booking_id, pin, deadline=slot_end_at(time_slot))
+    else:
+        estimate = engine.estimate(pin[0], pin[1], time_slot=pin[3], since=pin[4])
+
+    start_position = pin[2]
+    entry_iso = datetime.fromtimestamp(datetime.now(timezone.utc).timestamp() + estimate.eta_seconds, tz=timezone.utc).isoformat()
 
+    return QueueStatusResponse(
+        bookingId=booking_id,
+        temple=pin[0],
+        position=estimate.position,
+        total=max(start_position, estimate.position),
+        movementSpeed=estimate.speed,
+        estimatedEntryTime=entry_iso,
+        estimatedWaitMinutes=estimate.wait_minutes,
+        lastUpdated=_now_iso(),
+    )
+
+
+def create_live_channel(
+    engine: QueueEngine, snapshots: TempleSnapshotCache, bookings: Optional[BookingStore] = None
+) -> LiveChannel:
+    """The push channel behind the WebSocket and SSE endpoints below."""
+    return LiveChannel(
+        temple_update=lambda temple_slug: snapshots.get(temple_slug).payloads["status"],
+        booking_update=lambda booking_id, temple, queue_number: _build_queue_status(
+            engine, bookings, booking_id, temple, queue_number
+        ).model_dump(),
+    )
 
-def _speed_step(speed: str) -> int:
-    # How many positions move per 10 seconds.
-    if speed == "Fast":
-        return 3
-    if speed == "Slow":
-        return 1
-    return 2
 
 @router.get("/temple/{temple_slug}/status")
-async def get_live_status(temple_slug: str):
-    base_crowd = 3000
-    return {
-        "templeId": temple_slug,
-        "currentQueue": base_crowd + random.randint(-100, 100),
-        "estimatedWaitTime": f"{random.randint(40, 70)} minutes",
-        "estimatedWaitTimeConfidence": "5",
-        "nextBatchTime": "10 minutes",
-        "crowdLevel": "medium",
-        "lastUpdated": datetime.now().isoformat(),
-        "zones": [
-            {"name": "Main Hall", "count": 800, "capacity": 1000},
-            {"name": "Entrance", "count": 500, "capacity": 800}
-        ]
-    }
+async def get_live_status(temple_slug: str, request: Request):
+    return _get_snapshots(request).response(temple_slug, "status", request.headers.get("if-none-match"))
 
 
-@router.post("/queue/status", response_model=QueueStatusResponse)
-async def get_queue_status(req: QueueStatusRequest):
-    state = _queue_state.get(req.bookingId)
-    if not state:
-        state = _init_queue_state(req)
-        _queue_state[req.bookingId] = state
-
-    created_epoch = float(state["created_epoch"])
-    start_position = int(state["start_position"])
-    total = int(state["total"])
-    speed = str(state["speed"])
-
-    # Backend-driven progression: update every 10 seconds worth of progress.
-    elapsed = max(0.0, time.time() - created_epoch)
-    ticks = int(elapsed // 10)
-    step = _speed_step(speed)
-    advanced = ticks * step
-    position = max(1, start_position - advanced)
-
-    # Rough estimate: each position ~ 25/20/15 seconds depending on speed.
-    seconds_per_position = 25 if speed == "Slow" else 20 if speed == "Normal" else 15
-    eta_seconds = position * seconds_per_position
-    estimated_wait_minutes = max(1, int(round(eta_seconds / 60)))
-    estimated_entry_time = datetime.now(timezone.utc).timestamp() + eta_seconds
-    entry_iso = datetime.fromtimestamp(estimated_entry_time, tz=timezone.utc).isoformat()
+@router.post("/temple/{temple_slug}/entries", response_model=EntryEventResponse)
+async def record_entries(temple_slug: str, req: EntryEventRequest, request: Request):
+    """Gate scans / admitted batches feed the queue engine."""
+    engine = _get_engine(request)
+    try:
+        return EntryEventResponse(**engine.record_entry(temple_slug, req.count, at=req.at))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-    return QueueStatusResponse(
-        bookingId=req.bookingId,
-        temple=req.temple,
-        position=position,
-        total=total,
-        movementSpeed=speed,
-        estimatedEntryTime=entry_iso,
-        estimatedWaitMinutes=estimated_wait_minutes,
-        lastUpdated=_now_iso(),
+
+@router.get("/queue/metrics")
+async def get_queue_state_metrics():
+    return _queue_state.metrics()
+
+
+@router.get("/snapshots/metrics")
+async def get_snapshot_metrics(request: Request):
+    return _get_snapshots(request).metrics()
+
+
+# Plain ``def``: the booking lookup may wait on the store lock, so it runs in
+# the threadpool rather than on the event loop.
+@router.post("/queue/status", response_model=QueueStatusResponse)
+def get_queue_status(req: QueueStatusRequest, request: Request):
+    return _build_queue_status(
+        _get_engine(request), _get_bookings(request), req.bookingId, req.temple, req.queueNumber, req.timeSlot
     )
+
+
+@router.websocket("/ws/{temple_slug}")
+async def live_socket(websocket: WebSocket, temple_slug: str):
+    """Pushes ``{"type": "live_data", "payload": ...}`` whenever the temple's
+    status changes. Sending ``{"type": "watch_booking", "bookingId": ...,
+    "queueNumber": ...}`` adds ``queue_status`` messages for that booking."""
+    channel = _get_channel(websocket)
+    await websocket.accept()
+    sub = await channel.subscribe(temple_slug)
+
+    async def send(update) -> None:
+        await websocket.send_text(update.ws)
+
+    async def receive() -> None:
+        while True:
+            msg = await websocket.receive_json()
+            if isinstance(msg, dict) and msg.get("type") == "watch_booking":
+                try:
+                    await channel.watch_booking(sub, temple_slug, str(msg["bookingId"]), int(msg["queueNumber"]))
+                except (KeyError, TypeError, ValueError):
+                    await websocket.send_json({"type": "error", "payload": {"detail": "bookingId and queueNumber are required"}})
+
+    pump = asyncio.create_task(channel.hub.pump(sub, send))
+    reader = asyncio.create_task(receive())
+    try:
+        await asyncio.wait([pump, reader], return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        pump.cancel()
+        reader.cancel()
+        channel.unsubscribe(sub)
+    if sub.close_reason not in (None, "unsubscribed"):
+        # Dropped by the hub for falling behind: 1013 = try again later.
+        try:
+            await websocket.close(code=1013)
+        except RuntimeError:
+            pass
+
+
+@router.get("/temple/{temple_slug}/stream")
+async def live_stream(
+    temple_slug: str, request: Request, bookingId: Optional[str] = None, queueNumber: Optional[int] = None
+):
+    """Server-Sent Events fallback for the WebSocket: ``live_data`` events, plus
+    ``queue_status`` events when ``bookingId`` and ``queueNumber`` are given."""
+    channel = _get_channel(request)
+    sub = await channel.subscribe(temple_slug)
+    if bookingId and queueNumber:
+        await channel.watch_booking(sub, temple_slug, bookingId, queueNumber)
+
+    async def events():
+        try:
+            while not await request.is_disconnected():
+                try:
+                    batch = await asyncio.wait_for(sub.next_batch(), timeout=15)
+                except asyncio.TimeoutError:
+                    yield b": keep-alive\n\n"  # stops proxies closing an idle stream
+                    continue
+                if not batch:
+                    return  # dropped by the hub for falling behind
+                for update in batch:
+                    yield update.sse
+        finally:
+            channel.unsubscribe(sub)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@router.get("/channel/metrics")
+async def get_channel_metrics(request: Request):
+    return _get_channel(request).hub.metrics()
@@ -1,11 +1,19 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel, Field
 
-from app.services.notifications_store import NotificationStore, normalize_phone_to_e164
+from app.services.notifications_store import normalize_phone_to_e164
 
 
 router = APIRouter()
-_store = NotificationStore()
+
+
+def _get_store(request: Request):
+    # Shared with the SMS scheduler; a second instance would keep its own
+    # in-memory index and never see the other's writes.
+    store = getattr(request.app.state, "notification_store", None)
+    if store is None:
+        raise HTTPException(status_code=503, detail="Notification store not initialized")
+    return store
 
 
 class SubscribeRequest(BaseModel):
@@ -24,13 +32,14 @@ class SubscribeResponse(BaseModel):
 
 
 @router.post("/subscribe", response_model=SubscribeResponse)
-async def subscribe(req: SubscribeRequest):
+async def subscribe(req: SubscribeRequest, request: Request):
+    store = _get_store(request)
     try:
         phone = normalize_phone_to_e164(req.mobile)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-    sub = _store.upsert(
+    sub = store.upsert(
         booking_id=req.bookingId,
         phone_e164=phone,
         temple=req.temple,
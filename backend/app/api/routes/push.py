@@ -1,4 +1,5 @@
 from fastapi import APIRouter, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel, Field
 from typing import Optional
 
@@ -19,6 +20,13 @@ def _get_sender(request: Request):
     return sender
 
 
+def _get_jobs(request: Request):
+    jobs = getattr(request.app.state, "web_push_jobs", None)
+    if jobs is None:
+        raise HTTPException(status_code=503, detail="Web Push job queue not initialized")
+    return jobs
+
+
 class SubscriptionKeys(BaseModel):
     p256dh: str = Field(..., min_length=10)
     auth: str = Field(..., min_length=5)
@@ -54,6 +62,34 @@ class PushTestRequest(BaseModel):
     url: str = "/live-tracking"
 
 
+class PushJobResponse(BaseModel):
+    jobId: str
+    status: str
+    total: int
+    queued: int
+    sent: int
+    failed: int
+    gone: int
+    createdAt: str
+    finishedAt: Optional[str] = None
+    error: Optional[str] = None
+
+
+def _job_response(job) -> PushJobResponse:
+    return PushJobResponse(
+        jobId=job.id,
+        status=job.status,
+        total=job.total,
+        queued=job.queued,
+        sent=job.sent,
+        failed=job.failed,
+        gone=job.gone,
+        createdAt=job.created_at,
+        finishedAt=job.finished_at,
+        error=job.error,
+    )
+
+
 @router.get("/vapid-public-key", response_model=VapidPublicKeyResponse)
 async def vapid_public_key(request: Request):
     sender = _get_sender(request)
@@ -87,22 +123,29 @@ async def unsubscribe(subscription: PushSubscription, request: Request):
     return {"status": "unsubscribed" if changed else "not_found"}
 
 
-@router.post("/send-test")
+def _select_targets(store, endpoint: Optional[str]):
+    if endpoint:
+        sub = store.get_by_endpoint(endpoint)
+        if sub is None:
+            raise HTTPException(status_code=404, detail="Subscription not found for endpoint")
+        targets = [sub]
+    else:
+        targets = store.load_all()
+        if not targets:
+            raise HTTPException(status_code=404, detail="No subscriptions stored")
+    return [s for s in targets if s.enabled]
+
+
+@router.post("/send-test", response_model=PushJobResponse, status_code=202)
 async def send_test(req: PushTestRequest, request: Request):
     store = _get_store(request)
     sender = _get_sender(request)
+    jobs = _get_jobs(request)
     if not sender.is_configured():
         raise HTTPException(status_code=503, detail="Web Push is not configured")
 
-    subs = store.load_all()
-    if not subs:
-        raise HTTPException(status_code=404, detail="No subscriptions stored")
-
-    targets = subs
-    if req.endpoint:
-        targets = [s for s in subs if str(s.subscription.get("endpoint") or "") == req.endpoint]
-        if not targets:
-            raise HTTPException(status_code=404, detail="Subscription not found for endpoint")
+    # Store reads touch the disk; keep them off the event loop too.
+    targets = await run_in_threadpool(_select_targets, store, req.endpoint)
 
     payload = {
         "title": req.title,
@@ -111,15 +154,13 @@ async def send_test(req: PushTestRequest, request: Request):
         "url": req.url,
     }
 
-    sent = 0
-    for s in targets:
-        if not s.enabled:
-            continue
-        try:
-            sender.send(s.subscription, payload)
-            store.mark_sent(s.id)
-            sent += 1
-        except Exception as e:
-            print(f"[webpush][error] subscription={s.id} err={e}")
-
-    return {"status": "ok", "sent": sent}
+    job = jobs.submit([(s.id, s.push_info, payload) for s in targets])
+    return _job_response(job)
+
+
+@router.get("/jobs/{job_id}", response_model=PushJobResponse)
+async def get_job(job_id: str, request: Request):
+    job = _get_jobs(request).get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return _job_response(job)
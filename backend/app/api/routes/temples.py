@@ -1,10 +1,17 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel
 from typing import List, Optional
-from datetime import datetime
 
 router = APIRouter()
 
+
+def _get_snapshots(request: Request):
+    snapshots = getattr(request.app.state, "temple_snapshots", None)
+    if snapshots is None:
+        raise HTTPException(status_code=503, detail="Temple snapshots not initialized")
+    return snapshots
+
+
 class TempleInfo(BaseModel):
     id: str
     name: str
@@ -14,19 +21,9 @@ class TempleInfo(BaseModel):
     status: str
 
 @router.get("/{temple_slug}")
-async def get_temple_info(temple_slug: str):
-    # Return mock temple data
-    return {
-        "id": temple_slug,
-        "name": "Temple",
-        "location": "Location",
-        "capacity": 5000,
-        "currentCrowd": 3000,
-        "status": "open",
-        "isOpen": True,
-        "crowdLevel": "medium",
-        "lastUpdated": datetime.now().isoformat()
-    }
+async def get_temple_info(temple_slug: str, request: Request):
+    # Mock temple data, from the same snapshot as the live status
+    return _get_snapshots(request).response(temple_slug, "info", request.headers.get("if-none-match"))
 
 @router.get("/")
 async def list_temples():
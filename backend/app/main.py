@@ -1,4 +1,4 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 import uvicorn
@@ -6,15 +6,25 @@ import uvicorn
 # Import routers
 from app.api.routes import auth, temples, bookings, analytics, live, alerts, notifications, push
 
-from app.services.notifications_store import NotificationStore
+from app.services.booking_store import BookingStore, restore_inventory
+from app.services.group_commit import GroupCommitWriter
 from app.services.notification_scheduler import start_scheduler, stop_scheduler
+from app.services.queue_engine import QueueEngine
+from app.services.slot_inventory import SlotInventory
+from app.services.stores import create_notification_store, create_web_push_store
+from app.services.temple_snapshots import TempleSnapshotCache
 
-from app.services.web_push_store import WebPushStore
 from app.services.web_push_sender import WebPushSender
+from app.services.push_dispatcher import PushDispatcher
+from app.services.push_jobs import PushJobQueue
 from app.services.web_push_scheduler import start_web_push_scheduler, stop_web_push_scheduler
 
-_notification_store = NotificationStore()
-_web_push_store = WebPushStore()
+_notification_store = create_notification_store()
+_web_push_store = create_web_push_store()
+_slot_inventory = SlotInventory()
+_queue_engine = QueueEngine(issued=_slot_inventory.issued)
+_temple_snapshots = TempleSnapshotCache()
+_booking_store = BookingStore()
 
 app = FastAPI(
     title="Temple Crowd Management API",
@@ -50,21 +60,45 @@ app.include_router(push.router, prefix="/api/v1/push", tags=["Push"])
 
 @app.on_event("startup")
 async def _startup():
+    app.state.notification_store = _notification_store
+    app.state.queue_engine = _queue_engine
+    app.state.slot_inventory = _slot_inventory
+    app.state.booking_store = _booking_store
+    restored = restore_inventory(_booking_store, _slot_inventory)
+    print(f"[bookings] inventory restored from bookings count={restored}")
+    # Concurrent bookings share one log write + fsync
+    app.state.booking_writer = GroupCommitWriter(_booking_store.add_many, name="booking-writer")
+
+    # Precomputed temple status/info/analytics, refreshed in the background
+    app.state.temple_snapshots = _temple_snapshots
+    _temple_snapshots.start()
+
+    # WebSocket/SSE push of live status and queue positions
+    app.state.live_channel = live.create_live_channel(_queue_engine, _temple_snapshots, _booking_store)
+    app.state.live_channel.start()
+
     # Starts hourly SMS sender (Twilio if configured, otherwise dev-log)
-    start_scheduler(_notification_store)
+    start_scheduler(_notification_store, engine=_queue_engine)
 
     # Shared singletons for push routes
     app.state.web_push_store = _web_push_store
     app.state.web_push_sender = WebPushSender()
+    app.state.web_push_dispatcher = PushDispatcher(app.state.web_push_sender)
+    app.state.web_push_jobs = PushJobQueue(_web_push_store, app.state.web_push_dispatcher)
 
     # Starts Web Push sender (only sends if VAPID is configured)
-    start_web_push_scheduler(_web_push_store)
+    start_web_push_scheduler(_web_push_store, app.state.web_push_dispatcher, engine=_queue_engine)
 
 
 @app.on_event("shutdown")
 async def _shutdown():
+    await app.state.live_channel.stop()
+    await _temple_snapshots.stop()
+    app.state.booking_writer.close()
     stop_scheduler()
     stop_web_push_scheduler()
+    app.state.web_push_jobs.close()
+    app.state.web_push_dispatcher.close()
 
 @app.get("/")
 async def root():
@@ -0,0 +1,350 @@
+import os
+from bisect import bisect_left, insort
+from datetime import datetime, timezone
+from itertools import count
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+from .bounded_cache import BoundedCache
+from .ids import new_id
+from .notifications_store import normalize_phone_to_e164
+from .queue_engine import temple_key
+from .record_store import RecordStore
+from .records import CompactRecord, intern_text, pack_timestamp, unpack_timestamp
+from .slot_inventory import SlotInventory
+
+
+DATA_FILE = os.path.join(os.path.dirname(__file__), "..", "data", "bookings.json")
+
+MAX_PAGE_SIZE = 100
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def phone_key(phone: str) -> str:
+    """E.164 when the number parses, otherwise just its digits."""
+    try:
+        return normalize_phone_to_e164(phone)
+    except ValueError:
+        return "".join(ch for ch in (phone or "") if ch.isdigit())
+
+
+class Booking(CompactRecord):
+    __slots__ = (
+        "id", "user_id", "temple", "date", "time_slot", "darshan_type", "people",
+        "queue_number", "name", "phone", "status", "_created_at",
+    )
+    FIELDS = (
+        "id", "user_id", "temple", "date", "time_slot", "darshan_type", "people",
+        "queue_number", "name", "phone", "status", "created_at",
+    )
+
+    def __init__(
+        self,
+        id: str,
+        user_id: Optional[str],
+        temple: str,
+        date: str,
+        time_slot: str,
+        darshan_type: str,
+        people: int,
+        queue_number: int,
+        name: str,
+        phone: str,
+        status: str,
+        created_at: Optional[str],
+    ):
+        self.id = id
+        self.user_id = user_id
+        self.temple = intern_text(temple)
+        self.date = intern_text(date)
+        self.time_slot = intern_text(time_slot)
+        self.darshan_type = intern_text(darshan_type)
+        self.people = people
+        self.queue_number = queue_number
+        self.name = name
+        self.phone = phone
+        self.status = intern_text(status)
+        self.created_at = created_at
+
+    @property
+    def created_at(self) -> Optional[str]:
+        return unpack_timestamp(self._created_at)
+
+    @created_at.setter
+    def created_at(self, value: Any) -> None:
+        self._created_at = pack_timestamp(value)
+
+
+_generations = count(1)
+
+
+class _SortedIndex:
+    """Secondary index: key -> ids in ascending order.
+
+    Booking ids are time-ordered, so ascending id order is creation order and
+    new bookings append at the end. Each key also carries a generation that
+    changes whenever its list does, which is what cached pages check.
+    """
+
+    __slots__ = ("_ids", "_generation")
+
+    def __init__(self):
+        self._ids: Dict[Hashable, List[str]] = {}
+        self._generation: Dict[Hashable, int] = {}
+
+    def add(self, key: Hashable, rec_id: str) -> None:
+        ids = self._ids.setdefault(key, [])
+        if not ids or ids[-1] < rec_id:
+            ids.append(rec_id)
+        else:
+            insort(ids, rec_id)
+        self._generation[key] = next(_generations)
+
+    def remove(self, key: Hashable, rec_id: str) -> None:
+        ids = self._ids.get(key)
+        if not ids:
+            return
+        i = bisect_left(ids, rec_id)
+        if i < len(ids) and ids[i] == rec_id:
+            del ids[i]
+        if ids:
+            self._generation[key] = next(_generations)
+        else:
+            # An emptied key is indistinguishable from one never used (0).
+            del self._ids[key]
+            del self._generation[key]
+
+    def clear(self) -> None:
+        self._ids.clear()
+        self._generation.clear()
+
+    def ids(self, key: Hashable) -> List[str]:
+        return self._ids.get(key, [])
+
+    def generation(self, key: Hashable) -> int:
+        return self._generation.get(key, 0)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+
+class BookingStore(RecordStore[Booking]):
+    """Persisted bookings with secondary indexes for the lookups the API serves.
+
+    Indexes by user id, phone (E.164), temple+date and status are sorted id
+    lists, so a page is a binary search for the cursor plus a walk of at most
+    a page worth of matching ids, however many bookings there are. Queries
+    pick the narrowest index they can and filter the rest while walking.
+
+    Pages come newest first; the cursor is the last id returned and the next
+    page continues below it. Recent pages are kept in a ``BoundedCache``
+    (``BOOKING_CACHE_MAX_ENTRIES``) together with the generation of the index
+    list they were read from; any change to a booking bumps the generations
+    of all its keys, so a cached page is never served after it went stale.
+
+    With ``BOOKING_FSYNC`` on (the default) a booking is only stored once its
+    log write has been fsynced; ``add_many`` lets a ``GroupCommitWriter`` share
+    one fsync between every booking that arrived together.
+    """
+
+    record_type = Booking
+
+    def __init__(
+        self,
+        path: str = DATA_FILE,
+        compact_every: int = 1000,
+        shared: Optional[bool] = None,
+        cache_entries: Optional[int] = None,
+        fsync: Optional[bool] = None,
+    ):
+        if fsync is None:
+            fsync = (os.getenv("BOOKING_FSYNC") or "1").strip().lower() in ("1", "true", "yes", "on")
+        self.fsync = fsync
+        self._by_user = _SortedIndex()
+        self._by_phone = _SortedIndex()
+        self._by_day = _SortedIndex()
+        self._by_status = _SortedIndex()
+        self._pages: BoundedCache[Tuple[int, List[Booking], Optional[str]]] = BoundedCache(
+            max_entries=int(cache_entries or os.getenv("BOOKING_CACHE_MAX_ENTRIES", "10000")),
+            idle_ttl_seconds=300,
+        )
+        super().__init__(path, compact_every=compact_every, shared=shared)
+
+    def _from_dict(self, it: Dict[str, Any]) -> Booking:
+        return Booking(
+            id=str(it["id"]),
+            user_id=it.get("user_id"),
+            temple=str(it.get("temple") or ""),
+            date=str(it.get("date") or ""),
+            time_slot=str(it.get("time_slot") or ""),
+            darshan_type=str(it.get("darshan_type") or ""),
+            people=int(it.get("people") or 1),
+            queue_number=int(it.get("queue_number") or 0),
+            name=str(it.get("name") or ""),
+            phone=phone_key(str(it.get("phone") or "")),
+            status=str(it.get("status") or "confirmed"),
+            created_at=it.get("created_at"),
+        )
+
+    def _commit(self, ops: List[Dict[str, Any]], fsync: bool = False) -> None:
+        super()._commit(ops, fsync=fsync or self.fsync)
+
+    def _keys(self, rec: Booking) -> List[Tuple[_SortedIndex, Hashable]]:
+        keys = [
+            (self._by_phone, rec.phone),
+            (self._by_day, (temple_key(rec.temple), rec.date)),
+            (self._by_status, rec.status),
+        ]
+        if rec.user_id:
+            keys.append((self._by_user, rec.user_id))
+        return keys
+
+    def _reset_indexes(self) -> None:
+        for index in (self._by_user, self._by_phone, self._by_day, self._by_status):
+            index.clear()
+        self._pages.clear()
+
+    def _add_to_indexes(self, rec: Booking) -> None:
+        for index, key in self._keys(rec):
+            index.add(key, rec.id)
+
+    def _remove_from_indexes(self, rec: Booking) -> None:
+        for index, key in self._keys(rec):
+            index.remove(key, rec.id)
+
+    # -- public API -----------------------------------------------------
+
+    def new_booking(
+        self,
+        temple: str,
+        date: str,
+        time_slot: str,
+        darshan_type: str,
+        people: int,
+        queue_number: int,
+        name: str,
+        phone: str,
+        user_id: Optional[str] = None,
+    ) -> Booking:
+        """A confirmed booking ready for ``add_many``; not stored yet."""
+        return Booking(
+            id=new_id("BKG"),
+            user_id=user_id or None,
+            temple=temple,
+            date=date,
+            time_slot=time_slot,
+            darshan_type=darshan_type,
+            people=int(people),
+            queue_number=int(queue_number),
+            name=name,
+            phone=phone_key(phone),
+            status="confirmed",
+            created_at=_now_iso(),
+        )
+
+    def add_many(self, bookings: List[Booking]) -> List[Booking]:
+        """Store bookings with one log write (and one fsync)."""
+        self._commit([{"op": "put", "record": self._to_dict(rec)} for rec in bookings])
+        return bookings
+
+    def create(self, *args: Any, **kwargs: Any) -> Booking:
+        return self.add_many([self.new_booking(*args, **kwargs)])[0]
+
+    def cancel(self, booking_id: str) -> Tuple[Optional[Booking], bool]:
+        """Mark a booking cancelled; returns it and whether it changed."""
+        with self._writing():
+            rec = self._records.get(booking_id)
+            if rec is None or rec.status == "cancelled":
+                return rec, False
+            self._patch_each({booking_id: {"status": "cancelled"}})
+            return self._records[booking_id], True
+
+    def find(
+        self,
+        user_id: Optional[str] = None,
+        phone: Optional[str] = None,
+        temple: Optional[str] = None,
+        date: Optional[str] = None,
+        status: Optional[str] = None,
+        cursor: Optional[str] = None,
+        limit: int = 20,
+    ) -> Tuple[List[Booking], Optional[str]]:
+        """One page of matching bookings, newest first, and the next cursor.
+
+        Needs a user id, phone, temple and date, or status; with none of them
+        the page is empty.
+        """
+        phone_k = phone_key(phone) if phone else None
+        temple_k = temple_key(temple) if temple else None
+        cache_key = (user_id, phone_k, temple_k, date, status, cursor)
+        # Walk the narrowest index; the filters it already implies are dropped.
+        if user_id:
+            index, key = self._by_user, user_id
+            user_id = None
+        elif phone_k:
+            index, key = self._by_phone, phone_k
+            phone_k = None
+        elif temple_k and date:
+            index, key = self._by_day, (temple_k, date)
+            temple_k = date = None
+        elif status:
+            index, key = self._by_status, status
+            status = None
+        else:
+            # Listing every booking is not a lookup the API offers.
+            return [], None
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        cache_key += (limit,)
+        with self._reading():
+            generation = index.generation(key)
+            cached = self._pages.get(cache_key)
+            if cached is not None and cached[0] == generation:
+                return cached[1], cached[2]
+
+            ids = index.ids(key)
+            i = bisect_left(ids, cursor) if cursor else len(ids)
+            page: List[Booking] = []
+            more = False
+            while i > 0:
+                i -= 1
+                rec = self._records.get(ids[i])
+                if (
+                    rec is None
+                    or (user_id and rec.user_id != user_id)
+                    or (phone_k and rec.phone != phone_k)
+                    or (temple_k and temple_key(rec.temple) != temple_k)
+                    or (date and rec.date != date)
+                    or (status and rec.status != status)
+                ):
+                    continue
+                if len(page) == limit:
+                    more = True
+                    break
+                page.append(rec)
+            next_cursor = page[-1].id if more else None
+            self._pages.put(cache_key, (generation, page, next_cursor))
+            return page, next_cursor
+
+    def cache_metrics(self) -> Dict[str, Any]:
+        return self._pages.metrics()
+
+
+def restore_inventory(store: BookingStore, inventory: SlotInventory) -> int:
+    """Rebuild slot capacity and queue numbers from stored bookings.
+
+    Refuses a shared store: the inventory lives in this process, so every
+    worker would sell the same places and hand out the same queue numbers.
+    """
+    if store.shared:
+        raise RuntimeError(
+            "Bookings need a single worker: slot capacity and queue numbers are kept per process, "
+            "but the booking store is shared (WEB_CONCURRENCY > 1 or SUBSCRIPTION_STORE_SHARED=1)"
+        )
+    restored = 0
+    for rec in store.load_all():
+        if rec.status == "confirmed":
+            inventory.restore(rec.temple, rec.date, rec.time_slot, rec.people, rec.darshan_type, rec.queue_number)
+            restored += 1
+    return restored
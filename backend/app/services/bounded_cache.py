@@ -0,0 +1,120 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Generic, Hashable, List, Optional, TypeVar
+
+
+V = TypeVar("V")
+
+
+class _Entry:
+    __slots__ = ("value", "touched", "deadline")
+
+    def __init__(self, value: Any, touched: float, deadline: Optional[float]):
+        self.value = value
+        self.touched = touched
+        self.deadline = deadline
+
+
+class BoundedCache(Generic[V]):
+    """LRU map with a size cap, idle expiry and optional per-entry deadlines.
+
+    Entries live in access order, so the least recently used sits at the front:
+    inserting past ``max_entries`` evicts from there, and idle entries (untouched
+    for ``idle_ttl_seconds``) are swept from the front on every insert. An
+    entry's ``deadline`` (absolute epoch seconds) is checked when it is read.
+    Memory is therefore bounded by ``max_entries`` whatever keys callers send.
+    """
+
+    def __init__(self, max_entries: int, idle_ttl_seconds: float):
+        self.max_entries = max(1, int(max_entries))
+        self.idle_ttl_seconds = float(idle_ttl_seconds)
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0  # dropped to stay under max_entries
+        self.expirations = 0  # dropped for idling or passing their deadline
+
+    def _expired(self, entry: _Entry, now: float) -> bool:
+        return now - entry.touched > self.idle_ttl_seconds or (entry.deadline is not None and now >= entry.deadline)
+
+    def get(self, key: Hashable, now: Optional[float] = None) -> Optional[V]:
+        now = now if now is not None else time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if self._expired(entry, now):
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            entry.touched = now
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.value
+
+    def put(self, key: Hashable, value: V, deadline: Optional[float] = None, now: Optional[float] = None) -> None:
+        now = now if now is not None else time.time()
+        with self._lock:
+            self._entries[key] = _Entry(value, now, deadline)
+            self._entries.move_to_end(key)
+            self._sweep(now)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def peek(self, key: Hashable) -> Optional[V]:
+        """Read without counting a use (no recency, expiry or hit/miss update)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry.value if entry is not None else None
+
+    def replace(self, key: Hashable, value: V) -> bool:
+        """Swap the value of an existing entry without counting it as a use."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False
+            entry.value = value
+            return True
+
+    def keys(self, now: Optional[float] = None) -> List[Hashable]:
+        """Live keys, least recently used first (not counted as uses)."""
+        now = now if now is not None else time.time()
+        with self._lock:
+            self._sweep(now)
+            return [k for k, e in self._entries.items() if e.deadline is None or now < e.deadline]
+
+    def pop(self, key: Hashable) -> Optional[V]:
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            return entry.value if entry is not None else None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _sweep(self, now: float) -> None:
+        while self._entries:
+            entry = next(iter(self._entries.values()))
+            if now - entry.touched <= self.idle_ttl_seconds:
+                return
+            self._entries.popitem(last=False)
+            self.expirations += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxEntries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
@@ -0,0 +1,187 @@
+import os
+import re
+import threading
+import time
+import zlib
+from functools import lru_cache
+from datetime import datetime, timedelta, timezone, tzinfo
+from typing import Dict, Optional, Tuple
+
+
+def _local_tz() -> tzinfo:
+    # Booking time slots are temple-local wall-clock times.
+    name = os.getenv("TEMPLE_TIMEZONE", "Asia/Kolkata")
+    try:
+        from zoneinfo import ZoneInfo
+
+        return ZoneInfo(name)
+    except Exception:
+        return timezone(timedelta(hours=5, minutes=30))
+
+
+_SLOT_TIME = r"(\d{1,2})(?::(\d{2}))?\s*([AaPp]\.?[Mm]\.?)?"
+_SLOT_RE = re.compile(rf"^\s*{_SLOT_TIME}\s*(?:-|–|to)\s*{_SLOT_TIME}\s*$")
+
+
+def _to_minutes(hour: str, minute: Optional[str], meridiem: Optional[str]) -> Optional[int]:
+    h, m = int(hour), int(minute or 0)
+    if meridiem:
+        if not 1 <= h <= 12:
+            return None
+        h = h % 12 + (12 if meridiem[0] in "Pp" else 0)
+    if h > 23 or m > 59:
+        return None
+    return h * 60 + m
+
+
+# A handful of distinct slot strings are shared by every subscriber.
+@lru_cache(maxsize=1024)
+def parse_time_slot(value: Optional[str]) -> Optional[Tuple[int, int]]:
+    """``"06:00 AM - 08:00 AM"`` / ``"06:00-07:00"`` -> (start, end) minutes of day."""
+    match = _SLOT_RE.match(value or "")
+    if not match:
+        return None
+    h1, m1, ap1, h2, m2, ap2 = match.groups()
+    # "10 - 11 AM": the start inherits the end's meridiem.
+    start = _to_minutes(h1, m1, ap1 or ap2)
+    end = _to_minutes(h2, m2, ap2)
+    if start is None or end is None:
+        return None
+    if end <= start:
+        end += 24 * 60
+    return start, end
+
+
+def slot_end_at(time_slot: Optional[str], now: Optional[float] = None, tz: Optional[tzinfo] = None) -> Optional[float]:
+    """Epoch seconds when today's ``time_slot`` ends, or None if unparseable or already over."""
+    slot = parse_time_slot(time_slot)
+    if slot is None:
+        return None
+    now = now if now is not None else time.time()
+    local = datetime.fromtimestamp(now, tz or _local_tz())
+    midnight = local.replace(hour=0, minute=0, second=0, microsecond=0)
+    end = (midnight + timedelta(minutes=slot[1])).timestamp()
+    return end if end > now else None
+
+
+def _epoch_seconds(value: Optional[str]) -> Optional[float]:
+    try:
+        dt = datetime.fromisoformat(str(value))
+    except (TypeError, ValueError):
+        return None
+    return (dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)).timestamp()
+
+
+def shard_hash(key: str) -> int:
+    # crc32 is stable across processes and restarts (unlike hash()).
+    return zlib.crc32(key.encode("utf-8"))
+
+
+def shard_of(key: str, shards: int) -> int:
+    return (shard_hash(key) * shards) >> 32
+
+
+def shard_range(shard: int, shards: int) -> Tuple[int, int]:
+    """``[low, high)`` of the ``shard_hash`` values in ``shard``.
+
+    Shards are contiguous hash ranges rather than residues, so a store that
+    keeps the hash in an index reads one range per shard.
+    """
+    return -((-shard << 32) // shards), -((-(shard + 1) << 32) // shards)
+
+
+class DispatchPlan:
+    """Spreads one notification round over its interval and filters who gets a message.
+
+    Subscribers are hash-sharded into ``shards`` buckets and one bucket is due
+    per tick (``interval / shards`` seconds), so each subscriber is visited once
+    per interval but outbound traffic is smooth instead of one burst. Buckets
+    are taken in turn by ``next_shard``, once per run: a late, skipped or
+    overlapping tick only delays the rest of the round, it never drops one.
+    A visited subscriber is only notified when
+
+    - their booked time slot is upcoming (starts within ``lead_minutes``) or in
+      progress, and the estimated wait moved by ``wait_delta`` minutes or they
+      haven't heard from us for a full interval; or
+    - they have no recognisable time slot, and the wait moved meaningfully or
+      nothing has been sent for ``max_quiet_seconds``.
+
+    Subscribers whose slot is over for the day, or still far off, are skipped.
+    """
+
+    def __init__(
+        self,
+        interval_seconds: int,
+        shards: Optional[int] = None,
+        lead_minutes: Optional[int] = None,
+        wait_delta: Optional[int] = None,
+        max_quiet_seconds: Optional[int] = None,
+    ):
+        self.interval_seconds = max(1, int(interval_seconds))
+        self.shards = max(1, int(shards or os.getenv("NOTIFICATION_SHARDS", "12")))
+        self.tick_seconds = max(1.0, self.interval_seconds / self.shards)
+        self.lead_minutes = int(lead_minutes if lead_minutes is not None else os.getenv("NOTIFICATION_SLOT_LEAD_MINUTES", "120"))
+        self.wait_delta = int(wait_delta if wait_delta is not None else os.getenv("NOTIFICATION_WAIT_DELTA_MINUTES", "10"))
+        self.max_quiet_seconds = int(
+            max_quiet_seconds if max_quiet_seconds is not None
+            else os.getenv("NOTIFICATION_MAX_QUIET_SECONDS", str(3 * self.interval_seconds))
+        )
+        self._tz = _local_tz()
+        # Last wait we told each subscriber about (per process; after a restart
+        # the last_sent_at staleness rule takes over).
+        self._last_wait: Dict[str, int] = {}
+        self._next_shard: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def next_shard(self, now: Optional[float] = None) -> int:
+        """The shard this run visits; every call moves on to the next one.
+
+        The first call starts from the clock, so a process that takes over
+        leadership carries on roughly where the previous leader was.
+        """
+        with self._lock:
+            if self._next_shard is None:
+                now = now if now is not None else time.time()
+                self._next_shard = int(now // self.tick_seconds) % self.shards
+            shard = self._next_shard
+            self._next_shard = (shard + 1) % self.shards
+            return shard
+
+    def _slot_state(self, time_slot: Optional[str], now: float) -> Optional[str]:
+        slot = parse_time_slot(time_slot)
+        if slot is None:
+            return None
+        local = datetime.fromtimestamp(now, self._tz)
+        minute = local.hour * 60 + local.minute
+        start, end = slot
+        if minute >= end:
+            return "over"
+        if start - minute > self.lead_minutes:
+            return "later"
+        return "upcoming"
+
+    def should_send(self, key: str, time_slot: Optional[str], wait_minutes: int, last_sent_at: Optional[str], now: Optional[float] = None) -> bool:
+        now = now if now is not None else time.time()
+        state = self._slot_state(time_slot, now)
+        if state in ("over", "later"):
+            return False
+
+        sent_at = _epoch_seconds(last_sent_at) if last_sent_at else None
+        if sent_at is None:
+            # Never sent (or an unparseable stamp): always worth a message.
+            return True
+        quiet = now - sent_at
+        with self._lock:
+            previous = self._last_wait.get(key)
+        if previous is not None and abs(wait_minutes - previous) >= self.wait_delta:
+            return True
+        limit = self.interval_seconds - self.tick_seconds if state == "upcoming" else self.max_quiet_seconds
+        return quiet >= limit
+
+    def record_sent(self, key: str, wait_minutes: int) -> None:
+        with self._lock:
+            self._last_wait[key] = wait_minutes
+
+    def forget(self, key: str) -> None:
+        with self._lock:
+            self._last_wait.pop(key, None)
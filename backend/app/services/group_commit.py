@@ -0,0 +1,106 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+class GroupCommitWriter:
+    """Persists items submitted concurrently in shared batches on a writer thread.
+
+    ``submit`` queues an item and returns a ``Future`` (await it with
+    ``asyncio.wrap_future``). The writer takes the first waiting item, keeps
+    collecting for up to ``window_seconds`` or ``max_batch`` items, hands the
+    whole batch to ``commit`` (one log write + one fsync for bookings) and only
+    then resolves every future, so nobody is acknowledged before their write
+    is durable. Items that queue up while a commit is running form the next
+    batch even with a zero window, so the batch size follows the load.
+
+    If ``commit`` raises, every future in that batch gets the exception.
+    """
+
+    def __init__(
+        self,
+        commit: Callable[[List[Any]], List[Any]],
+        window_seconds: Optional[float] = None,
+        max_batch: Optional[int] = None,
+        name: str = "group-commit",
+    ):
+        self._commit = commit
+        if window_seconds is None:
+            window_seconds = float(os.getenv("GROUP_COMMIT_WINDOW_MS", "0")) / 1000.0
+        self.window_seconds = max(0.0, float(window_seconds))
+        self.max_batch = max(1, int(max_batch or os.getenv("GROUP_COMMIT_MAX_BATCH", "256")))
+        self.name = name
+        self._queue: "queue.Queue[Optional[Tuple[Any, Future]]]" = queue.Queue()
+        self.batches = 0
+        self.failed_batches = 0
+        self.commit_seconds = 0.0
+        self.slowest_commit = 0.0
+        self.items = 0
+        self.largest_batch = 0
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, item: Any) -> Future:
+        future: Future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Commit what is already queued, then stop the writer."""
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _collect(self, first: Tuple[Any, Future]) -> Tuple[List[Tuple[Any, Future]], bool]:
+        batch = [first]
+        deadline = time.monotonic() + self.window_seconds
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                entry = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is None:
+                return batch, True
+            batch.append(entry)
+        return batch, False
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch, stopping = self._collect(first)
+            started = time.perf_counter()
+            try:
+                results = self._commit([item for item, _ in batch])
+            except Exception as e:
+                self.failed_batches += 1
+                print(f"[{self.name}][error] commit failed batch={len(batch)} err={e}")
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            elapsed = time.perf_counter() - started
+            self.commit_seconds += elapsed
+            self.slowest_commit = max(self.slowest_commit, elapsed)
+            self.batches += 1
+            self.items += len(batch)
+            self.largest_batch = max(self.largest_batch, len(batch))
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "averageBatch": round(self.items / self.batches, 2) if self.batches else 0,
+            "largestBatch": self.largest_batch,
+            "failedBatches": self.failed_batches,
+            "averageCommitMs": round(self.commit_seconds * 1000 / self.batches, 3) if self.batches else 0,
+            "slowestCommitMs": round(self.slowest_commit * 1000, 3),
+            "queued": self._queue.qsize(),
+            "windowMs": self.window_seconds * 1000,
+        }
@@ -0,0 +1,118 @@
+import os
+import threading
+import time
+from typing import Optional
+
+
+# Snowflake layout: 41 bits of milliseconds since EPOCH_MS, 10 bits of worker
+# id, 12 bits of per-millisecond sequence.
+EPOCH_MS = 1704067200000  # 2024-01-01T00:00:00Z
+WORKER_BITS = 10
+SEQUENCE_BITS = 12
+MAX_WORKER = (1 << WORKER_BITS) - 1
+_SEQUENCE_MASK = (1 << SEQUENCE_BITS) - 1
+_TIME_SHIFT = WORKER_BITS + SEQUENCE_BITS
+_time_ns = time.time_ns
+
+# Crockford base32, in ascending ASCII order so string order == numeric order.
+_ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+_PAIRS = [a + b for a in _ALPHABET for b in _ALPHABET]  # 10 bits -> 2 chars
+_DECODE = {c: i for i, c in enumerate(_ALPHABET)}
+ID_LENGTH = 13  # 63 bits: one 3-bit char and six 10-bit pairs
+
+
+def _encode(n: int) -> str:
+    p = _PAIRS
+    return (
+        _ALPHABET[n >> 60] + p[(n >> 50) & 1023] + p[(n >> 40) & 1023] + p[(n >> 30) & 1023]
+        + p[(n >> 20) & 1023] + p[(n >> 10) & 1023] + p[n & 1023]
+    )
+
+
+def _decode(text: str) -> int:
+    n = 0
+    for c in text[-ID_LENGTH:].upper():
+        n = (n << 5) | _DECODE[c]
+    return n
+
+
+def _default_worker_id() -> int:
+    raw = os.getenv("WORKER_ID")
+    if raw:
+        return int(raw) & MAX_WORKER
+    return os.getpid() & MAX_WORKER
+
+
+class IdGenerator:
+    """Time-ordered, unique ids (Snowflake-style).
+
+    An id is the millisecond, this process's worker id and a sequence within
+    the millisecond, rendered as 13 fixed-width Crockford base32 characters
+    after an optional prefix (``BKG``, ``ALT``, ...). Ids from one process
+    are strictly increasing, and ids with the same prefix sort by creation
+    time across processes, so they work as range-scan keys.
+
+    Processes must not share a worker id: set ``WORKER_ID`` (0-1023) per
+    process, otherwise the pid is used. If the clock steps back, or more than
+    4096 ids are taken in one millisecond, ids continue from the last
+    millisecond used rather than waiting, so they never repeat.
+    """
+
+    def __init__(self, worker_id: Optional[int] = None):
+        self.worker_id = (_default_worker_id() if worker_id is None else int(worker_id)) & MAX_WORKER
+        self._worker_bits = self.worker_id << SEQUENCE_BITS
+        self._last_ms = 0
+        self._sequence = 0
+        self._head = (-1, "")  # (n >> 20, first 9 chars), fixed within a millisecond
+        self._lock = threading.Lock()
+
+    def next_int(self) -> int:
+        now = _time_ns() // 1_000_000 - EPOCH_MS
+        self._lock.acquire()
+        try:
+            if now > self._last_ms:
+                self._last_ms = now
+                self._sequence = 0
+            else:
+                self._sequence = (self._sequence + 1) & _SEQUENCE_MASK
+                if self._sequence == 0:
+                    self._last_ms += 1
+            return (self._last_ms << _TIME_SHIFT) | self._worker_bits | self._sequence
+        finally:
+            self._lock.release()
+
+    def new_id(self, prefix: str = "") -> str:
+        n = self.next_int()
+        # Within a millisecond only the low 20 bits (worker tail + sequence)
+        # change, so the first 9 characters are encoded once per millisecond.
+        key, head = self._head
+        if key != n >> 20:
+            head = _encode(n)[:9]
+            self._head = (n >> 20, head)
+        return prefix + head + _PAIRS[(n >> 10) & 1023] + _PAIRS[n & 1023]
+
+    def _after_fork(self) -> None:
+        # A forked child must not hand out the parent's ids.
+        self.__init__()
+
+
+_generator = IdGenerator()
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_generator._after_fork)
+
+
+def new_id(prefix: str = "") -> str:
+    """A new unique id, e.g. ``new_id("BKG")`` -> ``"BKG0V8Q1MZ3K4000"``."""
+    return _generator.new_id(prefix)
+
+
+def id_timestamp(id_: str) -> float:
+    """Epoch seconds at which ``id_`` was generated."""
+    return ((_decode(id_) >> _TIME_SHIFT) + EPOCH_MS) / 1000.0
+
+
+def id_floor(at: float, prefix: str = "") -> str:
+    """The smallest id that could be generated at epoch seconds ``at``;
+    ``id_floor(t0, p) <= id < id_floor(t1, p)`` selects ids made in [t0, t1)."""
+    ms = max(0, int(at * 1000) - EPOCH_MS)
+    return prefix + _encode(ms << _TIME_SHIFT)
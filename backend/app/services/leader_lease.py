@@ -0,0 +1,203 @@
+import os
+import socket
+import sqlite3
+import threading
+import time
+from typing import Optional
+from uuid import uuid4
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to the SQLite lease
+    fcntl = None
+
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "data")
+
+
+def _holder_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:8]}"
+
+
+class LeaderLease:
+    """Lets exactly one process run a scheduled job at a time.
+
+    ``try_acquire`` is called periodically by every process: it takes the lease
+    if nobody holds it (or the holder stopped renewing) and renews it if we
+    already hold it. ``is_leader`` is a cheap local check used by the jobs.
+    """
+
+    def __init__(self, name: str, ttl_seconds: float):
+        self.name = name
+        self.ttl_seconds = max(1.0, float(ttl_seconds))
+        self.holder = _holder_id()
+        self._expires_at = 0.0  # time.monotonic() deadline of our current term
+        self._lock = threading.Lock()
+
+    @property
+    def is_leader(self) -> bool:
+        return time.monotonic() < self._expires_at
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            started = time.monotonic()
+            try:
+                won = self._acquire()
+            except Exception as e:
+                print(f"[lease][error] name={self.name} err={e}")
+                won = False
+            was_leader = self.is_leader
+            # Count our term from before the round trip so we never think we
+            # hold the lease longer than the backend does.
+            self._expires_at = started + self.ttl_seconds if won else 0.0
+            if won != was_leader:
+                print(f"[lease] name={self.name} holder={self.holder} leader={won}")
+            return won
+
+    def release(self) -> None:
+        with self._lock:
+            if self._expires_at:
+                try:
+                    self._release()
+                except Exception as e:
+                    print(f"[lease][error] name={self.name} err={e}")
+            self._expires_at = 0.0
+
+    def _acquire(self) -> bool:
+        raise NotImplementedError
+
+    def _release(self) -> None:
+        raise NotImplementedError
+
+
+class FileLease(LeaderLease):
+    """``flock`` on a file: the OS drops it the moment the holder exits, so
+    failover is immediate. Covers several workers on one host."""
+
+    def __init__(self, name: str, ttl_seconds: float, directory: str = DATA_DIR):
+        super().__init__(name, ttl_seconds)
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(os.path.abspath(directory), f"{name}.leader.lock")
+        self._file = None
+
+    def _acquire(self) -> bool:
+        if self._file is not None:
+            return True
+        f = open(self.path, "a")
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            return False
+        self._file = f
+        return True
+
+    def _release(self) -> None:
+        if self._file is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+
+
+class SqliteLease(LeaderLease):
+    """A row per lease with holder and wall-clock expiry in a shared SQLite file;
+    a dead leader is replaced once its term runs out."""
+
+    def __init__(self, name: str, ttl_seconds: float, path: Optional[str] = None):
+        super().__init__(name, ttl_seconds)
+        self.path = os.path.abspath(path or os.path.join(DATA_DIR, "leases.db"))
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute("CREATE TABLE IF NOT EXISTS leases (name TEXT PRIMARY KEY, holder TEXT NOT NULL, expires_at REAL NOT NULL)")
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=10, isolation_level=None)
+
+    def _acquire(self) -> bool:
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            now = time.time()
+            row = conn.execute("SELECT holder, expires_at FROM leases WHERE name = ?", (self.name,)).fetchone()
+            if row and row[0] != self.holder and row[1] > now:
+                conn.execute("ROLLBACK")
+                return False
+            conn.execute(
+                "INSERT OR REPLACE INTO leases (name, holder, expires_at) VALUES (?, ?, ?)",
+                (self.name, self.holder, now + self.ttl_seconds),
+            )
+            conn.execute("COMMIT")
+            return True
+        finally:
+            conn.close()
+
+    def _release(self) -> None:
+        conn = self._connect()
+        try:
+            conn.execute("DELETE FROM leases WHERE name = ? AND holder = ?", (self.name, self.holder))
+        finally:
+            conn.close()
+
+
+_REDIS_RENEW = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+_REDIS_RELEASE = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class RedisLease(LeaderLease):
+    """``SET key holder NX PX ttl`` in Redis; renew/release only if we still own
+    the key. Use this when the API runs on several hosts."""
+
+    def __init__(self, name: str, ttl_seconds: float, url: str):
+        super().__init__(name, ttl_seconds)
+        import redis
+
+        self.key = f"leader:{name}"
+        self._redis = redis.Redis.from_url(url, socket_timeout=5)
+        self._renew = self._redis.register_script(_REDIS_RENEW)
+        self._release_script = self._redis.register_script(_REDIS_RELEASE)
+
+    def _acquire(self) -> bool:
+        ttl_ms = int(self.ttl_seconds * 1000)
+        if self._redis.set(self.key, self.holder, nx=True, px=ttl_ms):
+            return True
+        return bool(self._renew(keys=[self.key], args=[self.holder, ttl_ms]))
+
+    def _release(self) -> None:
+        self._release_script(keys=[self.key], args=[self.holder])
+
+
+class LocalLease(LeaderLease):
+    """Always the leader: single-process deployments and local development."""
+
+    def _acquire(self) -> bool:
+        return True
+
+    def _release(self) -> None:
+        pass
+
+
+def create_leader_lease(name: str) -> LeaderLease:
+    """Pick a lease backend from ``LEADER_LEASE_BACKEND`` (file|sqlite|redis|none)."""
+    ttl = float(os.getenv("LEADER_LEASE_TTL_SECONDS", "30"))
+    backend = (os.getenv("LEADER_LEASE_BACKEND") or "file").strip().lower()
+    if backend == "none":
+        return LocalLease(name, ttl)
+    if backend == "redis":
+        return RedisLease(name, ttl, os.getenv("REDIS_URL") or "redis://localhost:6379")
+    if backend == "sqlite" or fcntl is None:
+        return SqliteLease(name, ttl, os.getenv("LEADER_LEASE_DB_PATH"))
+    return FileLease(name, ttl)
@@ -0,0 +1,159 @@
+import asyncio
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, List, Optional, Set
+
+
+class HubSubscriber:
+    """One consumer's mailbox: at most one pending message per topic.
+
+    Publishing onto a topic that still has an undelivered message replaces it
+    (latest wins), so a consumer that falls behind skips intermediate states
+    instead of building a backlog.
+    """
+
+    __slots__ = ("topics", "_pending", "_ready", "closed", "close_reason", "lag_since", "coalesced")
+
+    def __init__(self):
+        self.topics: Set[Hashable] = set()
+        self._pending: Dict[Hashable, Any] = {}
+        self._ready = asyncio.Event()
+        self.closed = False
+        self.close_reason: Optional[str] = None
+        self.lag_since: Optional[float] = None  # when the oldest pending message arrived
+        self.coalesced = 0
+
+    def _deliver(self, topic: Hashable, message: Any, now: float) -> bool:
+        replaced = topic in self._pending
+        if replaced:
+            self.coalesced += 1
+        elif self.lag_since is None:
+            self.lag_since = now
+        self._pending[topic] = message
+        self._ready.set()
+        return replaced
+
+    def _close(self, reason: str) -> None:
+        if not self.closed:
+            self.closed = True
+            self.close_reason = reason
+            self._pending.clear()
+            self._ready.set()
+
+    async def next_batch(self) -> List[Any]:
+        """Wait for pending messages and take them all; [] once closed."""
+        while not self._pending and not self.closed:
+            self._ready.clear()
+            await self._ready.wait()
+        if self.closed:
+            return []
+        batch = list(self._pending.values())
+        self._pending.clear()
+        self.lag_since = None
+        return batch
+
+
+class LiveHub:
+    """In-process pub/sub for live updates.
+
+    Messages are encoded once by the publisher and the same object is handed
+    to every subscriber of a topic, so fan-out costs a dict assignment per
+    subscriber. Each subscriber is drained by its own ``pump`` coroutine, so a
+    slow client only delays itself. A consumer is disconnected when a single
+    send blocks for ``LIVE_SEND_TIMEOUT_SECONDS`` or when it has left a
+    message undelivered for ``LIVE_MAX_LAG_SECONDS``, bounding what the
+    server buffers for it.
+    """
+
+    def __init__(self, send_timeout_seconds: Optional[float] = None, max_lag_seconds: Optional[float] = None):
+        self.send_timeout_seconds = float(send_timeout_seconds or os.getenv("LIVE_SEND_TIMEOUT_SECONDS", "10"))
+        self.max_lag_seconds = float(max_lag_seconds or os.getenv("LIVE_MAX_LAG_SECONDS", "30"))
+        self._topics: Dict[Hashable, Set[HubSubscriber]] = {}
+        self.published = 0
+        self.delivered = 0
+        self.coalesced = 0
+        self.disconnected = 0
+
+    def subscribe(self, topics: Iterable[Hashable] = ()) -> HubSubscriber:
+        sub = HubSubscriber()
+        for topic in topics:
+            self.add_topic(sub, topic)
+        return sub
+
+    def add_topic(self, sub: HubSubscriber, topic: Hashable) -> None:
+        sub.topics.add(topic)
+        self._topics.setdefault(topic, set()).add(sub)
+
+    def remove_topic(self, sub: HubSubscriber, topic: Hashable) -> None:
+        sub.topics.discard(topic)
+        subs = self._topics.get(topic)
+        if subs is not None:
+            subs.discard(sub)
+            if not subs:
+                del self._topics[topic]
+
+    def unsubscribe(self, sub: HubSubscriber) -> None:
+        for topic in list(sub.topics):
+            self.remove_topic(sub, topic)
+        sub._close("unsubscribed")
+
+    def topics(self) -> List[Hashable]:
+        """Topics that currently have at least one subscriber."""
+        return list(self._topics)
+
+    def subscribers(self, topic: Hashable) -> int:
+        return len(self._topics.get(topic, ()))
+
+    def _disconnect(self, sub: HubSubscriber, reason: str) -> None:
+        if not sub.closed:
+            self.disconnected += 1
+            print(f"[live] dropping slow consumer reason={reason}")
+        for topic in list(sub.topics):
+            self.remove_topic(sub, topic)
+        sub._close(reason)
+
+    def deliver(self, sub: HubSubscriber, topic: Hashable, message: Any) -> None:
+        """Send to one subscriber only (e.g. the current state on join)."""
+        if not sub.closed and sub._deliver(topic, message, time.monotonic()):
+            self.coalesced += 1
+
+    def publish(self, topic: Hashable, message: Any) -> int:
+        subs = self._topics.get(topic)
+        if not subs:
+            return 0
+        self.published += 1
+        now = time.monotonic()
+        laggards = []
+        for sub in subs:
+            if sub.lag_since is not None and now - sub.lag_since > self.max_lag_seconds:
+                laggards.append(sub)
+                continue
+            if sub._deliver(topic, message, now):
+                self.coalesced += 1
+        for sub in laggards:
+            self._disconnect(sub, "lagging")
+        return len(subs) - len(laggards)
+
+    async def pump(self, sub: HubSubscriber, send: Callable[[Any], Awaitable[None]]) -> None:
+        """Drain ``sub`` into ``send`` until it is closed or a send times out."""
+        while True:
+            batch = await sub.next_batch()
+            if not batch:
+                return
+            for message in batch:
+                try:
+                    await asyncio.wait_for(send(message), timeout=self.send_timeout_seconds)
+                except asyncio.TimeoutError:
+                    self._disconnect(sub, "send timeout")
+                    return
+                self.delivered += 1
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "topics": len(self._topics),
+            "subscribers": len({s for subs in self._topics.values() for s in subs}),
+            "published": self.published,
+            "delivered": self.delivered,
+            "coalesced": self.coalesced,
+            "disconnected": self.disconnected,
+        }
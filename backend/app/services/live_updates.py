@@ -0,0 +1,141 @@
+import asyncio
+import json
+import os
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+from .live_hub import HubSubscriber, LiveHub
+
+
+# Fields that change on every computation without the state having changed.
+_VOLATILE_KEYS = ("lastUpdated", "estimatedEntryTime")
+
+
+class LiveUpdate:
+    """One computed update, encoded once and shared by every listener.
+
+    ``sse`` is the ready-to-write event-stream bytes. ``ws`` stays a ``str``
+    because ASGI text frames (what the browser client JSON-parses) must be
+    ``str``; the same object is still shared by all WebSocket listeners.
+    """
+
+    __slots__ = ("type", "ws", "sse")
+
+    def __init__(self, type_: str, payload: Dict[str, Any]):
+        data = json.dumps(payload, separators=(",", ":"))
+        self.type = type_
+        self.ws = f'{{"type":"{type_}","payload":{data}}}'
+        self.sse = f"event: {type_}\ndata: {data}\n\n".encode("utf-8")
+
+
+def temple_topic(temple: str) -> Tuple[str, str]:
+    return ("temple", temple)
+
+
+def booking_topic(booking_id: str, temple: str, queue_number: int) -> Tuple[str, str, str, int]:
+    return ("booking", booking_id, temple, int(queue_number))
+
+
+class LiveChannel:
+    """Produces live temple status and queue positions for the ``LiveHub``.
+
+    Every ``LIVE_PUSH_INTERVAL_SECONDS`` the channel computes one status per
+    temple topic and one queue status per booking topic that has subscribers,
+    compares it with what was last published (ignoring timestamps), and only
+    on a change encodes it once and publishes it. Clients no longer poll; an
+    idle temple costs one cheap computation per interval. Computing may look
+    up a booking (and wait on the booking store), so it runs in the
+    threadpool; comparing and publishing stay on the event loop.
+    """
+
+    def __init__(
+        self,
+        temple_update: Callable[[str], Dict[str, Any]],
+        booking_update: Callable[[str, str, int], Dict[str, Any]],
+        interval_seconds: Optional[float] = None,
+        hub: Optional[LiveHub] = None,
+    ):
+        self._temple_update = temple_update
+        self._booking_update = booking_update
+        self.interval_seconds = float(interval_seconds or os.getenv("LIVE_PUSH_INTERVAL_SECONDS", "2"))
+        self.hub = hub or LiveHub()
+        self._last: Dict[Hashable, Tuple[Dict[str, Any], LiveUpdate]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def _build(self, topic: Hashable) -> Tuple[str, Dict[str, Any]]:
+        if topic[0] == "temple":
+            return "live_data", self._temple_update(topic[1])
+        return "queue_status", self._booking_update(*topic[1:])
+
+    def _diff(self, topic: Hashable, built: Tuple[str, Dict[str, Any]]) -> Tuple[LiveUpdate, bool]:
+        type_, payload = built
+        stable = {k: v for k, v in payload.items() if k not in _VOLATILE_KEYS}
+        last = self._last.get(topic)
+        if last is not None and last[0] == stable:
+            return last[1], False
+        update = LiveUpdate(type_, payload)
+        self._last[topic] = (stable, update)
+        return update, True
+
+    async def _join(self, sub: HubSubscriber, topic: Hashable) -> None:
+        # Start the new client from the current state; if that state is news,
+        # everyone already listening gets it too.
+        update, changed = self._diff(topic, await run_in_threadpool(self._build, topic))
+        self.hub.add_topic(sub, topic)
+        if changed:
+            self.hub.publish(topic, update)
+        else:
+            self.hub.deliver(sub, topic, update)
+
+    async def subscribe(self, temple: str) -> HubSubscriber:
+        sub = self.hub.subscribe()
+        await self._join(sub, temple_topic(temple))
+        return sub
+
+    async def watch_booking(self, sub: HubSubscriber, temple: str, booking_id: str, queue_number: int) -> None:
+        for topic in [t for t in sub.topics if t[0] == "booking"]:
+            self.hub.remove_topic(sub, topic)
+        await self._join(sub, booking_topic(booking_id, temple, queue_number))
+
+    def unsubscribe(self, sub: HubSubscriber) -> None:
+        self.hub.unsubscribe(sub)
+
+    async def tick(self) -> int:
+        """Publish every changed topic; returns how many topics changed."""
+        topics = self.hub.topics()
+        # Building can wait on the booking store, so it runs in the threadpool;
+        # only comparing and publishing happen on the event loop.
+        built = await run_in_threadpool(lambda: [self._build(topic) for topic in topics])
+        changed = 0
+        for topic, item in zip(topics, built):
+            update, is_new = self._diff(topic, item)
+            if is_new:
+                self.hub.publish(topic, update)
+                changed += 1
+        # Forget state nobody listens to any more.
+        live = set(self.hub.topics())
+        for topic in [t for t in self._last if t not in live]:
+            del self._last[topic]
+        return changed
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            try:
+                await self.tick()
+            except Exception as e:
+                print(f"[live][error] tick failed err={e}")
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -1,15 +1,20 @@
 import os
 import random
+import time
 from datetime import datetime, timezone
 from typing import Optional
 
 from apscheduler.schedulers.background import BackgroundScheduler
 
+from .dispatch_schedule import DispatchPlan
+from .leader_lease import LeaderLease, create_leader_lease
 from .notifications_store import NotificationStore
+from .queue_engine import QueueEngine
 from .sms_sender import SmsSender
 
 
 _scheduler: Optional[BackgroundScheduler] = None
+_lease: Optional[LeaderLease] = None
 
 
 def _build_message(temple: str, queue_number: int, wait_minutes: int) -> str:
@@ -22,50 +27,86 @@ def _build_message(temple: str, queue_number: int, wait_minutes: int) -> str:
     )
 
 
-def start_scheduler(store: NotificationStore) -> BackgroundScheduler:
-    global _scheduler
+def start_scheduler(
+    store: NotificationStore, lease: Optional[LeaderLease] = None, engine: Optional[QueueEngine] = None
+) -> BackgroundScheduler:
+    global _scheduler, _lease
     if _scheduler and _scheduler.running:
         return _scheduler
 
     sender = SmsSender()
+    lease = lease or create_leader_lease("sms_notifications")
 
-    def job() -> None:
-        subs = store.load_all()
-        for s in subs:
-            if not s.enabled:
-                continue
-
-            # For now we simulate the wait time (you can wire this to real sensors/live endpoints later)
-            base = 45
-            jitter = random.randint(-8, 10)
-            wait_minutes = max(5, base + jitter)
-
-            body = _build_message(s.temple, s.queue_number, wait_minutes)
-            try:
-                sender.send_sms(s.phone_e164, body)
-                store.mark_sent(s.id)
-            except Exception as e:
-                print(f"[sms][error] subscription={s.id} to={s.phone_e164} err={e}")
-
-    # Default: hourly notifications
+    # Default: hourly notifications, spread over the hour in shards
     interval_seconds = int(os.getenv("NOTIFICATION_INTERVAL_SECONDS", "3600"))
+    plan = DispatchPlan(interval_seconds)
+
+    # Subscriptions are streamed in batches: each batch is sent and committed
+    # before the next is read, so a run's memory doesn't grow with the list.
+    batch_size = int(os.getenv("SCHEDULER_BATCH_SIZE", "500"))
+
+    def job() -> None:
+        now = time.time()
+        # Followers advance too, so a new leader picks up the rotation.
+        shard = plan.next_shard(now)
+        if not lease.is_leader:
+            return
+        waits = {}
+        for batch in store.iter_enabled(batch_size=batch_size, shard=(shard, plan.shards)):
+            items = []
+            item_waits = {}
+            for s in batch:
+                if engine is not None:
+                    wait_minutes = engine.estimate(s.temple, s.queue_number, now, time_slot=s.time_slot).wait_minutes
+                else:
+                    # No queue engine: simulate one wait per temple per run
+                    if s.temple not in waits:
+                        base = 45
+                        jitter = random.randint(-8, 10)
+                        waits[s.temple] = max(5, base + jitter)
+                    wait_minutes = waits[s.temple]
+
+                if not plan.should_send(s.id, s.time_slot, wait_minutes, s.last_sent_at, now):
+                    continue
+                item_waits[s.id] = wait_minutes
+                items.append((s.id, s.phone_e164, _build_message(s.temple, s.queue_number, wait_minutes)))
+
+            sent_ids = []
+            for result in sender.send_many(items):
+                if result.ok:
+                    sent_ids.append(result.key)
+                    plan.record_sent(result.key, item_waits[result.key])
+                else:
+                    print(f"[sms][error] subscription={result.key} err={result.error}")
+
+            # Commit each batch in one write.
+            if sent_ids:
+                store.mark_sent_many(sent_ids)
 
     sched = BackgroundScheduler(timezone="UTC")
-    sched.add_job(job, "interval", seconds=interval_seconds, id="hourly_sms", replace_existing=True)
+    # Every process runs the scheduler, but only the lease holder sends; the
+    # heartbeat renews our term or takes over when the leader stops renewing.
+    lease.try_acquire()
+    sched.add_job(lease.try_acquire, "interval", seconds=max(1.0, lease.ttl_seconds / 3), id="hourly_sms_lease", replace_existing=True)
+    sched.add_job(job, "interval", seconds=plan.tick_seconds, id="hourly_sms", replace_existing=True, coalesce=True)
     sched.start()
 
     _scheduler = sched
-    print(f"[notifications] scheduler started interval_seconds={interval_seconds}")
-    print(f"[notifications] twilio_configured={sender.is_configured()}")
+    _lease = lease
+    print(f"[notifications] scheduler started interval_seconds={interval_seconds} shards={plan.shards}")
+    print(f"[notifications] twilio_configured={sender.is_configured()} concurrency={sender.concurrency}")
 
     return sched
 
 
 def stop_scheduler() -> None:
-    global _scheduler
+    global _scheduler, _lease
     if _scheduler:
         try:
             _scheduler.shutdown(wait=False)
         except Exception:
             pass
         _scheduler = None
+    if _lease:
+        _lease.release()
+        _lease = None
@@ -1,10 +1,10 @@
-import json
 import os
-import threading
-from dataclasses import asdict, dataclass
 from datetime import datetime, timezone
-from typing import List, Optional
-from uuid import uuid4
+from typing import Any, Dict, Iterable, Optional
+
+from .ids import new_id
+from .record_store import RecordStore
+from .records import CompactRecord, intern_text, pack_timestamp, unpack_timestamp
 
 
 DATA_FILE = os.path.join(os.path.dirname(__file__), "..", "data", "notification_subscriptions.json")
@@ -34,114 +34,126 @@ def normalize_phone_to_e164(phone: str) -> str:
     raise ValueError("Invalid phone number")
 
 
-@dataclass
-class NotificationSubscription:
-    id: str
-    booking_id: str
-    phone_e164: str
-    temple: str
-    queue_number: int
-    time_slot: Optional[str]
-    enabled: bool
-    created_at: str
-    last_sent_at: Optional[str]
-
-
-class NotificationStore:
-    def __init__(self, path: str = DATA_FILE):
-        self._path = os.path.abspath(path)
-        # Re-entrant because store methods may call each other.
-        self._lock = threading.RLock()
-        os.makedirs(os.path.dirname(self._path), exist_ok=True)
-
-    def load_all(self) -> List[NotificationSubscription]:
-        with self._lock:
-            if not os.path.exists(self._path):
-                return []
-            try:
-                with open(self._path, "r", encoding="utf-8") as f:
-                    raw = json.load(f)
-                items = raw if isinstance(raw, list) else raw.get("subscriptions", [])
-                out: List[NotificationSubscription] = []
-                for it in items:
-                    out.append(
-                        NotificationSubscription(
-                            id=str(it.get("id") or uuid4()),
-                            booking_id=str(it.get("booking_id") or it.get("bookingId") or ""),
-                            phone_e164=str(it.get("phone_e164") or it.get("phone") or ""),
-                            temple=str(it.get("temple") or ""),
-                            queue_number=int(it.get("queue_number") or it.get("queueNumber") or 0),
-                            time_slot=(it.get("time_slot") or it.get("timeSlot")),
-                            enabled=bool(it.get("enabled", True)),
-                            created_at=str(it.get("created_at") or it.get("createdAt") or _now_iso()),
-                            last_sent_at=(it.get("last_sent_at") or it.get("lastSentAt")),
-                        )
-                    )
-                return out
-            except Exception:
-                return []
-
-    def save_all(self, subs: List[NotificationSubscription]) -> None:
-        with self._lock:
-            payload = [asdict(s) for s in subs]
-            with open(self._path, "w", encoding="utf-8") as f:
-                json.dump(payload, f, ensure_ascii=False, indent=2)
+class NotificationSubscription(CompactRecord):
+    """One SMS subscriber, kept compact: slotted, interned temple/slot names and
+    timestamps held as epoch microseconds (exposed as the original ISO strings)."""
+
+    __slots__ = ("id", "booking_id", "phone_e164", "temple", "queue_number", "time_slot", "enabled", "_created_at", "_last_sent_at")
+    FIELDS = ("id", "booking_id", "phone_e164", "temple", "queue_number", "time_slot", "enabled", "created_at", "last_sent_at")
+
+    def __init__(
+        self,
+        id: str,
+        booking_id: str,
+        phone_e164: str,
+        temple: str,
+        queue_number: int,
+        time_slot: Optional[str],
+        enabled: bool,
+        created_at: Optional[str],
+        last_sent_at: Optional[str],
+    ):
+        self.id = id
+        self.booking_id = booking_id
+        self.phone_e164 = phone_e164
+        self.temple = intern_text(temple)
+        self.queue_number = queue_number
+        self.time_slot = intern_text(time_slot)
+        self.enabled = enabled
+        self.created_at = created_at
+        self.last_sent_at = last_sent_at
+
+    @property
+    def created_at(self) -> Optional[str]:
+        return unpack_timestamp(self._created_at)
+
+    @created_at.setter
+    def created_at(self, value: Any) -> None:
+        self._created_at = pack_timestamp(value)
+
+    @property
+    def last_sent_at(self) -> Optional[str]:
+        return unpack_timestamp(self._last_sent_at)
+
+    @last_sent_at.setter
+    def last_sent_at(self, value: Any) -> None:
+        self._last_sent_at = pack_timestamp(value)
+
+
+class NotificationStore(RecordStore[NotificationSubscription]):
+    record_type = NotificationSubscription
+
+    def __init__(self, path: str = DATA_FILE, compact_every: int = 1000, shared: Optional[bool] = None):
+        self._by_booking: Dict[str, str] = {}
+        super().__init__(path, compact_every=compact_every, shared=shared)
+
+    def _from_dict(self, it: Dict[str, Any]) -> NotificationSubscription:
+        return NotificationSubscription(
+            id=str(it.get("id") or new_id("SUB")),
+            booking_id=str(it.get("booking_id") or it.get("bookingId") or ""),
+            phone_e164=str(it.get("phone_e164") or it.get("phone") or ""),
+            temple=str(it.get("temple") or ""),
+            queue_number=int(it.get("queue_number") or it.get("queueNumber") or 0),
+            time_slot=(it.get("time_slot") or it.get("timeSlot")),
+            enabled=bool(it.get("enabled", True)),
+            created_at=str(it.get("created_at") or it.get("createdAt") or _now_iso()),
+            last_sent_at=(it.get("last_sent_at") or it.get("lastSentAt")),
+        )
+
+    def _reset_indexes(self) -> None:
+        self._by_booking = {}
+
+    def _add_to_indexes(self, sub: NotificationSubscription) -> None:
+        self._by_booking[sub.booking_id] = sub.id
+
+    def _remove_from_indexes(self, sub: NotificationSubscription) -> None:
+        if self._by_booking.get(sub.booking_id) == sub.id:
+            del self._by_booking[sub.booking_id]
+
+    def get_by_booking(self, booking_id: str) -> Optional[NotificationSubscription]:
+        with self._reading():
+            sub_id = self._by_booking.get(str(booking_id))
+            return self._records.get(sub_id) if sub_id else None
 
     def upsert(self, booking_id: str, phone_e164: str, temple: str, queue_number: int, time_slot: Optional[str], enabled: bool) -> NotificationSubscription:
         booking_id = str(booking_id)
-        with self._lock:
-            subs = self.load_all()
-            existing = next((s for s in subs if s.booking_id == booking_id), None)
+        with self._writing():
+            existing = self.get_by_booking(booking_id)
             if existing:
-                updated = NotificationSubscription(
-                    id=existing.id,
+                return self._commit_put(
+                    NotificationSubscription(
+                        id=existing.id,
+                        booking_id=booking_id,
+                        phone_e164=phone_e164,
+                        temple=temple,
+                        queue_number=int(queue_number),
+                        time_slot=time_slot,
+                        enabled=bool(enabled),
+                        created_at=existing.created_at,
+                        last_sent_at=existing.last_sent_at,
+                    )
+                )
+
+            return self._commit_put(
+                NotificationSubscription(
+                    id=new_id("SUB"),
                     booking_id=booking_id,
                     phone_e164=phone_e164,
                     temple=temple,
                     queue_number=int(queue_number),
                     time_slot=time_slot,
                     enabled=bool(enabled),
-                    created_at=existing.created_at,
-                    last_sent_at=existing.last_sent_at,
+                    created_at=_now_iso(),
+                    last_sent_at=None,
                 )
-                subs = [updated if s.booking_id == booking_id else s for s in subs]
-                self.save_all(subs)
-                return updated
-
-            created = NotificationSubscription(
-                id=str(uuid4()),
-                booking_id=booking_id,
-                phone_e164=phone_e164,
-                temple=temple,
-                queue_number=int(queue_number),
-                time_slot=time_slot,
-                enabled=bool(enabled),
-                created_at=_now_iso(),
-                last_sent_at=None,
             )
-            subs.append(created)
-            self.save_all(subs)
-            return created
 
     def mark_sent(self, subscription_id: str) -> None:
-        with self._lock:
-            subs = self.load_all()
-            new_list: List[NotificationSubscription] = []
-            for s in subs:
-                if s.id == subscription_id:
-                    new_list.append(
-                        NotificationSubscription(
-                            id=s.id,
-                            booking_id=s.booking_id,
-                            phone_e164=s.phone_e164,
-                            temple=s.temple,
-                            queue_number=s.queue_number,
-                            time_slot=s.time_slot,
-                            enabled=s.enabled,
-                            created_at=s.created_at,
-                            last_sent_at=_now_iso(),
-                        )
-                    )
-                else:
-                    new_list.append(s)
-            self.save_all(new_list)
+        self.mark_sent_many([subscription_id])
+
+    def mark_sent_many(self, subscription_ids: Iterable[str], ts: Optional[str] = None) -> int:
+        """Stamp ``last_sent_at`` on many subscriptions in a single log write."""
+        return self._patch_many(subscription_ids, {"last_sent_at": ts or _now_iso()})
+
+    def set_enabled_many(self, subscription_ids: Iterable[str], enabled: bool) -> int:
+        return self._patch_many(subscription_ids, {"enabled": bool(enabled)})
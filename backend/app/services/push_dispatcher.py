@@ -0,0 +1,138 @@
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .rate_limit import TokenBucket
+from .web_push_sender import DELIVERED, FAILED, GONE, PushOutcome, WebPushSender
+
+
+@dataclass
+class PushResult:
+    key: str
+    status: str
+    error: Optional[str] = None
+    attempts: int = 1
+
+    @property
+    def ok(self) -> bool:
+        return self.status == DELIVERED
+
+    @property
+    def gone(self) -> bool:
+        return self.status == GONE
+
+
+def _origin(endpoint: str) -> str:
+    url = urlparse(endpoint or "")
+    return f"{url.scheme}://{url.netloc}"
+
+
+class PushDispatcher:
+    """Fans web-push sends out over a bounded worker pool.
+
+    Each push-service origin (FCM, Mozilla autopush, Apple, ...) gets its own
+    keep-alive ``requests.Session`` sized to the pool and an optional token
+    bucket, so a broadcast is bounded by bandwidth and provider limits rather
+    than by one round trip per subscriber. Endpoints are plain URLs, so the
+    dispatcher can be pointed at a local stand-in push server for benchmarking.
+    """
+
+    def __init__(
+        self,
+        sender: WebPushSender,
+        concurrency: Optional[int] = None,
+        per_origin_rate: Optional[float] = None,
+    ):
+        self.sender = sender
+        self.concurrency = max(1, int(concurrency or os.getenv("PUSH_DISPATCH_CONCURRENCY", "16")))
+        # Messages per second per push-service origin; 0 disables limiting.
+        self.per_origin_rate = float(
+            per_origin_rate if per_origin_rate is not None else os.getenv("PUSH_RATE_LIMIT_PER_ORIGIN", "0")
+        )
+        # Rate-limited/transient failures are retried with exponential backoff
+        # (honouring Retry-After) up to max_attempts sends in total.
+        self.max_attempts = max(1, int(os.getenv("PUSH_MAX_ATTEMPTS", "3")))
+        self.backoff_base = float(os.getenv("PUSH_RETRY_BACKOFF_SECONDS", "1"))
+        self.max_backoff = float(os.getenv("PUSH_RETRY_MAX_BACKOFF_SECONDS", "30"))
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="webpush")
+        self._sessions: Dict[str, requests.Session] = {}
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def _session_for(self, origin: str) -> requests.Session:
+        with self._lock:
+            session = self._sessions.get(origin)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrency)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                self._sessions[origin] = session
+                self._buckets[origin] = TokenBucket(self.per_origin_rate)
+            return session
+
+    def _backoff(self, attempt: int, outcome: PushOutcome) -> Optional[float]:
+        """Seconds to wait before the next attempt, or None to give up."""
+        if not outcome.retryable or attempt >= self.max_attempts:
+            return None
+        if outcome.retry_after is not None:
+            # Don't tie up a worker for a long provider-imposed pause; the next
+            # scheduled run will pick the subscription up again.
+            return outcome.retry_after if outcome.retry_after <= self.max_backoff else None
+        delay = self.backoff_base * (2 ** (attempt - 1))
+        return min(self.max_backoff, delay * (0.5 + random.random() / 2))
+
+    def _send_one(self, item: Tuple[str, Dict[str, Any], bytes]) -> PushResult:
+        key, subscription_info, data = item
+        origin = _origin(str((subscription_info or {}).get("endpoint") or ""))
+        session = self._session_for(origin)
+        attempt = 0
+        while True:
+            attempt += 1
+            self._buckets[origin].acquire()
+            try:
+                outcome = self.sender.send_encoded(subscription_info, data, session=session)
+            except Exception as e:
+                outcome = PushOutcome(FAILED, error=str(e))
+            delay = self._backoff(attempt, outcome)
+            if delay is None:
+                return PushResult(key=key, status=outcome.status, error=outcome.error, attempts=attempt)
+            time.sleep(delay)
+
+    def dispatch(self, items: Iterable[Tuple[str, Dict[str, Any], Dict[str, Any]]]) -> List[PushResult]:
+        """Send ``(key, subscription_info, payload)`` items concurrently.
+
+        Each distinct payload object is serialized once and the bytes are shared
+        by every item that references it, so callers broadcasting the same
+        content should pass the same dict (see ``broadcast``). Results come back
+        in the same order as ``items``.
+        """
+        items = list(items)
+        encoded: Dict[int, bytes] = {}
+        prepared = []
+        for key, subscription_info, payload in items:
+            data = encoded.get(id(payload))
+            if data is None:
+                data = encoded[id(payload)] = self.sender.encode_payload(payload)
+            prepared.append((key, subscription_info, data))
+        return list(self._executor.map(self._send_one, prepared))
+
+    def broadcast(self, payload: Dict[str, Any], targets: Iterable[Tuple[str, Dict[str, Any]]]) -> List[PushResult]:
+        """Send one payload to many ``(key, subscription_info)`` targets."""
+        return self.dispatch((key, subscription_info, payload) for key, subscription_info in targets)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+            self._buckets.clear()
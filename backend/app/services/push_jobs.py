@@ -0,0 +1,97 @@
+import queue
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import uuid4
+
+from .push_dispatcher import PushDispatcher
+from .web_push_store import WebPushStore
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+@dataclass
+class PushJob:
+    id: str
+    status: str
+    total: int
+    sent: int
+    failed: int
+    created_at: str
+    gone: int = 0
+    finished_at: Optional[str] = None
+    error: Optional[str] = None
+
+    @property
+    def queued(self) -> int:
+        return max(0, self.total - self.sent - self.failed)
+
+
+class PushJobQueue:
+    """Runs push broadcasts on a background thread so request handlers return at once.
+
+    Jobs are executed one at a time (the dispatcher already fans each one out
+    over its worker pool) in chunks, so progress counters move while a large
+    broadcast is in flight. Only the most recent ``max_jobs`` jobs are kept.
+    """
+
+    def __init__(self, store: WebPushStore, dispatcher: PushDispatcher, chunk_size: int = 200, max_jobs: int = 100):
+        self.store = store
+        self.dispatcher = dispatcher
+        self._chunk_size = max(1, int(chunk_size))
+        self._max_jobs = max(1, int(max_jobs))
+        self._jobs: "OrderedDict[str, PushJob]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue[Optional[Tuple[PushJob, List[Tuple[str, Dict[str, Any], Dict[str, Any]]]]]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="push-jobs", daemon=True)
+        self._thread.start()
+
+    def submit(self, items: List[Tuple[str, Dict[str, Any], Dict[str, Any]]]) -> PushJob:
+        job = PushJob(id=uuid4().hex, status="queued", total=len(items), sent=0, failed=0, created_at=_now_iso())
+        with self._lock:
+            self._jobs[job.id] = job
+            while len(self._jobs) > self._max_jobs:
+                self._jobs.popitem(last=False)
+        self._queue.put((job, items))
+        return job
+
+    def get(self, job_id: str) -> Optional[PushJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def close(self) -> None:
+        self._queue.put(None)
+
+    def _run(self) -> None:
+        while True:
+            entry = self._queue.get()
+            if entry is None:
+                return
+            job, items = entry
+            job.status = "running"
+            sent_ids: List[str] = []
+            gone_ids: List[str] = []
+            try:
+                for start in range(0, len(items), self._chunk_size):
+                    for result in self.dispatcher.dispatch(items[start:start + self._chunk_size]):
+                        if result.ok:
+                            sent_ids.append(result.key)
+                            job.sent += 1
+                            continue
+                        job.failed += 1
+                        if result.gone:
+                            gone_ids.append(result.key)
+                            job.gone += 1
+                        else:
+                            print(f"[webpush][error] job={job.id} subscription={result.key} status={result.status} err={result.error}")
+                self.store.record_outcomes(sent_ids, gone_ids)
+                job.status = "done"
+            except Exception as e:
+                job.status = "failed"
+                job.error = str(e)
+                print(f"[webpush][error] job={job.id} err={e}")
+            job.finished_at = _now_iso()
@@ -0,0 +1,348 @@
+import json
+import math
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from .dispatch_schedule import _local_tz, parse_time_slot
+from .record_store import _shared_default
+
+
+EVENT_LOG = os.path.join(os.path.dirname(__file__), "..", "data", "queue_events.jsonl")
+
+# How far ahead of this server's clock a gate's timestamp may be.
+MAX_CLOCK_SKEW_SECONDS = 60
+
+
+def temple_key(temple: str) -> str:
+    """Fold a temple name or slug ("Somnath Temple", "somnath-temple") to one key."""
+    return re.sub(r"[^a-z0-9]+", "-", str(temple or "").lower()).strip("-")
+
+
+@dataclass
+class QueueEstimate:
+    position: int
+    admitted: int
+    rate_per_minute: float
+    eta_seconds: float
+    speed: str
+
+    @property
+    def wait_minutes(self) -> int:
+        return max(1, int(round(self.eta_seconds / 60)))
+
+
+class _TempleQueue:
+    __slots__ = ("admitted", "rate", "last_entry_at")
+
+    def __init__(self, rate: float):
+        self.admitted = 0
+        self.rate = rate  # admissions per second, exponentially smoothed
+        self.last_entry_at: Optional[float] = None
+
+
+def _parse_clock(value: str) -> int:
+    """``"06:00"`` -> minutes after midnight."""
+    hours, _, minutes = value.strip().partition(":")
+    return int(hours) * 60 + int(minutes or 0)
+
+
+class QueueEngine:
+    """Per-temple queue progress for the current day, fed by gate entry events.
+
+    Each temple keeps its admitted count and a time-weighted EWMA of the
+    admission rate (``QUEUE_RATE_SMOOTHING_SECONDS``). A pilgrim's position is
+    their queue number minus the admitted count, extrapolated along the rate
+    since the last event (at most ``QUEUE_MAX_EXTRAPOLATION_SECONDS``, so a gate
+    that stops reporting doesn't make the queue run away), and ETA is position
+    over rate. Both are O(1) reads of the shared per-temple state, however many
+    pilgrims poll.
+
+    Which queue numbers exist comes from ``issued(temple, date)`` (the slot
+    inventory): a number above the last one issued counts as the last one, and
+    extrapolation never passes it. Estimates never store anything, so what a
+    client asks about can't grow or skew the shared state; only entry events
+    create it. Until a temple's first entry event of the day, progress is
+    modelled at ``QUEUE_DEFAULT_RATE_PER_MINUTE`` from the start of the
+    pilgrim's time slot (or ``since``, e.g. when they first asked), never from
+    before ``QUEUE_OPENS_AT``; with neither, nothing is assumed to have moved.
+
+    Queue numbers restart every day, so the state covers the current
+    temple-local day only and starts over at midnight. Events are appended to
+    one JSONL file per day (``QUEUE_EVENT_LOG`` with the date before the
+    extension; empty disables), today's file is replayed on start-up, and
+    files older than ``QUEUE_EVENT_RETENTION_DAYS`` are deleted. With
+    ``shared`` on, other processes' appends are picked up by ``stat``-ing the
+    file, as the subscription stores do.
+    """
+
+    def __init__(
+        self,
+        event_log: Optional[str] = None,
+        default_rate_per_minute: Optional[float] = None,
+        smoothing_seconds: Optional[float] = None,
+        max_extrapolation_seconds: Optional[float] = None,
+        shared: Optional[bool] = None,
+        issued: Optional[Callable[[str, str], int]] = None,
+        opens_at: Optional[str] = None,
+        retention_days: Optional[int] = None,
+    ):
+        path = event_log if event_log is not None else os.getenv("QUEUE_EVENT_LOG", EVENT_LOG)
+        self.event_log = os.path.abspath(path) if path else None
+        self.default_rate = float(default_rate_per_minute or os.getenv("QUEUE_DEFAULT_RATE_PER_MINUTE", "12")) / 60.0
+        self.smoothing_seconds = max(1.0, float(smoothing_seconds or os.getenv("QUEUE_RATE_SMOOTHING_SECONDS", "600")))
+        self.max_extrapolation_seconds = float(
+            max_extrapolation_seconds if max_extrapolation_seconds is not None
+            else os.getenv("QUEUE_MAX_EXTRAPOLATION_SECONDS", "300")
+        )
+        self.opens_at_minutes = _parse_clock(opens_at or os.getenv("QUEUE_OPENS_AT", "06:00"))
+        self.retention_days = int(
+            retention_days if retention_days is not None else os.getenv("QUEUE_EVENT_RETENTION_DAYS", "7")
+        )
+        self._issued = issued
+        self._shared = bool(self.event_log) and (_shared_default() if shared is None else bool(shared))
+        self._tz = _local_tz()
+        self._day: Optional[str] = None
+        self._day_start = 0.0
+        self._opened_at = 0.0
+        self._temples: Dict[str, _TempleQueue] = {}
+        self._lock = threading.RLock()
+        self._log_offset = 0
+        if self.event_log:
+            os.makedirs(os.path.dirname(self.event_log), exist_ok=True)
+        with self._lock:
+            self._roll(time.time())
+
+    # -- days ---------------------------------------------------------------
+
+    def _day_of(self, at: float) -> str:
+        return datetime.fromtimestamp(at, self._tz).date().isoformat()
+
+    def log_path(self, day: str) -> str:
+        """The event file for ``day``: ``queue_events.jsonl`` -> ``queue_events.2024-05-01.jsonl``."""
+        base, ext = os.path.splitext(self.event_log or "")
+        return f"{base}.{day}{ext}"
+
+    def _roll(self, now: float) -> None:
+        """Start the day ``now`` falls in, if it isn't the current one yet."""
+        day = self._day_of(now)
+        if day == self._day:
+            return
+        self._start_day(day)
+        if self.event_log:
+            self._sync(force=True)
+            self._prune_logs(day)
+
+    def _start_day(self, day: str) -> None:
+        self._day = day
+        self._temples = {}
+        self._log_offset = 0
+        midnight = datetime.combine(date.fromisoformat(day), datetime.min.time(), tzinfo=self._tz)
+        self._day_start = midnight.timestamp()
+        self._opened_at = (midnight + timedelta(minutes=self.opens_at_minutes)).timestamp()
+
+    def _prune_logs(self, today: str) -> None:
+        cutoff = (date.fromisoformat(today) - timedelta(days=self.retention_days)).isoformat()
+        directory = os.path.dirname(self.event_log)
+        base, ext = os.path.splitext(os.path.basename(self.event_log))
+        pattern = re.compile(re.escape(base) + r"\.(\d{4}-\d{2}-\d{2})" + re.escape(ext) + "$")
+        for name in os.listdir(directory):
+            match = pattern.match(name)
+            if match and match.group(1) < cutoff:
+                try:
+                    os.remove(os.path.join(directory, name))
+                except FileNotFoundError:
+                    pass
+
+    # -- events -------------------------------------------------------------
+
+    def _event_day(self, event: Dict[str, Any]) -> Optional[str]:
+        """The day an entry event counts for, or None if it can't count."""
+        if event.get("type") != "entry" or not temple_key(event.get("temple")):
+            return None
+        try:
+            at = float(event.get("at") or 0)
+            return self._day_of(at) if at and int(event.get("count") or 0) > 0 else None
+        except (TypeError, ValueError, OverflowError, OSError):
+            return None
+
+    def _apply(self, event: Dict[str, Any]) -> bool:
+        if self._event_day(event) != self._day:
+            return False
+        key = temple_key(event["temple"])
+        q = self._temples.get(key)
+        if q is None:
+            q = self._temples[key] = _TempleQueue(self.default_rate)
+        self._admit(q, int(event["count"]), float(event["at"]))
+        return True
+
+    def _admit(self, q: _TempleQueue, count: int, at: float) -> None:
+        q.admitted += count
+        if q.last_entry_at is not None and at > q.last_entry_at:
+            # Irregularly spaced EWMA: the weight of the new observation grows
+            # with the gap it covers, so bursts of tiny batches can't spike it.
+            dt = at - q.last_entry_at
+            alpha = 1.0 - math.exp(-dt / self.smoothing_seconds)
+            q.rate += alpha * (count / dt - q.rate)
+        q.last_entry_at = max(at, q.last_entry_at or at)
+
+    def _append(self, event: Dict[str, Any]) -> None:
+        if not self.event_log:
+            return
+        day = self._day_of(event["at"])
+        line = (json.dumps(event, separators=(",", ":")) + "\n").encode("utf-8")
+        # One O_APPEND write per event keeps lines from different processes whole.
+        fd = os.open(self.log_path(day), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+        if not self._shared and day == self._day:
+            self._log_offset += len(line)
+
+    def _emit(self, event: Dict[str, Any]) -> None:
+        if self._shared:
+            # Applied when read back, in file order with other processes' events.
+            self._append(event)
+            self._sync()
+        else:
+            self._apply(event)
+            self._append(event)
+
+    def _sync(self, force: bool = False) -> None:
+        if not self.event_log or not (force or self._shared):
+            return
+        path = self.log_path(self._day)
+        try:
+            size = os.stat(path).st_size
+        except FileNotFoundError:
+            return
+        if size <= self._log_offset:
+            return
+        with open(path, "rb") as f:
+            f.seek(self._log_offset)
+            data = f.read(size - self._log_offset)
+        end = data.rfind(b"\n") + 1
+        self._log_offset += end
+        for event in self._parse(data[:end].splitlines()):
+            self._apply(event)
+
+    def _refresh(self, now: float) -> None:
+        self._roll(now)
+        self._sync()
+
+    @staticmethod
+    def _parse(lines: Iterable[bytes]) -> Iterable[Dict[str, Any]]:
+        for line in lines:
+            try:
+                event = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(event, dict):
+                yield event
+
+    def _issued_today(self, key: str) -> int:
+        return int(self._issued(key, self._day)) if self._issued is not None else 0
+
+    # -- public API -----------------------------------------------------------
+
+    def record_entry(self, temple: str, count: int, at: Optional[float] = None) -> Dict[str, Any]:
+        """Ingest a gate scan / admitted batch of ``count`` pilgrims.
+
+        ``at`` must fall on the current day and not be more than
+        ``MAX_CLOCK_SKEW_SECONDS`` ahead (it is then taken as now); anything
+        else raises ``ValueError``, so no event can land on another day.
+        """
+        key = temple_key(temple)
+        now = time.time()
+        with self._lock:
+            self._refresh(now)
+            if at is None:
+                at = now
+            elif not (self._day_start <= float(at) <= now + MAX_CLOCK_SKEW_SECONDS):
+                raise ValueError("Entry time must be today and not in the future")
+            self._emit({"type": "entry", "temple": key, "count": int(count), "at": min(float(at), now)})
+            return self.stats(key)
+
+    def estimate(
+        self,
+        temple: str,
+        queue_number: int,
+        now: Optional[float] = None,
+        time_slot: Optional[str] = None,
+        since: Optional[float] = None,
+    ) -> QueueEstimate:
+        key = temple_key(temple)
+        now = now if now is not None else time.time()
+        with self._lock:
+            self._refresh(now)
+            q = self._temples.get(key)
+            issued = self._issued_today(key)
+            opened_at = self._opened_at
+            slot = parse_time_slot(time_slot)
+            if slot is not None:
+                since = self._day_start + slot[0] * 60
+            admitted, rate, last_entry_at = (q.admitted, q.rate, q.last_entry_at) if q else (0, self.default_rate, None)
+
+        # Numbers nobody was issued count as the last issued one. Without an
+        # issued count the caller's own number is the only bound we have.
+        number = min(int(queue_number), issued) if issued else int(queue_number)
+        if last_entry_at is None:
+            # No gate data today: assume the default rate, but only since the
+            # pilgrim's slot started (or ``since``), so the model can't run
+            # the whole day's queue down to position 1.
+            moved = self.default_rate * max(0.0, now - max(opened_at, since)) if since is not None else 0.0
+        else:
+            moved = rate * min(max(0.0, now - last_entry_at), self.max_extrapolation_seconds)
+        # Never extrapolate past the last number we know was issued.
+        admitted += int(min(moved, max(0, number - 1 - admitted)))
+
+        rate = max(rate, self.default_rate * 0.1)
+        position = max(1, number - admitted)
+        ratio = rate / self.default_rate
+        speed = "Slow" if ratio < 0.75 else "Fast" if ratio > 1.25 else "Normal"
+        return QueueEstimate(position=position, admitted=admitted, rate_per_minute=rate * 60, eta_seconds=position / rate, speed=speed)
+
+    def stats(self, temple: str, now: Optional[float] = None) -> Dict[str, Any]:
+        key = temple_key(temple)
+        with self._lock:
+            self._refresh(now if now is not None else time.time())
+            q = self._temples.get(key)
+            issued = self._issued_today(key)
+            if q is None:
+                return {"temple": key, "admitted": 0, "issued": issued, "ratePerMinute": round(self.default_rate * 60, 2), "lastEntryAt": None}
+            return {
+                "temple": key,
+                "admitted": q.admitted,
+                "issued": issued,
+                "ratePerMinute": round(q.rate * 60, 2),
+                "lastEntryAt": q.last_entry_at,
+            }
+
+    def replay(self, path: str) -> int:
+        """Load a recorded event file (same JSONL format as the event log) for
+        benchmarking; returns how many events were applied.
+
+        The engine starts over on the day of the file's first entry event and
+        applies that day's events; events from other days are skipped. Pass a
+        ``now`` on that day to ``estimate``/``stats`` to read the result: a call
+        at the current time rolls the engine back to today.
+        """
+        with open(path, "rb") as f:
+            events = list(self._parse(f))
+        day = next((d for d in map(self._event_day, events) if d is not None), None)
+        if day is None:
+            return 0
+        with self._lock:
+            self._start_day(day)
+            if self.event_log:
+                # That day's own log is not mixed into the recording.
+                try:
+                    self._log_offset = os.stat(self.log_path(day)).st_size
+                except FileNotFoundError:
+                    pass
+            return sum(self._apply(event) for event in events)
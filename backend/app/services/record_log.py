@@ -0,0 +1,248 @@
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks; single-process use only
+    fcntl = None
+
+
+def _stat(path: str) -> Optional[Tuple[int, int, int]]:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+def _fsync_dir(path: str) -> None:
+    """Make a file created or renamed into ``path``'s directory survive a crash."""
+    try:
+        fd = os.open(os.path.dirname(path), os.O_RDONLY)
+    except OSError:  # Windows can't open directories; nothing to sync there
+        return
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class RecordLog:
+    """JSON snapshot file plus an append-only change log next to it.
+
+    The snapshot keeps the plain list-of-records format the stores always used.
+    Every mutation is appended to ``<name>.log`` as one JSON line, and the log is
+    folded back into the snapshot once it holds at least as many entries as there
+    are live records (and at least ``compact_every``), so a write costs O(1)
+    amortized instead of a full-file rewrite.
+
+    Log entries are either ``{"op": "put", "record": {...}}`` or
+    ``{"op": "patch", "id": ..., "fields": {...}}``. Both are idempotent, so
+    replaying a log over a snapshot that already contains it is harmless.
+
+    The log also remembers which snapshot it loaded and how far into the log it
+    has read, so ``refresh`` can tell whether another process has written since
+    and hand back just the new entries. Callers are responsible for in-process
+    locking; ``locked`` serializes writers across processes.
+    """
+
+    def __init__(self, path: str, compact_every: int = 1000):
+        self.path = os.path.abspath(path)
+        base = os.path.splitext(self.path)[0]
+        self.log_path = base + ".log"
+        self.lock_path = base + ".lock"
+        self._compact_every = max(1, int(compact_every))
+        self._log_entries = 0
+        self._snapshot_sig: Optional[Tuple[int, int, int]] = None
+        self._log_ino: Optional[int] = None
+        self._log_offset = 0
+
+    @contextmanager
+    def locked(self) -> Iterator[None]:
+        if fcntl is None:
+            yield
+            return
+        with open(self.lock_path, "a") as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def refresh(self) -> Optional[List[Dict[str, Any]]]:
+        """Entries other processes appended since the last read or write.
+
+        Returns ``[]`` when nothing changed (two ``stat`` calls, no parsing) and
+        ``None`` when the snapshot was replaced or the log rewritten, in which
+        case the caller must reload from scratch.
+        """
+        if _stat(self.path) != self._snapshot_sig:
+            return None
+        st = _stat(self.log_path)
+        if st is None:
+            return [] if self._log_offset == 0 else None
+        ino, size, _ = st
+        if (self._log_ino is not None and ino != self._log_ino) or size < self._log_offset:
+            return None
+        if size == self._log_offset:
+            return []
+        return self._read_log_from(self._log_offset)
+
+    def read_snapshot(self) -> List[Dict[str, Any]]:
+        # Stat before reading: if the file changes underneath us, the next
+        # refresh sees a different signature and reloads.
+        self._snapshot_sig = _stat(self.path)
+        if self._snapshot_sig is None:
+            return []
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                raw = json.load(f)
+        except Exception as e:
+            print(f"[store][error] unreadable snapshot path={self.path} err={e}")
+            return []
+        items = raw if isinstance(raw, list) else raw.get("subscriptions", [])
+        return [it for it in items if isinstance(it, dict)]
+
+    def read_log(self) -> List[Dict[str, Any]]:
+        self._log_entries = 0
+        self._log_ino = None
+        self._log_offset = 0
+        return self._read_log_from(0)
+
+    def _read_log_from(self, offset: int) -> List[Dict[str, Any]]:
+        try:
+            with open(self.log_path, "rb") as f:
+                self._log_ino = os.fstat(f.fileno()).st_ino
+                f.seek(offset)
+                data = f.read()
+        except FileNotFoundError:
+            return []
+
+        # Only consume complete lines; a partial trailing line is either still
+        # being written by another process or torn by a crash mid-append.
+        end = data.rfind(b"\n") + 1
+        self._log_offset = offset + end
+        ops: List[Dict[str, Any]] = []
+        for line in data[:end].splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                op = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(op, dict):
+                ops.append(op)
+        self._log_entries += len(ops)
+        return ops
+
+    def append(self, ops: Iterable[Dict[str, Any]], fsync: bool = False) -> None:
+        """Append ``ops`` in one write; with ``fsync`` they are on disk on return.
+
+        If the write or fsync fails, the log is cut back to where it was before
+        raising, so entries the caller reports as failed never come back on
+        replay and a torn line can't swallow the next append.
+        """
+        lines = [json.dumps(op, ensure_ascii=False, separators=(",", ":")) for op in ops]
+        if not lines:
+            return
+        data = memoryview(("\n".join(lines) + "\n").encode("utf-8"))
+        fd = os.open(self.log_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            start = os.lseek(fd, 0, os.SEEK_END)
+            try:
+                while data:
+                    data = data[os.write(fd, data):]
+                if fsync:
+                    os.fsync(fd)
+                    if os.fstat(fd).st_ino != self._log_ino:
+                        # A log file we haven't written before (just created,
+                        # or renamed in by a compaction elsewhere): its
+                        # directory entry must be durable too.
+                        _fsync_dir(self.log_path)
+            except BaseException:
+                try:
+                    os.ftruncate(fd, start)
+                except OSError:
+                    pass
+                raise
+            self._log_ino = os.fstat(fd).st_ino
+            self._log_offset = os.lseek(fd, 0, os.SEEK_CUR)
+        finally:
+            os.close(fd)
+        self._log_entries += len(lines)
+
+    def needs_compaction(self, record_count: int) -> bool:
+        return self._log_entries >= max(self._compact_every, record_count)
+
+    def mark(self) -> Tuple[Optional[int], int]:
+        """Where the log currently ends; pass to ``install_snapshot`` to keep
+        whatever is appended after this point."""
+        return (self._log_ino, self._log_offset)
+
+    def write_snapshot_file(self, records: List[Dict[str, Any]]) -> str:
+        """Write ``records`` to a new temporary file next to the snapshot and
+        return its path. Needs no lock, so the slow part of a compaction can
+        run while other threads keep writing the log."""
+        tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(records, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        return tmp_path
+
+    def install_snapshot(self, tmp_path: str, mark: Optional[Tuple[Optional[int], int]] = None) -> bool:
+        """Make a file from ``write_snapshot_file`` the snapshot and reset the log.
+
+        The snapshot must hold every entry up to ``mark``; entries appended
+        since are carried over into the new log. Without a mark it must hold
+        everything. Returns False (and drops the file) if the log was created
+        or replaced after ``mark``, since the snapshot may then be missing a rewrite.
+        """
+        tail = b""
+        if mark is not None:
+            ino, offset = mark
+            try:
+                with open(self.log_path, "rb") as f:
+                    current = os.fstat(f.fileno()).st_ino
+                    f.seek(offset)
+                    tail = f.read()
+            except FileNotFoundError:
+                current = None
+            if current != ino:
+                os.remove(tmp_path)
+                return False
+            tail = tail[:tail.rfind(b"\n") + 1]
+
+        os.replace(tmp_path, self.path)
+        # Durable before the log is reset: the old log must never be paired
+        # with the old snapshot once the log only holds the tail.
+        _fsync_dir(self.path)
+        self._snapshot_sig = _stat(self.path)
+
+        # The snapshot now contains everything in the log but the tail; a crash
+        # before the log is reset only means it gets replayed (idempotently)
+        # next load. The new log is renamed into place rather than truncated,
+        # so its inode changes: a process that read the old log between the two
+        # replaces must not mistake the new one for a continuation of it.
+        tmp_log = f"{self.log_path}.tmp"
+        with open(tmp_log, "wb") as f:
+            if tail:
+                f.write(tail)
+                f.flush()
+                os.fsync(f.fileno())
+            self._log_ino = os.fstat(f.fileno()).st_ino
+        os.replace(tmp_log, self.log_path)
+        # Bookings fsynced into the new log are acknowledged as durable, so
+        # the rename that makes it the log must be durable first.
+        _fsync_dir(self.log_path)
+        self._log_offset = len(tail)
+        self._log_entries = tail.count(b"\n")
+        return True
+
+    def write_snapshot(self, records: List[Dict[str, Any]]) -> None:
+        """Atomically replace the snapshot with ``records`` and reset the log."""
+        self.install_snapshot(self.write_snapshot_file(records))
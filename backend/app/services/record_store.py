@@ -0,0 +1,242 @@
+import os
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Generic, Iterable, Iterator, List, Optional, Tuple, TypeVar
+
+from .dispatch_schedule import shard_of
+from .record_log import RecordLog
+
+
+T = TypeVar("T")
+
+
+def _shared_default() -> bool:
+    # Another process may write the same files when we run several uvicorn
+    # workers (WEB_CONCURRENCY) or when explicitly told so.
+    flag = (os.getenv("SUBSCRIPTION_STORE_SHARED") or "").strip().lower()
+    if flag:
+        return flag in ("1", "true", "yes", "on")
+    try:
+        return int(os.getenv("WEB_CONCURRENCY", "1")) > 1
+    except ValueError:
+        return False
+
+
+class RecordStore(Generic[T]):
+    """In-memory records keyed by ``id``, persisted through a ``RecordLog``.
+
+    Subclasses describe how to parse a stored dict (``_from_dict``) and keep any
+    secondary indexes up to date via ``_add_to_indexes``/``_remove_from_indexes``;
+    every mutation goes through ``_commit`` so indexes and the log never drift.
+    A mutation reaches memory only once its log write has succeeded.
+
+    The records double as a write-through cache: reads are served from memory.
+    When ``shared`` is on (another process may write the same files), each
+    read first ``stat``s the snapshot and log; unchanged files cost nothing
+    more, appended log entries are replayed incrementally, and only a replaced
+    snapshot triggers a full JSON parse. Writes then also take a file lock.
+    """
+
+    record_type: type
+
+    def __init__(self, path: str, compact_every: int = 1000, shared: Optional[bool] = None):
+        self._path = os.path.abspath(path)
+        # Re-entrant because store methods may call each other.
+        self._lock = threading.RLock()
+        self._shared = _shared_default() if shared is None else bool(shared)
+        self._write_depth = 0
+        self._compacting = False
+        os.makedirs(os.path.dirname(self._path), exist_ok=True)
+        self._fields = set(self.record_type.FIELDS)
+        self._log = RecordLog(self._path, compact_every=compact_every)
+        self._records: Dict[str, T] = {}
+        self._load()
+
+    # -- subclass hooks -------------------------------------------------
+
+    def _from_dict(self, it: Dict[str, Any]) -> T:
+        raise NotImplementedError
+
+    def _to_dict(self, rec: T) -> Dict[str, Any]:
+        return rec.to_dict()
+
+    def _add_to_indexes(self, rec: T) -> None:
+        pass
+
+    def _remove_from_indexes(self, rec: T) -> None:
+        pass
+
+    def _reset_indexes(self) -> None:
+        pass
+
+    # -- internals ------------------------------------------------------
+
+    def _load(self) -> None:
+        self._records = {}
+        self._reset_indexes()
+        for it in self._log.read_snapshot():
+            try:
+                self._put(self._from_dict(it))
+            except (TypeError, ValueError):
+                continue
+        for op in self._log.read_log():
+            self._apply(op)
+
+    def _sync(self) -> None:
+        """Catch up with writes made by other processes (caller holds the lock)."""
+        if not self._shared:
+            return
+        ops = self._log.refresh()
+        if ops is None:
+            self._load()
+            return
+        for op in ops:
+            self._apply(op)
+
+    @contextmanager
+    def _reading(self) -> Iterator[None]:
+        with self._lock:
+            self._sync()
+            yield
+
+    @contextmanager
+    def _writing(self) -> Iterator[None]:
+        """Hold the store for a read-modify-write, across processes if shared."""
+        with self._lock:
+            if not self._shared or self._write_depth:
+                self._write_depth += 1
+                try:
+                    yield
+                finally:
+                    self._write_depth -= 1
+                return
+            with self._log.locked():
+                self._write_depth += 1
+                try:
+                    self._sync()
+                    yield
+                finally:
+                    self._write_depth -= 1
+
+    def _put(self, rec: T) -> None:
+        previous = self._records.get(rec.id)
+        if previous is not None:
+            self._remove_from_indexes(previous)
+        self._records[rec.id] = rec
+        self._add_to_indexes(rec)
+
+    def _apply(self, op: Dict[str, Any]) -> None:
+        kind = op.get("op")
+        if kind == "put" and isinstance(op.get("record"), dict):
+            try:
+                self._put(self._from_dict(op["record"]))
+            except (TypeError, ValueError):
+                pass
+        elif kind == "patch":
+            existing = self._records.get(str(op.get("id")))
+            changes = {k: v for k, v in (op.get("fields") or {}).items() if k in self._fields and k != "id"}
+            if existing is not None and changes:
+                self._put(existing.replace(**changes))
+
+    def _commit(self, ops: List[Dict[str, Any]], fsync: bool = False) -> None:
+        with self._writing():
+            # Log first: if the write fails, memory is untouched and nobody
+            # can see a change its caller was told had failed.
+            self._log.append(ops, fsync=fsync)
+            for op in ops:
+                self._apply(op)
+            if not self._compacting and self._log.needs_compaction(len(self._records)):
+                # Off this thread: a group-commit writer would otherwise hold
+                # every waiting acknowledgement until the snapshot is on disk.
+                self._compacting = True
+                threading.Thread(target=self._compact_in_background, name="store-compaction", daemon=True).start()
+
+    def _commit_put(self, rec: T) -> T:
+        self._commit([{"op": "put", "record": self._to_dict(rec)}])
+        return rec
+
+    def _patch_each(self, changes: Dict[str, Dict[str, Any]]) -> int:
+        """Apply per-id field changes in one log write; unknown ids are skipped."""
+        with self._writing():
+            ops = [
+                {"op": "patch", "id": rec_id, "fields": fields_}
+                for rec_id, fields_ in changes.items()
+                if rec_id in self._records and fields_
+            ]
+            if ops:
+                self._commit(ops)
+            return len(ops)
+
+    def _patch_many(self, record_ids: Iterable[str], changes: Dict[str, Any]) -> int:
+        return self._patch_each({rec_id: changes for rec_id in record_ids})
+
+    # -- public API -----------------------------------------------------
+
+    @property
+    def shared(self) -> bool:
+        """Whether other processes may write the same files."""
+        return self._shared
+
+    def load_all(self) -> List[T]:
+        with self._reading():
+            return list(self._records.values())
+
+    def get(self, record_id: str) -> Optional[T]:
+        with self._reading():
+            return self._records.get(record_id)
+
+    def iter_enabled(
+        self,
+        batch_size: int = 500,
+        temple: Optional[str] = None,
+        time_slot: Optional[str] = None,
+        shard: Optional[Tuple[int, int]] = None,
+    ) -> Iterator[List[T]]:
+        """Yield enabled records in lists of at most ``batch_size``.
+
+        ``shard=(index, count)`` keeps only the records ``shard_of`` puts in
+        that shard. Matching records are picked out under the lock (references
+        only, no copies); the batches are handed out after it is released, so
+        callers can send while other threads keep reading and writing the store.
+        """
+        batch_size = max(1, int(batch_size))
+        with self._reading():
+            matches = [
+                r for r in self._records.values()
+                if r.enabled
+                and (temple is None or r.temple == temple)
+                and (time_slot is None or r.time_slot == time_slot)
+                and (shard is None or shard_of(r.id, shard[1]) == shard[0])
+            ]
+        for start in range(0, len(matches), batch_size):
+            yield matches[start:start + batch_size]
+
+    def save_all(self, records: List[T]) -> None:
+        with self._writing():
+            self._records = {}
+            self._reset_indexes()
+            for rec in records:
+                self._put(rec)
+            self._log.write_snapshot([self._to_dict(r) for r in records])
+
+    def compact(self) -> bool:
+        """Fold the log into the snapshot; False if the log was replaced meanwhile.
+
+        Only taking the records and installing the file hold the store:
+        serializing and writing the snapshot happen outside the lock, and
+        whatever is logged in the meantime is carried over into the new log.
+        """
+        with self._writing():
+            records = list(self._records.values())
+            mark = self._log.mark()
+        tmp_path = self._log.write_snapshot_file([self._to_dict(r) for r in records])
+        with self._writing():
+            return self._log.install_snapshot(tmp_path, mark)
+
+    def _compact_in_background(self) -> None:
+        try:
+            self.compact()
+        except Exception as e:
+            print(f"[store][error] compaction failed path={self._path} err={e}")
+        finally:
+            self._compacting = False
@@ -0,0 +1,91 @@
+import base64
+import copy
+import sys
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional, Tuple, Union
+
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# A timestamp is kept as integer microseconds since the epoch when that
+# reproduces the original ISO string exactly, otherwise as the string itself.
+Timestamp = Union[int, str, None]
+
+
+def pack_timestamp(value: Any) -> Timestamp:
+    if value is None or value == "":
+        return None
+    if isinstance(value, int):
+        return value
+    text = str(value)
+    try:
+        dt = datetime.fromisoformat(text)
+    except ValueError:
+        return text
+    if dt.tzinfo is None:
+        return text
+    delta = dt - _EPOCH
+    us = (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+    return us if unpack_timestamp(us) == text else text
+
+
+def unpack_timestamp(value: Timestamp) -> Optional[str]:
+    if value is None or isinstance(value, str):
+        return value
+    return (_EPOCH + timedelta(microseconds=value)).isoformat()
+
+
+def intern_text(value: Any) -> Optional[str]:
+    """Share one string object for values repeated across many records (temples, slots)."""
+    return sys.intern(str(value)) if value is not None else None
+
+
+def pack_b64url(value: Any) -> Union[bytes, str, None]:
+    """Decode a base64url key to bytes if it re-encodes to the same text."""
+    if value is None:
+        return None
+    text = str(value)
+    try:
+        raw = base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+    except ValueError:
+        return text
+    return raw if unpack_b64url(raw) == text else text
+
+
+def unpack_b64url(value: Union[bytes, str, None]) -> Optional[str]:
+    if value is None or isinstance(value, str):
+        return value
+    # Browsers hand out unpadded base64url keys.
+    return base64.urlsafe_b64encode(value).decode("ascii").rstrip("=")
+
+
+class CompactRecord:
+    """Base for slotted store records.
+
+    Subclasses list their public field names in ``FIELDS``; ``to_dict`` yields
+    exactly the JSON schema the stores persist, and ``replace`` copies the
+    record with some fields changed (via the same setters the constructor uses).
+    """
+
+    __slots__ = ()
+    FIELDS: Tuple[str, ...] = ()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.FIELDS}
+
+    def replace(self, **changes: Any) -> "CompactRecord":
+        rec = copy.copy(self)
+        for name, value in changes.items():
+            setattr(rec, name, value)
+        return rec
+
+    def __eq__(self, other: Any) -> bool:
+        if type(other) is not type(self):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    __hash__ = None  # mutable through replace's setters; compare by value only
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.FIELDS)
+        return f"{type(self).__name__}({fields})"
@@ -0,0 +1,265 @@
+import os
+import threading
+from array import array
+from datetime import date, datetime, timedelta
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from .dispatch_schedule import _local_tz
+from .queue_engine import temple_key
+
+
+DEFAULT_SLOTS = (
+    "06:00 AM - 08:00 AM",
+    "08:00 AM - 10:00 AM",
+    "10:00 AM - 12:00 PM",
+)
+
+_STRIPES = 64
+
+
+class SlotFullError(Exception):
+    def __init__(self, time_slot: str, remaining: int):
+        super().__init__(f"slot={time_slot} remaining={remaining}")
+        self.time_slot = time_slot
+        self.remaining = remaining
+
+
+class Reservation(NamedTuple):
+    queue_number: int
+    remaining: int
+
+
+def parse_darshan_types(raw: str, default_capacity: int) -> Dict[str, int]:
+    """``"general,vip:50,special:100"`` -> ``{"general": default, "vip": 50, ...}``."""
+    types: Dict[str, int] = {}
+    for part in raw.split(","):
+        name, _, capacity = part.strip().partition(":")
+        name = name.strip().lower()
+        if name:
+            types[name] = int(capacity) if capacity.strip() else default_capacity
+    return types
+
+
+class _Day:
+    """One temple-day: places left per (darshan type, slot) cell, a bitmap of
+    the cells that still have room, and the next queue number."""
+
+    __slots__ = ("remaining", "open_mask", "next_number")
+
+    def __init__(self, capacities: array, full_mask: int):
+        self.remaining = array("i", capacities)
+        self.open_mask = full_mask
+        self.next_number = 1
+
+
+class SlotInventory:
+    """Bookable capacity per temple, date, darshan type and time slot.
+
+    ``reserve`` checks and decrements a cell's remaining places and hands out
+    the next block of queue numbers (one per person, so numbers line up with
+    the queue engine's admitted count) in one step under a lock, so two
+    bookings can never take the same place or number. Locks are striped by
+    temple-day: bookings for different temples or dates rarely contend, and
+    a hot temple-day costs a few array operations per booking.
+
+    Darshan types and their per-slot capacity come from ``DARSHAN_TYPES``
+    (``name[:capacity]``, comma separated; ``SLOT_CAPACITY`` when omitted).
+    All types share one queue per temple-day.
+
+    Each temple-day also keeps a bitmap with one bit per (type, slot) that
+    still has a place, updated by ``reserve``/``release``, so availability
+    (``available_slots``, ``available_range``) never looks at bookings: a
+    day is a dict lookup and a shift, and days nobody booked are implicitly
+    fully open.
+
+    Released places go back to the slot; queue numbers are never reused.
+    Dates before today are dropped as new days are opened, and only the next
+    ``BOOKING_WINDOW_DAYS`` can be booked, which bounds what is kept per
+    temple. The counts live in this process, so bookings need a single
+    worker; ``restore_inventory`` refuses to start on a shared booking store.
+    """
+
+    def __init__(
+        self,
+        slots: Tuple[str, ...] = DEFAULT_SLOTS,
+        capacity_per_slot: Optional[int] = None,
+        window_days: Optional[int] = None,
+        darshan_types: Optional[Dict[str, int]] = None,
+    ):
+        self.slots = tuple(slots)
+        self._slot_index = {s: i for i, s in enumerate(self.slots)}
+        self.capacity = int(capacity_per_slot or os.getenv("SLOT_CAPACITY", "500"))
+        self.window_days = int(window_days or os.getenv("BOOKING_WINDOW_DAYS", "60"))
+        self.darshan_types = darshan_types or parse_darshan_types(
+            os.getenv("DARSHAN_TYPES", "general,vip:50,special:100"), self.capacity
+        )
+        self._type_index = {t: i for i, t in enumerate(self.darshan_types)}
+        self.default_type = next(iter(self.darshan_types))
+
+        n_slots = len(self.slots)
+        self._capacities = array("i", [c for c in self.darshan_types.values() for _ in range(n_slots)])
+        self._full_mask = sum(1 << i for i, c in enumerate(self._capacities) if c > 0)
+        self._slot_mask = (1 << n_slots) - 1
+        # Per-type bitmap -> slot names, e.g. 0b101 -> ("06:00 AM - ...", "10:00 AM - ...").
+        self._mask_slots = [
+            tuple(s for i, s in enumerate(self.slots) if m >> i & 1) for m in range(1 << n_slots)
+        ]
+
+        self._days: Dict[Tuple[str, str], _Day] = {}
+        self._locks = [threading.Lock() for _ in range(_STRIPES)]
+        self._open_lock = threading.Lock()
+        self._today: Optional[date] = None
+
+    # -- helpers --------------------------------------------------------------
+
+    def slot_index(self, time_slot: str) -> int:
+        try:
+            return self._slot_index[time_slot]
+        except KeyError:
+            raise ValueError(f"Unknown time slot: {time_slot}")
+
+    def type_index(self, darshan_type: Optional[str]) -> int:
+        name = (darshan_type or self.default_type).strip().lower()
+        try:
+            return self._type_index[name]
+        except KeyError:
+            raise ValueError(f"Unknown darshan type: {darshan_type}")
+
+    def _window(self) -> Tuple[date, date]:
+        today = datetime.now(_local_tz()).date()
+        return today, today + timedelta(days=self.window_days)
+
+    def check_date(self, day: str) -> str:
+        """Validate a ``YYYY-MM-DD`` booking date inside the booking window."""
+        try:
+            parsed = date.fromisoformat(day)
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid date: {day}")
+        first, last = self._window()
+        if parsed < first or parsed > last:
+            raise ValueError(f"Bookings are open from {first} to {last}")
+        return parsed.isoformat()
+
+    def _lock_for(self, key: Tuple[str, str]) -> threading.Lock:
+        return self._locks[hash(key) % _STRIPES]
+
+    def _day(self, key: Tuple[str, str]) -> _Day:
+        day = self._days.get(key)
+        if day is None:
+            with self._open_lock:
+                day = self._days.get(key)
+                if day is None:
+                    self._prune()
+                    day = self._days[key] = _Day(self._capacities, self._full_mask)
+        return day
+
+    def _prune(self) -> None:
+        today = datetime.now(_local_tz()).date()
+        if today == self._today:
+            return
+        self._today = today
+        cutoff = today.isoformat()
+        for key in [k for k in self._days if k[1] < cutoff]:
+            del self._days[key]
+
+    def _type_mask(self, day_inv: Optional[_Day], type_idx: int) -> int:
+        mask = day_inv.open_mask if day_inv is not None else self._full_mask
+        return (mask >> (type_idx * len(self.slots))) & self._slot_mask
+
+    # -- public API -----------------------------------------------------------
+
+    def reserve(
+        self, temple: str, day: str, time_slot: str, people: int = 1, darshan_type: Optional[str] = None
+    ) -> Reservation:
+        """Take ``people`` places in a slot; raises ``SlotFullError`` if they don't fit."""
+        cell = self.type_index(darshan_type) * len(self.slots) + self.slot_index(time_slot)
+        people = int(people)
+        if people < 1:
+            raise ValueError("people must be at least 1")
+        key = (temple_key(temple), self.check_date(day))
+        day_inv = self._day(key)
+        with self._lock_for(key):
+            left = day_inv.remaining[cell]
+            if people > left:
+                raise SlotFullError(time_slot, left)
+            left -= people
+            day_inv.remaining[cell] = left
+            if left == 0:
+                day_inv.open_mask &= ~(1 << cell)
+            number = day_inv.next_number
+            day_inv.next_number = number + people
+            return Reservation(queue_number=number, remaining=left)
+
+    def release(
+        self, temple: str, day: str, time_slot: str, people: int = 1, darshan_type: Optional[str] = None
+    ) -> None:
+        """Give back places taken by ``reserve`` (e.g. a cancelled booking)."""
+        cell = self.type_index(darshan_type) * len(self.slots) + self.slot_index(time_slot)
+        key = (temple_key(temple), day)
+        day_inv = self._days.get(key)
+        if day_inv is None:
+            return
+        with self._lock_for(key):
+            left = min(self._capacities[cell], day_inv.remaining[cell] + int(people))
+            day_inv.remaining[cell] = left
+            if left > 0:
+                day_inv.open_mask |= 1 << cell
+
+    def restore(
+        self, temple: str, day: str, time_slot: str, people: int, darshan_type: Optional[str], queue_number: int
+    ) -> None:
+        """Re-apply a stored booking at start-up. Never refuses: a booking
+        already made stands even if capacity has since been lowered."""
+        try:
+            cell = self.type_index(darshan_type) * len(self.slots) + self.slot_index(time_slot)
+            if date.fromisoformat(day) < self._window()[0]:
+                return
+        except ValueError:
+            return
+        key = (temple_key(temple), day)
+        day_inv = self._day(key)
+        with self._lock_for(key):
+            left = max(0, day_inv.remaining[cell] - int(people))
+            day_inv.remaining[cell] = left
+            if left == 0:
+                day_inv.open_mask &= ~(1 << cell)
+            day_inv.next_number = max(day_inv.next_number, int(queue_number) + int(people))
+
+    def issued(self, temple: str, day: str) -> int:
+        """The last queue number handed out for a temple-day (0 if none)."""
+        day_inv = self._days.get((temple_key(temple), day))
+        return day_inv.next_number - 1 if day_inv is not None else 0
+
+    def remaining(self, temple: str, day: str, darshan_type: Optional[str] = None) -> Dict[str, int]:
+        """Places left per slot for a temple-day and darshan type."""
+        start = self.type_index(darshan_type) * len(self.slots)
+        day_inv = self._days.get((temple_key(temple), day))
+        cells = day_inv.remaining if day_inv is not None else self._capacities
+        return dict(zip(self.slots, cells[start:start + len(self.slots)]))
+
+    def available_slots(self, temple: str, day: str, darshan_type: Optional[str] = None) -> List[str]:
+        """Slots of a darshan type with at least one place left on ``day``."""
+        type_idx = self.type_index(darshan_type)
+        return list(self._mask_slots[self._type_mask(self._days.get((temple_key(temple), day)), type_idx)])
+
+    def available_range(
+        self, temple: str, start: str, end: str, darshan_type: Optional[str] = None
+    ) -> Dict[str, Tuple[str, ...]]:
+        """``available_slots`` for every bookable date in ``[start, end]``."""
+        type_idx = self.type_index(darshan_type)
+        try:
+            first, last = date.fromisoformat(start), date.fromisoformat(end)
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid date range: {start} to {end}")
+        open_from, open_to = self._window()
+        first, last = max(first, open_from), min(last, open_to)
+        key = temple_key(temple)
+        days = self._days
+        shift = type_idx * len(self.slots)
+        full = self._mask_slots[(self._full_mask >> shift) & self._slot_mask]
+        out: Dict[str, Tuple[str, ...]] = {}
+        for ordinal in range(first.toordinal(), last.toordinal() + 1):
+            day = date.fromordinal(ordinal).isoformat()
+            day_inv = days.get((key, day))
+            out[day] = full if day_inv is None else self._mask_slots[(day_inv.open_mask >> shift) & self._slot_mask]
+        return out
@@ -1,16 +1,58 @@
 import os
-from typing import Optional
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Iterable, List, Optional, Tuple
+
+from .rate_limit import TokenBucket
+
+
+@dataclass
+class SmsResult:
+    key: str
+    ok: bool
+    sid: Optional[str] = None
+    error: Optional[str] = None
 
 
 class SmsSender:
-    def __init__(self):
+    def __init__(self, concurrency: Optional[int] = None, rate_per_second: Optional[float] = None):
         self.account_sid = os.getenv("TWILIO_ACCOUNT_SID")
         self.auth_token = os.getenv("TWILIO_AUTH_TOKEN")
         self.from_number = os.getenv("TWILIO_FROM_NUMBER")
+        # Lets the sender be pointed at a local fake API server.
+        self.api_base_url = os.getenv("TWILIO_API_BASE_URL")
+        self.concurrency = max(1, int(concurrency or os.getenv("SMS_SEND_CONCURRENCY", "8")))
+        # Messages per second across all sends; 0 disables limiting.
+        self._bucket = TokenBucket(
+            float(rate_per_second if rate_per_second is not None else os.getenv("SMS_RATE_LIMIT_PER_SECOND", "0"))
+        )
+        self._client: Optional[Any] = None
+        self._client_lock = threading.Lock()
 
     def is_configured(self) -> bool:
         return bool(self.account_sid and self.auth_token and self.from_number)
 
+    def _get_client(self) -> Any:
+        # One client (and one pooled HTTP session) for the life of the sender,
+        # instead of a fresh client + TLS handshake per message.
+        with self._client_lock:
+            if self._client is None:
+                from requests.adapters import HTTPAdapter
+                from twilio.http.http_client import TwilioHttpClient
+                from twilio.rest import Client
+
+                http_client = TwilioHttpClient(pool_connections=True, timeout=30)
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrency)
+                http_client.session.mount("https://", adapter)
+                http_client.session.mount("http://", adapter)
+
+                client = Client(self.account_sid, self.auth_token, http_client=http_client)
+                if self.api_base_url:
+                    client.api.base_url = self.api_base_url
+                self._client = client
+            return self._client
+
     def send_sms(self, to_number: str, body: str) -> Optional[str]:
         """Send an SMS. Returns a provider message id if available."""
         if not self.is_configured():
@@ -18,12 +60,28 @@ class SmsSender:
             print(f"[sms][disabled] to={to_number} body={body}")
             return None
 
-        from twilio.rest import Client
-
-        client = Client(self.account_sid, self.auth_token)
-        msg = client.messages.create(
+        self._bucket.acquire()
+        msg = self._get_client().messages.create(
             to=to_number,
             from_=self.from_number,
             body=body,
         )
         return getattr(msg, "sid", None)
+
+    def _send_one(self, item: Tuple[str, str, str]) -> SmsResult:
+        key, to_number, body = item
+        try:
+            return SmsResult(key=key, ok=True, sid=self.send_sms(to_number, body))
+        except Exception as e:
+            return SmsResult(key=key, ok=False, error=str(e))
+
+    def send_many(self, items: Iterable[Tuple[str, str, str]]) -> List[SmsResult]:
+        """Send ``(key, to_number, body)`` items concurrently.
+
+        Results come back in the same order as ``items``.
+        """
+        items = list(items)
+        if not items:
+            return []
+        with ThreadPoolExecutor(max_workers=min(self.concurrency, len(items)), thread_name_prefix="sms") as pool:
+            return list(pool.map(self._send_one, items))
@@ -0,0 +1,447 @@
+import json
+import os
+import sqlite3
+import sys
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .dispatch_schedule import shard_hash, shard_range
+from .ids import new_id
+from .notifications_store import NotificationStore, NotificationSubscription
+from .web_push_store import WebPushStore, WebPushSubscription
+
+
+DB_FILE = os.path.join(os.path.dirname(__file__), "..", "data", "subscriptions.db")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS notification_subscriptions (
+    id TEXT PRIMARY KEY,
+    booking_id TEXT NOT NULL UNIQUE,
+    phone_e164 TEXT NOT NULL,
+    temple TEXT NOT NULL,
+    queue_number INTEGER NOT NULL,
+    time_slot TEXT,
+    enabled INTEGER NOT NULL,
+    created_at TEXT NOT NULL,
+    last_sent_at TEXT,
+    shard_key INTEGER
+);
+CREATE INDEX IF NOT EXISTS ix_notification_enabled ON notification_subscriptions (enabled);
+
+CREATE TABLE IF NOT EXISTS web_push_subscriptions (
+    id TEXT PRIMARY KEY,
+    endpoint TEXT NOT NULL UNIQUE,
+    booking_id TEXT,
+    temple TEXT,
+    queue_number INTEGER,
+    time_slot TEXT,
+    enabled INTEGER NOT NULL,
+    subscription TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    last_sent_at TEXT,
+    shard_key INTEGER
+);
+CREATE INDEX IF NOT EXISTS ix_web_push_booking ON web_push_subscriptions (booking_id);
+CREATE INDEX IF NOT EXISTS ix_web_push_temple ON web_push_subscriptions (temple);
+CREATE INDEX IF NOT EXISTS ix_web_push_enabled ON web_push_subscriptions (enabled);
+"""
+
+_SHARDED_TABLES = ("notification_subscriptions", "web_push_subscriptions")
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class SqliteDatabase:
+    """One SQLite file shared by every worker process.
+
+    Each thread gets its own connection (sqlite3 connections are not meant to be
+    shared across threads). WAL mode lets readers run alongside the single
+    writer, and every statement below is a constant string, so sqlite3's
+    per-connection statement cache keeps them prepared.
+    """
+
+    def __init__(self, path: str = DB_FILE):
+        self.path = os.path.abspath(path)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._local = threading.local()
+        # executescript manages its own transaction; the statements are idempotent.
+        self.connection().executescript(_SCHEMA)
+        self._add_shard_keys()
+
+    def connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, cached_statements=256)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def _add_shard_keys(self) -> None:
+        # shard_key (``shard_hash(id)``) lets the schedulers read one shard
+        # through an index; databases created before it get it backfilled.
+        with self.transaction() as conn:
+            for table in _SHARDED_TABLES:
+                columns = {row["name"] for row in conn.execute(f"PRAGMA table_info({table})")}
+                if "shard_key" not in columns:
+                    conn.execute(f"ALTER TABLE {table} ADD COLUMN shard_key INTEGER")
+                    ids = [row["id"] for row in conn.execute(f"SELECT id FROM {table}")]
+                    conn.executemany(f"UPDATE {table} SET shard_key = ? WHERE id = ?", [(shard_hash(i), i) for i in ids])
+                conn.execute(f"CREATE INDEX IF NOT EXISTS ix_{table}_shard ON {table} (enabled, shard_key)")
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        # BEGIN IMMEDIATE takes the write lock up front, so read-modify-write
+        # sequences (upsert) are atomic across processes.
+        conn = self.connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+
+def _notification_from_row(row: sqlite3.Row) -> NotificationSubscription:
+    return NotificationSubscription(
+        id=row["id"],
+        booking_id=row["booking_id"],
+        phone_e164=row["phone_e164"],
+        temple=row["temple"],
+        queue_number=int(row["queue_number"]),
+        time_slot=row["time_slot"],
+        enabled=bool(row["enabled"]),
+        created_at=row["created_at"],
+        last_sent_at=row["last_sent_at"],
+    )
+
+
+def _web_push_from_row(row: sqlite3.Row) -> WebPushSubscription:
+    return WebPushSubscription(
+        id=row["id"],
+        booking_id=row["booking_id"],
+        temple=row["temple"],
+        queue_number=row["queue_number"],
+        time_slot=row["time_slot"],
+        enabled=bool(row["enabled"]),
+        subscription=json.loads(row["subscription"]),
+        created_at=row["created_at"],
+        last_sent_at=row["last_sent_at"],
+    )
+
+
+def _iter_enabled_rows(
+    db: SqliteDatabase,
+    table: str,
+    batch_size: int,
+    temple: Optional[str],
+    time_slot: Optional[str],
+    shard: Optional[Tuple[int, int]],
+) -> Iterator[List[sqlite3.Row]]:
+    # Keyset pagination: each page is a short read transaction, so a long
+    # dispatch run neither holds the database nor re-scans skipped rows.
+    where = "enabled = 1"
+    params: List[Any] = []
+    if temple is not None:
+        where += " AND temple = ?"
+        params.append(temple)
+    if time_slot is not None:
+        where += " AND time_slot = ?"
+        params.append(time_slot)
+    if shard is None:
+        order, last = "rowid", (0,)
+    else:
+        # A shard is one shard_key range of the (enabled, shard_key) index.
+        low, high = shard_range(*shard)
+        where += " AND shard_key >= ? AND shard_key < ?"
+        params += [low, high]
+        order, last = "shard_key, rowid", (low, 0)
+    marks = ", ".join("?" for _ in last)
+    sql = f"SELECT rowid AS _rowid, * FROM {table} WHERE {where} AND ({order}) > ({marks}) ORDER BY {order} LIMIT ?"
+    while True:
+        rows = db.connection().execute(sql, [*params, *last, max(1, int(batch_size))]).fetchall()
+        if not rows:
+            return
+        last = (rows[-1]["_rowid"],) if shard is None else (rows[-1]["shard_key"], rows[-1]["_rowid"])
+        yield rows
+
+
+class SqliteNotificationStore:
+    """SQLite-backed drop-in for ``NotificationStore``."""
+
+    _INSERT = (
+        "INSERT OR REPLACE INTO notification_subscriptions "
+        "(id, booking_id, phone_e164, temple, queue_number, time_slot, enabled, created_at, last_sent_at, shard_key) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+    )
+    _UPDATE = (
+        "UPDATE notification_subscriptions SET "
+        "booking_id = ?, phone_e164 = ?, temple = ?, queue_number = ?, time_slot = ?, enabled = ?, created_at = ?, last_sent_at = ?, "
+        "shard_key = ? "
+        "WHERE id = ?"
+    )
+
+    def __init__(self, db: Optional[SqliteDatabase] = None):
+        self.db = db or SqliteDatabase()
+
+    @staticmethod
+    def _params(s: NotificationSubscription):
+        return (
+            s.id, s.booking_id, s.phone_e164, s.temple, s.queue_number, s.time_slot,
+            int(s.enabled), s.created_at, s.last_sent_at, shard_hash(s.id),
+        )
+
+    def load_all(self) -> List[NotificationSubscription]:
+        rows = self.db.connection().execute("SELECT * FROM notification_subscriptions ORDER BY rowid").fetchall()
+        return [_notification_from_row(r) for r in rows]
+
+    def get(self, subscription_id: str) -> Optional[NotificationSubscription]:
+        row = self.db.connection().execute("SELECT * FROM notification_subscriptions WHERE id = ?", (subscription_id,)).fetchone()
+        return _notification_from_row(row) if row else None
+
+    def get_by_booking(self, booking_id: str) -> Optional[NotificationSubscription]:
+        row = self.db.connection().execute(
+            "SELECT * FROM notification_subscriptions WHERE booking_id = ?", (str(booking_id),)
+        ).fetchone()
+        return _notification_from_row(row) if row else None
+
+    def iter_enabled(
+        self,
+        batch_size: int = 500,
+        temple: Optional[str] = None,
+        time_slot: Optional[str] = None,
+        shard: Optional[Tuple[int, int]] = None,
+    ) -> Iterator[List[NotificationSubscription]]:
+        for rows in _iter_enabled_rows(self.db, "notification_subscriptions", batch_size, temple, time_slot, shard):
+            yield [_notification_from_row(r) for r in rows]
+
+    def save_all(self, subs: List[NotificationSubscription]) -> None:
+        with self.db.transaction() as conn:
+            conn.execute("DELETE FROM notification_subscriptions")
+            conn.executemany(self._INSERT, [self._params(s) for s in subs])
+
+    def import_records(self, subs: Iterable[NotificationSubscription]) -> int:
+        params = [self._params(s) for s in subs]
+        with self.db.transaction() as conn:
+            conn.executemany(self._INSERT, params)
+        return len(params)
+
+    def compact(self) -> None:
+        self.db.connection().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def upsert(self, booking_id: str, phone_e164: str, temple: str, queue_number: int, time_slot: Optional[str], enabled: bool) -> NotificationSubscription:
+        booking_id = str(booking_id)
+        with self.db.transaction() as conn:
+            row = conn.execute("SELECT * FROM notification_subscriptions WHERE booking_id = ?", (booking_id,)).fetchone()
+            existing = _notification_from_row(row) if row else None
+            sub = NotificationSubscription(
+                id=existing.id if existing else new_id("SUB"),
+                booking_id=booking_id,
+                phone_e164=phone_e164,
+                temple=temple,
+                queue_number=int(queue_number),
+                time_slot=time_slot,
+                enabled=bool(enabled),
+                created_at=existing.created_at if existing else _now_iso(),
+                last_sent_at=existing.last_sent_at if existing else None,
+            )
+            params = self._params(sub)
+            if existing:
+                conn.execute(self._UPDATE, params[1:] + params[:1])
+            else:
+                conn.execute(self._INSERT, params)
+            return sub
+
+    def mark_sent(self, subscription_id: str) -> None:
+        self.mark_sent_many([subscription_id])
+
+    def mark_sent_many(self, subscription_ids: Iterable[str], ts: Optional[str] = None) -> int:
+        ts = ts or _now_iso()
+        params = [(ts, sub_id) for sub_id in subscription_ids]
+        with self.db.transaction() as conn:
+            cur = conn.executemany("UPDATE notification_subscriptions SET last_sent_at = ? WHERE id = ?", params)
+            return cur.rowcount
+
+    def set_enabled_many(self, subscription_ids: Iterable[str], enabled: bool) -> int:
+        params = [(int(bool(enabled)), sub_id) for sub_id in subscription_ids]
+        with self.db.transaction() as conn:
+            cur = conn.executemany("UPDATE notification_subscriptions SET enabled = ? WHERE id = ?", params)
+            return cur.rowcount
+
+
+class SqliteWebPushStore:
+    """SQLite-backed drop-in for ``WebPushStore``."""
+
+    _INSERT = (
+        "INSERT OR REPLACE INTO web_push_subscriptions "
+        "(id, endpoint, booking_id, temple, queue_number, time_slot, enabled, subscription, created_at, last_sent_at, shard_key) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+    )
+    _UPDATE = (
+        "UPDATE web_push_subscriptions SET "
+        "endpoint = ?, booking_id = ?, temple = ?, queue_number = ?, time_slot = ?, enabled = ?, subscription = ?, created_at = ?, "
+        "last_sent_at = ?, shard_key = ? "
+        "WHERE id = ?"
+    )
+
+    def __init__(self, db: Optional[SqliteDatabase] = None):
+        self.db = db or SqliteDatabase()
+
+    @staticmethod
+    def _params(s: WebPushSubscription):
+        endpoint = str((s.subscription or {}).get("endpoint") or "").strip()
+        return (
+            s.id, endpoint, s.booking_id, s.temple, s.queue_number, s.time_slot,
+            int(s.enabled), json.dumps(s.subscription, ensure_ascii=False), s.created_at, s.last_sent_at,
+            shard_hash(s.id),
+        )
+
+    def _select(self, where: str, params: tuple) -> List[WebPushSubscription]:
+        rows = self.db.connection().execute(f"SELECT * FROM web_push_subscriptions {where}", params).fetchall()
+        return [_web_push_from_row(r) for r in rows]
+
+    def load_all(self) -> List[WebPushSubscription]:
+        return self._select("ORDER BY rowid", ())
+
+    def get(self, subscription_id: str) -> Optional[WebPushSubscription]:
+        found = self._select("WHERE id = ?", (subscription_id,))
+        return found[0] if found else None
+
+    def get_by_endpoint(self, endpoint: str) -> Optional[WebPushSubscription]:
+        found = self._select("WHERE endpoint = ?", (str(endpoint or "").strip(),))
+        return found[0] if found else None
+
+    def find_by_booking(self, booking_id: str) -> List[WebPushSubscription]:
+        return self._select("WHERE booking_id = ? ORDER BY rowid", (str(booking_id),)) if booking_id else []
+
+    def find_by_temple(self, temple: str) -> List[WebPushSubscription]:
+        return self._select("WHERE temple = ? ORDER BY rowid", (str(temple),)) if temple else []
+
+    def iter_enabled(
+        self,
+        batch_size: int = 500,
+        temple: Optional[str] = None,
+        time_slot: Optional[str] = None,
+        shard: Optional[Tuple[int, int]] = None,
+    ) -> Iterator[List[WebPushSubscription]]:
+        for rows in _iter_enabled_rows(self.db, "web_push_subscriptions", batch_size, temple, time_slot, shard):
+            yield [_web_push_from_row(r) for r in rows]
+
+    def save_all(self, subs: List[WebPushSubscription]) -> None:
+        with self.db.transaction() as conn:
+            conn.execute("DELETE FROM web_push_subscriptions")
+            conn.executemany(self._INSERT, [self._params(s) for s in subs])
+
+    def import_records(self, subs: Iterable[WebPushSubscription]) -> int:
+        params = [self._params(s) for s in subs if (s.subscription or {}).get("endpoint")]
+        with self.db.transaction() as conn:
+            conn.executemany(self._INSERT, params)
+        return len(params)
+
+    def compact(self) -> None:
+        self.db.connection().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def upsert(
+        self,
+        *,
+        subscription: Dict[str, Any],
+        booking_id: Optional[str] = None,
+        temple: Optional[str] = None,
+        queue_number: Optional[int] = None,
+        time_slot: Optional[str] = None,
+        enabled: bool = True,
+    ) -> WebPushSubscription:
+        endpoint = str((subscription or {}).get("endpoint") or "").strip()
+        if not endpoint:
+            raise ValueError("subscription.endpoint is required")
+
+        with self.db.transaction() as conn:
+            row = conn.execute("SELECT * FROM web_push_subscriptions WHERE endpoint = ?", (endpoint,)).fetchone()
+            existing = _web_push_from_row(row) if row else None
+            if existing:
+                sub = WebPushSubscription(
+                    id=existing.id,
+                    booking_id=str(booking_id) if booking_id else existing.booking_id,
+                    temple=str(temple) if temple else existing.temple,
+                    queue_number=int(queue_number) if queue_number is not None else existing.queue_number,
+                    time_slot=str(time_slot) if time_slot else existing.time_slot,
+                    enabled=bool(enabled),
+                    subscription=subscription,
+                    created_at=existing.created_at,
+                    last_sent_at=existing.last_sent_at,
+                )
+            else:
+                sub = WebPushSubscription(
+                    id=new_id("SUB"),
+                    booking_id=str(booking_id) if booking_id else None,
+                    temple=str(temple) if temple else None,
+                    queue_number=int(queue_number) if queue_number is not None else None,
+                    time_slot=str(time_slot) if time_slot else None,
+                    enabled=bool(enabled),
+                    subscription=subscription,
+                    created_at=_now_iso(),
+                    last_sent_at=None,
+                )
+            params = self._params(sub)
+            if existing:
+                conn.execute(self._UPDATE, params[1:] + params[:1])
+            else:
+                conn.execute(self._INSERT, params)
+            return sub
+
+    def disable_by_endpoint(self, endpoint: str) -> bool:
+        endpoint = str(endpoint or "").strip()
+        if not endpoint:
+            return False
+        with self.db.transaction() as conn:
+            cur = conn.execute("UPDATE web_push_subscriptions SET enabled = 0 WHERE endpoint = ? AND enabled = 1", (endpoint,))
+            return cur.rowcount > 0
+
+    def mark_sent(self, subscription_id: str) -> None:
+        self.mark_sent_many([subscription_id])
+
+    def mark_sent_many(self, subscription_ids: Iterable[str], ts: Optional[str] = None) -> int:
+        ts = ts or _now_iso()
+        params = [(ts, sub_id) for sub_id in subscription_ids]
+        with self.db.transaction() as conn:
+            cur = conn.executemany("UPDATE web_push_subscriptions SET last_sent_at = ? WHERE id = ?", params)
+            return cur.rowcount
+
+    def set_enabled_many(self, subscription_ids: Iterable[str], enabled: bool) -> int:
+        params = [(int(bool(enabled)), sub_id) for sub_id in subscription_ids]
+        with self.db.transaction() as conn:
+            cur = conn.executemany("UPDATE web_push_subscriptions SET enabled = ? WHERE id = ?", params)
+            return cur.rowcount
+
+    def record_outcomes(self, sent_ids: Iterable[str], gone_ids: Iterable[str], ts: Optional[str] = None) -> None:
+        """Commit a dispatch round: stamp delivered ids and disable gone endpoints."""
+        ts = ts or _now_iso()
+        with self.db.transaction() as conn:
+            conn.executemany("UPDATE web_push_subscriptions SET last_sent_at = ? WHERE id = ?", [(ts, i) for i in sent_ids])
+            conn.executemany("UPDATE web_push_subscriptions SET enabled = 0 WHERE id = ?", [(i,) for i in gone_ids])
+
+
+def import_json_stores(db: Optional[SqliteDatabase] = None) -> Dict[str, int]:
+    """One-shot copy of the JSON stores (snapshot + change log) into SQLite.
+
+    Safe to re-run: rows are keyed by id and replaced.
+    """
+    db = db or SqliteDatabase()
+    return {
+        "notification_subscriptions": SqliteNotificationStore(db).import_records(NotificationStore().load_all()),
+        "web_push_subscriptions": SqliteWebPushStore(db).import_records(WebPushStore().load_all()),
+    }
+
+
+if __name__ == "__main__":
+    # python -m app.services.sqlite_store [path/to/subscriptions.db]
+    target = SqliteDatabase(sys.argv[1]) if len(sys.argv) > 1 else SqliteDatabase(os.getenv("SUBSCRIPTION_DB_PATH") or DB_FILE)
+    counts = import_json_stores(target)
+    print(f"[store] imported into {target.path}: " + ", ".join(f"{k}={v}" for k, v in counts.items()))
@@ -0,0 +1,34 @@
+import os
+from typing import Optional
+
+from .notifications_store import NotificationStore
+from .sqlite_store import DB_FILE, SqliteDatabase, SqliteNotificationStore, SqliteWebPushStore
+from .web_push_store import WebPushStore
+
+
+# SUBSCRIPTION_STORE_BACKEND=json (default) keeps the JSON snapshot + change-log
+# files; =sqlite uses one WAL-mode SQLite file that several workers can share.
+_db: Optional[SqliteDatabase] = None
+
+
+def _backend() -> str:
+    return (os.getenv("SUBSCRIPTION_STORE_BACKEND") or "json").strip().lower()
+
+
+def _sqlite_db() -> SqliteDatabase:
+    global _db
+    if _db is None:
+        _db = SqliteDatabase(os.getenv("SUBSCRIPTION_DB_PATH") or DB_FILE)
+    return _db
+
+
+def create_notification_store():
+    if _backend() == "sqlite":
+        return SqliteNotificationStore(_sqlite_db())
+    return NotificationStore()
+
+
+def create_web_push_store():
+    if _backend() == "sqlite":
+        return SqliteWebPushStore(_sqlite_db())
+    return WebPushStore()
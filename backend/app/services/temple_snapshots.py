@@ -0,0 +1,170 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from fastapi import Response
+
+from .bounded_cache import BoundedCache
+
+
+# The crowd readings below are mock values; they change once per window so
+# that every view of a window (and every worker) renders the same numbers.
+_READING_SECONDS = 30
+_CAPACITY = 5000
+_ZONES = (("Main Hall", 800, 1000), ("Entrance", 500, 800))
+
+
+def _crowd_level(count: int, capacity: int) -> str:
+    ratio = count / capacity if capacity else 0.0
+    return "low" if ratio < 0.5 else "medium" if ratio < 0.8 else "high"
+
+
+def build_temple_views(temple_slug: str, now: float) -> Dict[str, Dict[str, Any]]:
+    """One reading of a temple, rendered as the live status, temple info and
+    analytics payloads so the three endpoints always agree."""
+    reading_at = now - now % _READING_SECONDS
+    rng = random.Random(f"{temple_slug}:{int(reading_at)}")
+    crowd = 3000 + rng.randint(-100, 100)
+    level = _crowd_level(crowd, _CAPACITY)
+    stamp = datetime.fromtimestamp(reading_at).isoformat()
+    zones = [{"name": name, "count": count, "capacity": capacity} for name, count, capacity in _ZONES]
+    return {
+        "status": {
+            "templeId": temple_slug,
+            "currentQueue": crowd,
+            "estimatedWaitTime": f"{rng.randint(40, 70)} minutes",
+            "estimatedWaitTimeConfidence": "5",
+            "nextBatchTime": "10 minutes",
+            "crowdLevel": level,
+            "lastUpdated": stamp,
+            "zones": zones,
+        },
+        "info": {
+            "id": temple_slug,
+            "name": "Temple",
+            "location": "Location",
+            "capacity": _CAPACITY,
+            "currentCrowd": crowd,
+            "status": "open",
+            "isOpen": True,
+            "crowdLevel": level,
+            "lastUpdated": stamp,
+        },
+        "analytics": {
+            "currentCount": crowd,
+            "capacity": _CAPACITY,
+            "crowdLevel": level,
+            "timestamp": stamp,
+            "zones": zones,
+        },
+    }
+
+
+class TempleSnapshot:
+    """Every view of one temple at one moment, serialized once, with ETags."""
+
+    __slots__ = ("payloads", "bodies", "etags")
+
+    def __init__(self, payloads: Dict[str, Dict[str, Any]]):
+        self.payloads = payloads
+        self.bodies = {view: json.dumps(p, separators=(",", ":")).encode("utf-8") for view, p in payloads.items()}
+        self.etags = {view: '"%s"' % hashlib.blake2b(b, digest_size=8).hexdigest() for view, b in self.bodies.items()}
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == "*" or candidate == etag:
+            return True
+    return False
+
+
+class TempleSnapshotCache:
+    """Precomputed per-temple snapshots behind the status/info/analytics routes.
+
+    The first request for a temple builds its snapshot; from then on a
+    background task rebuilds it every ``TEMPLE_SNAPSHOT_REFRESH_SECONDS`` and
+    swaps it in whole, so a request is a dict lookup plus writing bytes that
+    were encoded once, and all three views come from the same reading. A
+    rebuild whose bytes are unchanged keeps the old snapshot, so ETags only
+    move when the data does and polling clients get ``304 Not Modified``.
+
+    Temples nobody asked about for ``TEMPLE_SNAPSHOT_IDLE_SECONDS`` stop being
+    refreshed and are dropped; at most ``TEMPLE_SNAPSHOT_MAX_TEMPLES`` are kept.
+    """
+
+    def __init__(
+        self,
+        build=build_temple_views,
+        refresh_seconds: Optional[float] = None,
+        max_temples: Optional[int] = None,
+        idle_seconds: Optional[float] = None,
+    ):
+        self._build = build
+        self.refresh_seconds = float(refresh_seconds or os.getenv("TEMPLE_SNAPSHOT_REFRESH_SECONDS", "1"))
+        self._snapshots: BoundedCache[TempleSnapshot] = BoundedCache(
+            max_entries=int(max_temples or os.getenv("TEMPLE_SNAPSHOT_MAX_TEMPLES", "1000")),
+            idle_ttl_seconds=float(idle_seconds or os.getenv("TEMPLE_SNAPSHOT_IDLE_SECONDS", "300")),
+        )
+        self.rebuilds = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def get(self, temple_slug: str) -> TempleSnapshot:
+        snap = self._snapshots.get(temple_slug)
+        if snap is None:
+            snap = TempleSnapshot(self._build(temple_slug, time.time()))
+            self._snapshots.put(temple_slug, snap)
+        return snap
+
+    def response(self, temple_slug: str, view: str, if_none_match: Optional[str] = None) -> Response:
+        snap = self.get(temple_slug)
+        etag = snap.etags[view]
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if if_none_match and _etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+        return Response(content=snap.bodies[view], media_type="application/json", headers=headers)
+
+    def refresh(self, now: Optional[float] = None) -> int:
+        """Rebuild every active temple; returns how many snapshots changed."""
+        now = now if now is not None else time.time()
+        changed = 0
+        for temple_slug in self._snapshots.keys(now):
+            snap = TempleSnapshot(self._build(temple_slug, now))
+            old = self._snapshots.peek(temple_slug)
+            if old is not None and old.etags == snap.etags:
+                continue
+            if self._snapshots.replace(temple_slug, snap):
+                changed += 1
+        self.rebuilds += changed
+        return changed
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_seconds)
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"[snapshots][error] refresh failed err={e}")
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def metrics(self) -> Dict[str, Any]:
+        return {**self._snapshots.metrics(), "rebuilds": self.rebuilds}
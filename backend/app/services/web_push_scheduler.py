@@ -1,21 +1,28 @@
 import os
 import random
+import time
 from datetime import datetime, timezone
 from typing import Optional
 
 from apscheduler.schedulers.background import BackgroundScheduler
 
+from .dispatch_schedule import DispatchPlan
+from .leader_lease import LeaderLease, create_leader_lease
+from .push_dispatcher import PushDispatcher
+from .queue_engine import QueueEngine
 from .web_push_sender import WebPushSender
 from .web_push_store import WebPushStore
 
 
 _scheduler: Optional[BackgroundScheduler] = None
+_lease: Optional[LeaderLease] = None
 
 
-def _build_payload(temple: str, queue_number: int, wait_minutes: int) -> dict:
+def _build_payload(temple: str, queue_number: int, wait_minutes: int, time_label: Optional[str] = None) -> dict:
+    time_label = time_label or datetime.now(timezone.utc).strftime('%H:%M UTC')
     return {
         "title": "Temple Queue Update",
-        "body": f"Temple: {temple}\nToken: {queue_number}\nEstimated wait: {wait_minutes} min\nTime: {datetime.now(timezone.utc).strftime('%H:%M UTC')}",
+        "body": f"Temple: {temple}\nToken: {queue_number}\nEstimated wait: {wait_minutes} min\nTime: {time_label}",
         "tag": "queue_update",
         "url": "/live-tracking",
         "data": {
@@ -26,56 +33,111 @@ def _build_payload(temple: str, queue_number: int, wait_minutes: int) -> dict:
     }
 
 
-def start_web_push_scheduler(store: WebPushStore) -> BackgroundScheduler:
-    global _scheduler
+def start_web_push_scheduler(
+    store: WebPushStore,
+    dispatcher: Optional[PushDispatcher] = None,
+    lease: Optional[LeaderLease] = None,
+    engine: Optional[QueueEngine] = None,
+) -> BackgroundScheduler:
+    global _scheduler, _lease
     if _scheduler and _scheduler.running:
         return _scheduler
 
-    sender = WebPushSender()
+    dispatcher = dispatcher or PushDispatcher(WebPushSender())
+    sender = dispatcher.sender
+    lease = lease or create_leader_lease("web_push")
 
-    def job() -> None:
-        if not sender.is_configured():
-            return
-
-        subs = store.load_all()
-        for s in subs:
-            if not s.enabled:
-                continue
-
-            temple = s.temple or "Temple"
-            queue = int(s.queue_number or 1)
+    interval_seconds = int(os.getenv("PUSH_NOTIFICATION_INTERVAL_SECONDS", os.getenv("NOTIFICATION_INTERVAL_SECONDS", "3600")))
+    plan = DispatchPlan(interval_seconds)
 
-            base = 45
-            jitter = random.randint(-8, 10)
-            wait_minutes = max(5, base + jitter)
+    # Subscriptions are streamed in batches: each batch is dispatched and
+    # committed before the next is read, so a run's memory stays flat.
+    batch_size = int(os.getenv("SCHEDULER_BATCH_SIZE", "500"))
 
-            payload = _build_payload(temple, queue, wait_minutes)
-            try:
-                sender.send(s.subscription, payload)
-                store.mark_sent(s.id)
-            except Exception as e:
-                # If endpoint is gone, callers would normally remove it.
-                # Keep it for now; disable explicitly via unsubscribe.
-                print(f"[webpush][error] subscription={s.id} err={e}")
+    def job() -> None:
+        now = time.time()
+        # Followers advance too, so a new leader picks up the rotation.
+        shard = plan.next_shard(now)
+        if not sender.is_configured() or not lease.is_leader:
+            return
 
-    interval_seconds = int(os.getenv("PUSH_NOTIFICATION_INTERVAL_SECONDS", os.getenv("NOTIFICATION_INTERVAL_SECONDS", "3600")))
+        time_label = datetime.now(timezone.utc).strftime('%H:%M UTC')
+        waits = {}
+        payloads = {}
+        gone_total = 0
+        for batch in store.iter_enabled(batch_size=batch_size, shard=(shard, plan.shards)):
+            items = []
+            item_waits = {}
+            for s in batch:
+                temple = s.temple or "Temple"
+                queue = int(s.queue_number or 1)
+
+                # Subscribers with the same temple, token and wait share a payload,
+                # so it is serialized once.
+                if engine is not None:
+                    wait_minutes = engine.estimate(temple, queue, now, time_slot=s.time_slot).wait_minutes
+                else:
+                    # No queue engine: simulate one wait per temple per run
+                    if temple not in waits:
+                        base = 45
+                        jitter = random.randint(-8, 10)
+                        waits[temple] = max(5, base + jitter)
+                    wait_minutes = waits[temple]
+
+                if not plan.should_send(s.id, s.time_slot, wait_minutes, s.last_sent_at, now):
+                    continue
+                item_waits[s.id] = wait_minutes
+
+                content = (temple, queue, wait_minutes)
+                if content not in payloads:
+                    payloads[content] = _build_payload(temple, queue, wait_minutes, time_label)
+                items.append((s.id, s.push_info, payloads[content]))
+
+            sent_ids = []
+            gone_ids = []
+            for result in dispatcher.dispatch(items):
+                if result.ok:
+                    sent_ids.append(result.key)
+                    plan.record_sent(result.key, item_waits[result.key])
+                elif result.gone:
+                    gone_ids.append(result.key)
+                    plan.forget(result.key)
+                else:
+                    print(f"[webpush][error] subscription={result.key} status={result.status} attempts={result.attempts} err={result.error}")
+
+            # Commit each batch in one write; gone endpoints are disabled so
+            # the next run doesn't pay a round trip for them again.
+            if sent_ids or gone_ids:
+                store.record_outcomes(sent_ids, gone_ids)
+            gone_total += len(gone_ids)
+
+        if gone_total:
+            print(f"[webpush] disabled {gone_total} gone subscriptions")
 
     sched = BackgroundScheduler(timezone="UTC")
-    sched.add_job(job, "interval", seconds=interval_seconds, id="web_push", replace_existing=True)
+    # Every process runs the scheduler, but only the lease holder sends; the
+    # heartbeat renews our term or takes over when the leader stops renewing.
+    lease.try_acquire()
+    sched.add_job(lease.try_acquire, "interval", seconds=max(1.0, lease.ttl_seconds / 3), id="web_push_lease", replace_existing=True)
+    sched.add_job(job, "interval", seconds=plan.tick_seconds, id="web_push", replace_existing=True, coalesce=True)
     sched.start()
 
     _scheduler = sched
-    print(f"[webpush] scheduler started interval_seconds={interval_seconds}")
-    print(f"[webpush] vapid_configured={sender.is_configured()}")
+    _lease = lease
+    print(f"[webpush] scheduler started interval_seconds={interval_seconds} shards={plan.shards}")
+    print(f"[webpush] vapid_configured={sender.is_configured()} concurrency={dispatcher.concurrency}")
 
     return sched
 
 
 def stop_web_push_scheduler() -> None:
-    global _scheduler
+    global _scheduler, _lease
     if _scheduler:
         try:
             _scheduler.shutdown(wait=False)
         except Exception:
             pass
         _scheduler = None
+    if _lease:
+        _lease.release()
+        _lease = None
@@ -1,8 +1,17 @@
+import base64
 import json
 import os
-from typing import Any, Dict, Optional
+import threading
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlparse
 
-from pywebpush import WebPushException, webpush
+import http_ece
+import requests
+from cryptography.hazmat.primitives.asymmetric import ec
+from py_vapid import Vapid
 
 
 def _env(name: str) -> Optional[str]:
@@ -13,11 +22,75 @@ def _env(name: str) -> Optional[str]:
     return value or None
 
 
+# Delivery outcomes reported by WebPushSender.send / send_encoded.
+DELIVERED = "delivered"
+GONE = "gone"  # 404/410: the subscription no longer exists at the push service
+RATE_LIMITED = "rate_limited"  # 429, usually with Retry-After
+TRANSIENT = "transient"  # 5xx or network error; worth retrying
+FAILED = "failed"  # anything else (bad request, auth, payload too large, ...)
+
+
+@dataclass
+class PushOutcome:
+    status: str
+    status_code: Optional[int] = None
+    retry_after: Optional[float] = None
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.status == DELIVERED
+
+    @property
+    def retryable(self) -> bool:
+        return self.status in (RATE_LIMITED, TRANSIENT)
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _classify(resp: requests.Response) -> PushOutcome:
+    code = resp.status_code
+    if code <= 202:
+        return PushOutcome(DELIVERED, code)
+    error = f"Push failed: {code} {resp.reason}"
+    retry_after = _parse_retry_after(resp.headers.get("Retry-After"))
+    if code in (404, 410):
+        return PushOutcome(GONE, code, error=error)
+    if code == 429:
+        return PushOutcome(RATE_LIMITED, code, retry_after=retry_after, error=error)
+    if code >= 500:
+        return PushOutcome(TRANSIENT, code, retry_after=retry_after, error=error)
+    return PushOutcome(FAILED, code, error=error)
+
+
+# Push services accept VAPID tokens for at most 24h; refresh a little early so a
+# token never expires while a broadcast is in flight.
+VAPID_TOKEN_TTL_SECONDS = 12 * 60 * 60
+VAPID_REFRESH_MARGIN_SECONDS = 10 * 60
+
+
 class WebPushSender:
     def __init__(self):
         self.vapid_public_key = _env("VAPID_PUBLIC_KEY")
         self.vapid_private_key = self._load_private_key(_env("VAPID_PRIVATE_KEY"))
         self.vapid_subject = _env("VAPID_SUBJECT") or "mailto:admin@example.com"
+        self.token_ttl_seconds = int(_env("VAPID_TOKEN_TTL_SECONDS") or VAPID_TOKEN_TTL_SECONDS)
+
+        # Parsed once here; signed headers are cached per push-service origin.
+        self._vapid = self._parse_vapid(self.vapid_private_key)
+        self._vapid_headers: Dict[str, Tuple[Dict[str, str], int]] = {}
+        self._vapid_lock = threading.Lock()
 
     @staticmethod
     def _load_private_key(value: Optional[str]) -> Optional[str]:
@@ -36,20 +109,82 @@ class WebPushSender:
         # Otherwise treat it as a raw PEM string.
         return value
 
+    @staticmethod
+    def _parse_vapid(private_key: Optional[str]) -> Optional[Vapid]:
+        if not private_key:
+            return None
+        try:
+            if "-----BEGIN" in private_key:
+                return Vapid.from_pem(private_key.encode("utf-8"))
+            # Base64 DER or raw 32-byte key
+            return Vapid.from_string(private_key)
+        except Exception as e:
+            print(f"[webpush][error] invalid VAPID_PRIVATE_KEY err={e}")
+            return None
+
     def is_configured(self) -> bool:
-        return bool(self.vapid_public_key and self.vapid_private_key)
+        return bool(self.vapid_public_key and self._vapid)
+
+    def _headers_for(self, endpoint: str) -> Dict[str, str]:
+        url = urlparse(endpoint)
+        aud = f"{url.scheme}://{url.netloc}"
+        now = int(time.time())
+        with self._vapid_lock:
+            cached = self._vapid_headers.get(aud)
+            if cached and cached[1] - now > VAPID_REFRESH_MARGIN_SECONDS:
+                return cached[0]
 
-    def send(self, subscription_info: Dict[str, Any], payload: Dict[str, Any]) -> None:
+            exp = now + self.token_ttl_seconds
+            headers = self._vapid.sign({"sub": self.vapid_subject, "aud": aud, "exp": exp})
+            self._vapid_headers[aud] = (headers, exp)
+            return headers
+
+    @staticmethod
+    def encode_payload(payload: Dict[str, Any]) -> bytes:
+        """Serialize a payload once so it can be encrypted for many recipients."""
+        return json.dumps(payload).encode("utf-8")
+
+    @staticmethod
+    def _decode_key(value: Any) -> bytes:
+        if isinstance(value, bytes):
+            return value
+        value = str(value or "")
+        return base64.urlsafe_b64decode(value + "=" * (-len(value) % 4))
+
+    def send(self, subscription_info: Dict[str, Any], payload: Dict[str, Any], session: Optional[requests.Session] = None) -> PushOutcome:
+        return self.send_encoded(subscription_info, self.encode_payload(payload), session=session)
+
+    def send_encoded(self, subscription_info: Dict[str, Any], data: bytes, session: Optional[requests.Session] = None) -> PushOutcome:
+        """Encrypt an already-serialized payload for one subscription and POST it.
+
+        Only the per-recipient ECDH + AES-GCM step (RFC 8291, aes128gcm) happens
+        here; serialization and VAPID signing are shared across recipients.
+        Delivery problems are returned as a ``PushOutcome`` rather than raised.
+        """
         if not self.is_configured():
             raise RuntimeError("Web Push is not configured (missing VAPID_PUBLIC_KEY/VAPID_PRIVATE_KEY)")
 
+        endpoint = str(subscription_info.get("endpoint") or "")
+        keys = subscription_info.get("keys") or {}
+        try:
+            receiver_key = self._decode_key(keys.get("p256dh"))
+            auth_secret = self._decode_key(keys.get("auth"))
+        except (ValueError, TypeError) as e:
+            return PushOutcome(FAILED, error=f"invalid subscription keys: {e}")
+        if not endpoint or len(receiver_key) != 65 or not auth_secret:
+            return PushOutcome(FAILED, error="subscription is missing endpoint or keys")
+
+        body = http_ece.encrypt(
+            data,
+            private_key=ec.generate_private_key(ec.SECP256R1()),
+            dh=receiver_key,
+            auth_secret=auth_secret,
+            version="aes128gcm",
+        )
+        headers = dict(self._headers_for(endpoint))
+        headers.update({"Content-Encoding": "aes128gcm", "TTL": "0"})
         try:
-            webpush(
-                subscription_info=subscription_info,
-                data=json.dumps(payload),
-                vapid_private_key=self.vapid_private_key,
-                vapid_claims={"sub": self.vapid_subject},
-            )
-        except WebPushException as e:
-            # Bubble up for callers to decide whether to disable subscription
-            raise RuntimeError(f"WebPush failed: {e}")
+            resp = (session or requests).post(endpoint, data=body, headers=headers, timeout=30)
+        except requests.RequestException as e:
+            return PushOutcome(TRANSIENT, error=str(e))
+        return _classify(resp)
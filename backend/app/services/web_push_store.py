@@ -1,10 +1,10 @@
-import json
 import os
-import threading
-from dataclasses import asdict, dataclass
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional
-from uuid import uuid4
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from .ids import new_id
+from .record_store import RecordStore
+from .records import CompactRecord, intern_text, pack_b64url, pack_timestamp, unpack_b64url, unpack_timestamp
 
 
 DATA_FILE = os.path.join(os.path.dirname(__file__), "..", "data", "web_push_subscriptions.json")
@@ -14,57 +14,166 @@ def _now_iso() -> str:
     return datetime.now(timezone.utc).isoformat()
 
 
-@dataclass
-class WebPushSubscription:
-    id: str
-    booking_id: Optional[str]
-    temple: Optional[str]
-    queue_number: Optional[int]
-    time_slot: Optional[str]
-    enabled: bool
-    subscription: Dict[str, Any]
-    created_at: str
-    last_sent_at: Optional[str]
-
-
-class WebPushStore:
-    def __init__(self, path: str = DATA_FILE):
-        self._path = os.path.abspath(path)
-        self._lock = threading.RLock()
-        os.makedirs(os.path.dirname(self._path), exist_ok=True)
-
-    def load_all(self) -> List[WebPushSubscription]:
-        with self._lock:
-            if not os.path.exists(self._path):
-                return []
-            try:
-                with open(self._path, "r", encoding="utf-8") as f:
-                    raw = json.load(f)
-                items = raw if isinstance(raw, list) else raw.get("subscriptions", [])
-                out: List[WebPushSubscription] = []
-                for it in items:
-                    out.append(
-                        WebPushSubscription(
-                            id=str(it.get("id") or uuid4()),
-                            booking_id=(it.get("booking_id") or it.get("bookingId")),
-                            temple=(it.get("temple")),
-                            queue_number=(it.get("queue_number") or it.get("queueNumber")),
-                            time_slot=(it.get("time_slot") or it.get("timeSlot")),
-                            enabled=bool(it.get("enabled", True)),
-                            subscription=dict(it.get("subscription") or {}),
-                            created_at=str(it.get("created_at") or it.get("createdAt") or _now_iso()),
-                            last_sent_at=(it.get("last_sent_at") or it.get("lastSentAt")),
-                        )
-                    )
-                return out
-            except Exception:
-                return []
+class WebPushSubscription(CompactRecord):
+    """One browser push subscription, kept compact.
+
+    The nested subscription JSON is split into the endpoint, the two keys as
+    decoded bytes and any other members (e.g. ``expirationTime``); the
+    ``subscription`` property rebuilds the original dict. ``push_info`` is the
+    form the sender wants, with the keys already decoded. Timestamps are epoch
+    microseconds and temple/slot names are interned, as in
+    ``NotificationSubscription``.
+    """
+
+    __slots__ = (
+        "id", "booking_id", "temple", "queue_number", "time_slot", "enabled",
+        "endpoint", "_p256dh", "_auth", "_extra", "_created_at", "_last_sent_at",
+    )
+    FIELDS = ("id", "booking_id", "temple", "queue_number", "time_slot", "enabled", "subscription", "created_at", "last_sent_at")
 
-    def save_all(self, subs: List[WebPushSubscription]) -> None:
-        with self._lock:
-            payload = [asdict(s) for s in subs]
-            with open(self._path, "w", encoding="utf-8") as f:
-                json.dump(payload, f, ensure_ascii=False, indent=2)
+    def __init__(
+        self,
+        id: str,
+        booking_id: Optional[str],
+        temple: Optional[str],
+        queue_number: Optional[int],
+        time_slot: Optional[str],
+        enabled: bool,
+        subscription: Dict[str, Any],
+        created_at: Optional[str],
+        last_sent_at: Optional[str],
+    ):
+        self.id = id
+        self.booking_id = booking_id
+        self.temple = intern_text(temple)
+        self.queue_number = queue_number
+        self.time_slot = intern_text(time_slot)
+        self.enabled = enabled
+        self.subscription = subscription
+        self.created_at = created_at
+        self.last_sent_at = last_sent_at
+
+    @property
+    def subscription(self) -> Dict[str, Any]:
+        info: Dict[str, Any] = {} if self.endpoint is None else {"endpoint": self.endpoint}
+        if self._extra:
+            info.update(self._extra)
+        if self._p256dh is not None:
+            info["keys"] = {"p256dh": unpack_b64url(self._p256dh), "auth": unpack_b64url(self._auth)}
+        return info
+
+    @subscription.setter
+    def subscription(self, value: Dict[str, Any]) -> None:
+        value = dict(value or {})
+        endpoint = value.pop("endpoint", None)
+        self.endpoint = str(endpoint) if endpoint is not None else None
+        self._p256dh = self._auth = None
+        keys = value.get("keys")
+        # Only the usual {"p256dh", "auth"} pair is packed; any other shape is
+        # kept verbatim so the record still round-trips exactly.
+        if isinstance(keys, dict) and set(keys) == {"p256dh", "auth"}:
+            p256dh, auth = pack_b64url(keys["p256dh"]), pack_b64url(keys["auth"])
+            if isinstance(p256dh, bytes) and isinstance(auth, bytes):
+                self._p256dh, self._auth = p256dh, auth
+                del value["keys"]
+        self._extra = value or None
+
+    @property
+    def push_info(self) -> Dict[str, Any]:
+        if self._p256dh is None:
+            return self.subscription
+        return {"endpoint": self.endpoint, "keys": {"p256dh": self._p256dh, "auth": self._auth}}
+
+    @property
+    def created_at(self) -> Optional[str]:
+        return unpack_timestamp(self._created_at)
+
+    @created_at.setter
+    def created_at(self, value: Any) -> None:
+        self._created_at = pack_timestamp(value)
+
+    @property
+    def last_sent_at(self) -> Optional[str]:
+        return unpack_timestamp(self._last_sent_at)
+
+    @last_sent_at.setter
+    def last_sent_at(self, value: Any) -> None:
+        self._last_sent_at = pack_timestamp(value)
+
+
+def _endpoint_of(subscription: Dict[str, Any]) -> str:
+    return str((subscription or {}).get("endpoint") or "").strip()
+
+
+class WebPushStore(RecordStore[WebPushSubscription]):
+    """Web-push subscriptions, indexed by endpoint, booking id and temple.
+
+    The indexes are maintained incrementally on every write (and rebuilt from
+    the snapshot + change log on start-up), so subscribe/unsubscribe lookups are
+    O(1) regardless of table size.
+    """
+
+    record_type = WebPushSubscription
+
+    def __init__(self, path: str = DATA_FILE, compact_every: int = 1000, shared: Optional[bool] = None):
+        self._by_endpoint: Dict[str, str] = {}
+        self._by_booking: Dict[str, Set[str]] = {}
+        self._by_temple: Dict[str, Set[str]] = {}
+        super().__init__(path, compact_every=compact_every, shared=shared)
+
+    def _from_dict(self, it: Dict[str, Any]) -> WebPushSubscription:
+        return WebPushSubscription(
+            id=str(it.get("id") or new_id("SUB")),
+            booking_id=(it.get("booking_id") or it.get("bookingId")),
+            temple=(it.get("temple")),
+            queue_number=(it.get("queue_number") or it.get("queueNumber")),
+            time_slot=(it.get("time_slot") or it.get("timeSlot")),
+            enabled=bool(it.get("enabled", True)),
+            subscription=dict(it.get("subscription") or {}),
+            created_at=str(it.get("created_at") or it.get("createdAt") or _now_iso()),
+            last_sent_at=(it.get("last_sent_at") or it.get("lastSentAt")),
+        )
+
+    def _reset_indexes(self) -> None:
+        self._by_endpoint = {}
+        self._by_booking = {}
+        self._by_temple = {}
+
+    def _add_to_indexes(self, sub: WebPushSubscription) -> None:
+        endpoint = (sub.endpoint or "").strip()
+        if endpoint:
+            self._by_endpoint[endpoint] = sub.id
+        if sub.booking_id:
+            self._by_booking.setdefault(str(sub.booking_id), set()).add(sub.id)
+        if sub.temple:
+            self._by_temple.setdefault(str(sub.temple), set()).add(sub.id)
+
+    def _remove_from_indexes(self, sub: WebPushSubscription) -> None:
+        endpoint = (sub.endpoint or "").strip()
+        if endpoint and self._by_endpoint.get(endpoint) == sub.id:
+            del self._by_endpoint[endpoint]
+        for index, key in ((self._by_booking, sub.booking_id), (self._by_temple, sub.temple)):
+            ids = index.get(str(key)) if key else None
+            if ids is not None:
+                ids.discard(sub.id)
+                if not ids:
+                    del index[str(key)]
+
+    def _lookup(self, index: Dict[str, Set[str]], key: Optional[str]) -> List[WebPushSubscription]:
+        with self._reading():
+            ids = index.get(str(key)) if key else None
+            return [self._records[i] for i in ids] if ids else []
+
+    def get_by_endpoint(self, endpoint: str) -> Optional[WebPushSubscription]:
+        with self._reading():
+            sub_id = self._by_endpoint.get(str(endpoint or "").strip())
+            return self._records.get(sub_id) if sub_id else None
+
+    def find_by_booking(self, booking_id: str) -> List[WebPushSubscription]:
+        return self._lookup(self._by_booking, booking_id)
+
+    def find_by_temple(self, temple: str) -> List[WebPushSubscription]:
+        return self._lookup(self._by_temple, temple)
 
     def upsert(
         self,
@@ -76,94 +185,65 @@ class WebPushStore:
         time_slot: Optional[str] = None,
         enabled: bool = True,
     ) -> WebPushSubscription:
-        endpoint = str((subscription or {}).get("endpoint") or "").strip()
+        endpoint = _endpoint_of(subscription)
         if not endpoint:
             raise ValueError("subscription.endpoint is required")
 
-        with self._lock:
-            subs = self.load_all()
-            existing = next((s for s in subs if str(s.subscription.get("endpoint") or "") == endpoint), None)
+        with self._writing():
+            existing = self.get_by_endpoint(endpoint)
             if existing:
-                updated = WebPushSubscription(
-                    id=existing.id,
-                    booking_id=str(booking_id) if booking_id else existing.booking_id,
-                    temple=str(temple) if temple else existing.temple,
-                    queue_number=int(queue_number) if queue_number is not None else existing.queue_number,
-                    time_slot=str(time_slot) if time_slot else existing.time_slot,
+                return self._commit_put(
+                    WebPushSubscription(
+                        id=existing.id,
+                        booking_id=str(booking_id) if booking_id else existing.booking_id,
+                        temple=str(temple) if temple else existing.temple,
+                        queue_number=int(queue_number) if queue_number is not None else existing.queue_number,
+                        time_slot=str(time_slot) if time_slot else existing.time_slot,
+                        enabled=bool(enabled),
+                        subscription=subscription,
+                        created_at=existing.created_at,
+                        last_sent_at=existing.last_sent_at,
+                    )
+                )
+
+            return self._commit_put(
+                WebPushSubscription(
+                    id=new_id("SUB"),
+                    booking_id=str(booking_id) if booking_id else None,
+                    temple=str(temple) if temple else None,
+                    queue_number=int(queue_number) if queue_number is not None else None,
+                    time_slot=str(time_slot) if time_slot else None,
                     enabled=bool(enabled),
                     subscription=subscription,
-                    created_at=existing.created_at,
-                    last_sent_at=existing.last_sent_at,
+                    created_at=_now_iso(),
+                    last_sent_at=None,
                 )
-                subs = [updated if s.id == existing.id else s for s in subs]
-                self.save_all(subs)
-                return updated
-
-            created = WebPushSubscription(
-                id=str(uuid4()),
-                booking_id=str(booking_id) if booking_id else None,
-                temple=str(temple) if temple else None,
-                queue_number=int(queue_number) if queue_number is not None else None,
-                time_slot=str(time_slot) if time_slot else None,
-                enabled=bool(enabled),
-                subscription=subscription,
-                created_at=_now_iso(),
-                last_sent_at=None,
             )
-            subs.append(created)
-            self.save_all(subs)
-            return created
 
     def disable_by_endpoint(self, endpoint: str) -> bool:
-        endpoint = str(endpoint or "").strip()
-        if not endpoint:
-            return False
-
-        with self._lock:
-            subs = self.load_all()
-            changed = False
-            new_list: List[WebPushSubscription] = []
-            for s in subs:
-                if str(s.subscription.get("endpoint") or "") == endpoint and s.enabled:
-                    changed = True
-                    new_list.append(
-                        WebPushSubscription(
-                            id=s.id,
-                            booking_id=s.booking_id,
-                            temple=s.temple,
-                            queue_number=s.queue_number,
-                            time_slot=s.time_slot,
-                            enabled=False,
-                            subscription=s.subscription,
-                            created_at=s.created_at,
-                            last_sent_at=s.last_sent_at,
-                        )
-                    )
-                else:
-                    new_list.append(s)
-            if changed:
-                self.save_all(new_list)
-            return changed
+        with self._writing():
+            existing = self.get_by_endpoint(endpoint)
+            if not existing or not existing.enabled:
+                return False
+            return self._patch_many([existing.id], {"enabled": False}) > 0
 
     def mark_sent(self, subscription_id: str) -> None:
-        with self._lock:
-            subs = self.load_all()
-            new_list: List[WebPushSubscription] = []
-            for s in subs:
-                if s.id == subscription_id:
-                    new_list.append(
-                        WebPushSubscription(
-                            id=s.id,
-                            booking_id=s.booking_id,
-                            temple=s.temple,
-                            queue_number=s.queue_number,
-                            time_slot=s.time_slot,
-                            enabled=s.enabled,
-                            subscription=s.subscription,
-                            created_at=s.created_at,
-                            last_sent_at=_now_iso(),
-                        )
-                    )
-                else:
-                    new_list.append(s)
-            self.save_all(new_list)
+        self.mark_sent_many([subscription_id])
+
+    def mark_sent_many(self, subscription_ids: Iterable[str], ts: Optional[str] = None) -> int:
+        """Stamp ``last_sent_at`` on many subscriptions in a single log write."""
+        return self._patch_many(subscription_ids, {"last_sent_at": ts or _now_iso()})
+
+    def set_enabled_many(self, subscription_ids: Iterable[str], enabled: bool) -> int:
+        return self._patch_many(subscription_ids, {"enabled": bool(enabled)})
+
+    def record_outcomes(self, sent_ids: Iterable[str], gone_ids: Iterable[str], ts: Optional[str] = None) -> None:
+        """Commit a dispatch round: stamp delivered ids and disable gone endpoints.
+
+        Subscriptions the push service reported as gone (404/410) are disabled so
+        later broadcasts skip them; re-subscribing from the browser re-enables.
+        """
+        changes: Dict[str, Dict[str, Any]] = {sub_id: {"last_sent_at": ts or _now_iso()} for sub_id in sent_ids}
+        for sub_id in gone_ids:
+            changes.setdefault(sub_id, {})["enabled"] = False
+        self._patch_each(changes)
@@ -0,0 +1,94 @@
+"""Booking commit latency and throughput: one fsync per booking vs. group commit.
+
+    cd backend && python -m benchmarks.group_commit [clients] [bookings per client]
+
+Each client thread submits a booking to a ``GroupCommitWriter`` over a
+``BookingStore`` with fsync on and waits for it, the way concurrent POSTs
+do. "direct" is the baseline: every client calls ``add_many`` itself, so
+each booking gets its own log write and fsync under the store lock. The
+group-commit rows share one write + fsync per batch at each window.
+Latency is from submit to acknowledgement. Files go in the system temp dir,
+so the fsync cost is that filesystem's.
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Callable, List, Optional, Tuple
+
+from app.services.booking_store import BookingStore
+from app.services.dispatch_schedule import _local_tz
+from app.services.group_commit import GroupCommitWriter
+
+
+WINDOWS_MS = (0, 1, 2, 5)
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def _run(
+    store: BookingStore, commit: Callable, clients: int, per_client: int
+) -> Tuple[List[float], float]:
+    day = datetime.now(_local_tz()).date().isoformat()
+    latencies: List[List[float]] = [[] for _ in range(clients)]
+    start_line = threading.Barrier(clients + 1)
+
+    def client(n: int) -> None:
+        start_line.wait()
+        for i in range(per_client):
+            booking = store.new_booking(
+                temple="somnath", date=day, time_slot="06:00 AM - 08:00 AM", darshan_type="general",
+                people=1, queue_number=n * per_client + i + 1, name="Pilgrim", phone="9876543210",
+                user_id=f"user-{n}",
+            )
+            started = time.perf_counter()
+            commit(booking)
+            latencies[n].append(time.perf_counter() - started)
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+    for t in threads:
+        t.start()
+    start_line.wait()
+    started = time.perf_counter()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    return [x for per in latencies for x in per], elapsed
+
+
+def _report(name: str, latencies: List[float], elapsed: float, writer: Optional[GroupCommitWriter]) -> None:
+    batch = f"  avg batch {writer.metrics()['averageBatch']:6.1f}" if writer else ""
+    print(
+        f"{name:12} p50 {_percentile(latencies, 50) * 1000:7.2f} ms  p99 {_percentile(latencies, 99) * 1000:7.2f} ms"
+        f"  {len(latencies) / elapsed:8.0f} commits/s{batch}"
+    )
+
+
+def main() -> None:
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    per_client = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    print(f"clients={clients} bookings_per_client={per_client} fsync=on")
+    with tempfile.TemporaryDirectory() as tmp:
+        store = BookingStore(os.path.join(tmp, "direct.json"), shared=False, fsync=True,
+                             compact_every=10**9)
+        latencies, elapsed = _run(store, lambda b: store.add_many([b]), clients, per_client)
+        _report("direct", latencies, elapsed, None)
+
+        for window_ms in WINDOWS_MS:
+            store = BookingStore(os.path.join(tmp, f"group-{window_ms}.json"), shared=False, fsync=True,
+                                 compact_every=10**9)
+            writer = GroupCommitWriter(store.add_many, window_seconds=window_ms / 1000.0)
+            try:
+                latencies, elapsed = _run(store, lambda b: writer.submit(b).result(), clients, per_client)
+            finally:
+                writer.close()
+            _report(f"group {window_ms} ms", latencies, elapsed, writer)
+
+
+if __name__ == "__main__":
+    main()
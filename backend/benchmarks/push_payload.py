@@ -0,0 +1,95 @@
+"""CPU cost per web-push message: pywebpush per subscriber vs. shared payloads.
+
+    cd backend && python -m benchmarks.push_payload [subscriptions] [distinct_payloads]
+
+The network is stubbed out, so the numbers are serialization, VAPID signing
+and RFC 8291 encryption only. "baseline" calls ``pywebpush.webpush`` once per
+subscriber, as the scheduler used to; "shared" encodes each distinct payload
+once and calls ``WebPushSender.send_encoded`` per subscriber, which is what
+``PushDispatcher.dispatch`` does.
+"""
+import base64
+import json
+import os
+import sys
+import time
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from py_vapid import Vapid
+from pywebpush import webpush
+
+
+class _Response:
+    status_code = 201
+    text = ""
+    headers: dict = {}
+
+
+class _Session:
+    def post(self, *args, **kwargs):
+        return _Response()
+
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _subscriptions(count: int):
+    subs = []
+    for i in range(count):
+        public = ec.generate_private_key(ec.SECP256R1()).public_key().public_bytes(
+            serialization.Encoding.X962, serialization.PublicFormat.UncompressedPoint
+        )
+        subs.append({
+            "endpoint": f"https://fcm.googleapis.com/fcm/send/bench-{i}",
+            "keys": {"p256dh": _b64(public), "auth": _b64(os.urandom(16))},
+        })
+    return subs
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    distinct = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    vapid = Vapid()
+    vapid.generate_keys()
+    pem = vapid.private_pem().decode()
+    # The old sender passed the configured key string, which pywebpush parses
+    # on every call; base64 DER is the string form it accepts.
+    der = _b64(vapid.private_key.private_bytes(
+        serialization.Encoding.DER, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    ))
+    os.environ["VAPID_PRIVATE_KEY"] = pem
+    os.environ["VAPID_PUBLIC_KEY"] = "bench"
+
+    from app.services.web_push_scheduler import _build_payload
+    from app.services.web_push_sender import WebPushSender
+
+    subs = _subscriptions(count)
+    payloads = [_build_payload(f"Temple {i}", i + 1, 45, "06:00 UTC") for i in range(distinct)]
+    session = _Session()
+    claims = {"sub": "mailto:admin@example.com"}
+
+    start = time.process_time()
+    for i, sub in enumerate(subs):
+        webpush(sub, json.dumps(payloads[i % distinct]), vapid_private_key=der,
+                vapid_claims=dict(claims), requests_session=session)
+    baseline = (time.process_time() - start) / count
+
+    sender = WebPushSender()
+    start = time.process_time()
+    encoded = [sender.encode_payload(p) for p in payloads]
+    for i, sub in enumerate(subs):
+        outcome = sender.send_encoded(sub, encoded[i % distinct], session=session)
+        assert outcome.ok, outcome.error
+    shared = (time.process_time() - start) / count
+
+    print(f"subscriptions={count} distinct_payloads={distinct}")
+    print(f"baseline  {baseline * 1e6:8.0f} us/message (pywebpush.webpush per subscriber)")
+    print(f"shared    {shared * 1e6:8.0f} us/message (encode once, send_encoded per subscriber)")
+    print(f"speedup   {baseline / shared:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
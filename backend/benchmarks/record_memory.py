@@ -0,0 +1,133 @@
+"""Resident memory per subscription record: plain dataclasses vs. compact records.
+
+    cd backend && python -m benchmarks.record_memory [records]
+
+Records are built from freshly parsed JSON in the stored schema, the parsed
+dicts are dropped, and tracemalloc reports what the records keep alive.
+"baseline" is the ``@dataclass`` layout the stores used before; "compact"
+is the current ``CompactRecord`` classes. Each compact record is also
+checked to turn back into exactly the dict it was built from.
+"""
+import base64
+import gc
+import json
+import os
+import sys
+import tracemalloc
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from app.services.notifications_store import NotificationSubscription
+from app.services.web_push_store import WebPushSubscription
+
+
+@dataclass
+class BaselineWebPush:
+    id: str
+    booking_id: Optional[str]
+    temple: Optional[str]
+    queue_number: Optional[int]
+    time_slot: Optional[str]
+    enabled: bool
+    subscription: Dict[str, Any]
+    created_at: str
+    last_sent_at: Optional[str]
+
+
+@dataclass
+class BaselineSms:
+    id: str
+    booking_id: str
+    phone_e164: str
+    temple: str
+    queue_number: int
+    time_slot: Optional[str]
+    enabled: bool
+    created_at: str
+    last_sent_at: Optional[str]
+
+
+_TEMPLES = ("Somnath Temple", "Dwarkadhish Temple", "Ambaji Temple")
+_SLOTS = ("06:00 AM - 08:00 AM", "08:00 AM - 10:00 AM", "10:00 AM - 12:00 PM")
+
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _web_push_json(count: int) -> str:
+    start = datetime(2024, 5, 1, tzinfo=timezone.utc)
+    return json.dumps([
+        {
+            "id": f"SUB{i:013d}",
+            "booking_id": f"BKG{i:013d}",
+            "temple": _TEMPLES[i % 3],
+            "queue_number": i + 1,
+            "time_slot": _SLOTS[i % 3],
+            "enabled": True,
+            # FCM-length endpoint and real-size keys.
+            "subscription": {
+                "endpoint": "https://fcm.googleapis.com/fcm/send/" + _b64(os.urandom(105)),
+                "expirationTime": None,
+                "keys": {"p256dh": _b64(b"\x04" + os.urandom(64)), "auth": _b64(os.urandom(16))},
+            },
+            "created_at": (start + timedelta(seconds=i)).isoformat(),
+            "last_sent_at": (start + timedelta(seconds=i, hours=1)).isoformat(),
+        }
+        for i in range(count)
+    ])
+
+
+def _sms_json(count: int) -> str:
+    start = datetime(2024, 5, 1, tzinfo=timezone.utc)
+    return json.dumps([
+        {
+            "id": f"SUB{i:013d}",
+            "booking_id": f"BKG{i:013d}",
+            "phone_e164": f"+9198{i:08d}",
+            "temple": _TEMPLES[i % 3],
+            "queue_number": i + 1,
+            "time_slot": _SLOTS[i % 3],
+            "enabled": True,
+            "created_at": (start + timedelta(seconds=i)).isoformat(),
+            "last_sent_at": None,
+        }
+        for i in range(count)
+    ])
+
+
+def _bytes_per_record(record_type: type, raw: str) -> float:
+    gc.collect()
+    tracemalloc.start()
+    items = json.loads(raw)
+    records: List[Any] = [record_type(**it) for it in items]
+    del items
+    gc.collect()
+    used, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    count = len(records)
+    del records
+    return used / count
+
+
+def _check_lossless(record_type: type, raw: str) -> None:
+    for it in json.loads(raw):
+        assert record_type(**it).to_dict() == it, it["id"]
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    print(f"records={count}")
+    for name, baseline, compact, raw in (
+        ("web push", BaselineWebPush, WebPushSubscription, _web_push_json(count)),
+        ("sms", BaselineSms, NotificationSubscription, _sms_json(count)),
+    ):
+        _check_lossless(compact, raw)
+        before = _bytes_per_record(baseline, raw)
+        after = _bytes_per_record(compact, raw)
+        print(f"{name:9} baseline {before:7.0f} B/record  compact {after:7.0f} B/record  ({after / before:.0%})")
+
+
+if __name__ == "__main__":
+    main()
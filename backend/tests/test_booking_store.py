@@ -0,0 +1,210 @@
+import asyncio
+import errno
+import os
+import threading
+import time
+from datetime import datetime
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app.api.routes import bookings
+from app.services.booking_store import BookingStore
+from app.services.dispatch_schedule import _local_tz
+from app.services.group_commit import GroupCommitWriter
+from app.services.slot_inventory import SlotInventory
+
+
+def _today() -> str:
+    return datetime.now(_local_tz()).date().isoformat()
+
+
+def _store(tmp_path, **kwargs) -> BookingStore:
+    return BookingStore(str(tmp_path / "bookings.json"), shared=False, fsync=False, **kwargs)
+
+
+def _booking(store: BookingStore, number: int = 1):
+    return store.new_booking(
+        temple="somnath", date=_today(), time_slot="06:00 AM - 08:00 AM", darshan_type="general",
+        people=1, queue_number=number, name="Pilgrim", phone="9876543210", user_id="u1",
+    )
+
+
+def _disk_full(*args, **kwargs):
+    raise OSError(errno.ENOSPC, "No space left on device")
+
+
+def test_failed_write_leaves_no_booking_behind(tmp_path, monkeypatch):
+    store = _store(tmp_path)
+    kept = store.create(**{k: getattr(_booking(store), k) for k in (
+        "temple", "date", "time_slot", "darshan_type", "people", "queue_number", "name", "phone", "user_id")})
+    assert [b.id for b in store.find(user_id="u1")[0]] == [kept.id]  # primes the page cache
+
+    monkeypatch.setattr(os, "fsync", _disk_full)
+    store.fsync = True
+    lost = _booking(store, 2)
+    with pytest.raises(OSError):
+        store.add_many([lost])
+
+    assert store.get(lost.id) is None
+    assert [b.id for b in store.find(user_id="u1")[0]] == [kept.id]
+    assert [b.id for b in store.find(temple="somnath", date=_today())[0]] == [kept.id]
+    monkeypatch.undo()
+    assert [b.id for b in _store(tmp_path).load_all()] == [kept.id]
+
+
+def test_failed_cancel_leaves_booking_confirmed(tmp_path, monkeypatch):
+    store = _store(tmp_path)
+    rec = store.add_many([_booking(store)])[0]
+
+    monkeypatch.setattr(os, "fsync", _disk_full)
+    store.fsync = True
+    with pytest.raises(OSError):
+        store.cancel(rec.id)
+
+    assert store.get(rec.id).status == "confirmed"
+    assert store.find(status="cancelled")[0] == []
+    monkeypatch.undo()
+    assert _store(tmp_path).get(rec.id).status == "confirmed"
+
+
+def test_failed_booking_request_is_not_visible_and_frees_its_places(tmp_path, monkeypatch):
+    inventory = SlotInventory(capacity_per_slot=5, darshan_types={"general": 5})
+    store = _store(tmp_path)
+    writer = GroupCommitWriter(store.add_many)
+    app = FastAPI()
+    app.include_router(bookings.router, prefix="/api/v1/bookings")
+    app.state.slot_inventory = inventory
+    app.state.booking_store = store
+    app.state.booking_writer = writer
+    slot = inventory.slots[0]
+    body = {"templeId": "somnath", "date": _today(), "timeSlot": slot, "name": "Pilgrim",
+            "phone": "9876543210", "numberOfPeople": 5, "userId": "u1"}
+
+    async def post():
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post("/api/v1/bookings/", json=body)
+
+    monkeypatch.setattr(os, "fsync", _disk_full)
+    store.fsync = True
+    try:
+        assert asyncio.run(post()).status_code == 500
+        assert store.find(user_id="u1")[0] == []
+        assert inventory.remaining("somnath", _today())[slot] == 5
+        monkeypatch.undo()
+        # The places can be booked again, exactly once.
+        assert asyncio.run(post()).status_code == 200
+        assert asyncio.run(post()).status_code == 409
+    finally:
+        writer.close()
+    assert len(store.find(user_id="u1")[0]) == 1
+
+
+def test_bookings_logged_during_compaction_survive_a_reload(tmp_path, monkeypatch):
+    store = _store(tmp_path)
+    before = store.add_many([_booking(store, n) for n in range(1, 51)])
+    during = []
+    write_snapshot_file = store._log.write_snapshot_file
+
+    def slow_snapshot(records):
+        # Another writer gets the store while the snapshot is being written.
+        during.extend(store.add_many([_booking(store, n) for n in range(51, 61)]))
+        return write_snapshot_file(records)
+
+    monkeypatch.setattr(store._log, "write_snapshot_file", slow_snapshot)
+    assert store.compact()
+
+    ids = sorted(b.id for b in before + during)
+    assert sorted(b.id for b in _store(tmp_path).load_all()) == ids
+    store.add_many([_booking(store, 61)])
+    assert len(_store(tmp_path).load_all()) == len(ids) + 1
+
+
+def test_commits_do_not_wait_for_compaction(tmp_path, monkeypatch):
+    store = _store(tmp_path, compact_every=10)
+    started, release = threading.Event(), threading.Event()
+    write_snapshot_file = store._log.write_snapshot_file
+
+    def blocked_snapshot(records):
+        started.set()
+        release.wait(5)
+        return write_snapshot_file(records)
+
+    monkeypatch.setattr(store._log, "write_snapshot_file", blocked_snapshot)
+    store.add_many([_booking(store, n) for n in range(1, 11)])
+    assert started.wait(5)
+    # The snapshot is stuck, yet bookings still commit and reads still answer.
+    late = store.add_many([_booking(store, 11)])[0]
+    assert store.get(late.id).id == late.id
+    release.set()
+    for _ in range(500):
+        if not store._compacting:
+            break
+        time.sleep(0.01)
+    assert len(_store(tmp_path).load_all()) == 11
+    assert store._log._log_entries == 1
+
+
+def test_store_lock_does_not_stall_other_requests(tmp_path):
+    inventory = SlotInventory(capacity_per_slot=5, darshan_types={"general": 5})
+    store = _store(tmp_path)
+    rec = store.add_many([_booking(store)])[0]
+    app = FastAPI()
+    app.include_router(bookings.router, prefix="/api/v1/bookings")
+    app.state.slot_inventory = inventory
+    app.state.booking_store = store
+    held, release = threading.Event(), threading.Event()
+
+    def hold_store():
+        with store._lock:
+            held.set()
+            release.wait(5)
+
+    async def requests():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            blocked = [
+                asyncio.ensure_future(client.get(f"/api/v1/bookings/{rec.id}")),
+                asyncio.ensure_future(client.get("/api/v1/bookings/", params={"userId": "u1"})),
+                asyncio.ensure_future(client.delete(f"/api/v1/bookings/{rec.id}")),
+            ]
+            await asyncio.sleep(0.1)
+            # Lookups and the cancel wait for the store in the threadpool...
+            assert not any(f.done() for f in blocked)
+            # ...while the event loop keeps serving everything else.
+            slots = await asyncio.wait_for(
+                client.get("/api/v1/bookings/available-slots", params={"date": _today(), "darshanType": "general"}), 1
+            )
+            assert slots.status_code == 200
+            release.set()
+            return [r.status_code for r in await asyncio.gather(*blocked)]
+
+    holder = threading.Thread(target=hold_store)
+    holder.start()
+    assert held.wait(5)
+    try:
+        assert asyncio.run(requests()) == [200, 200, 200]
+    finally:
+        release.set()
+        holder.join()
+    assert store.get(rec.id).status == "cancelled"
+
+
+def test_listing_without_a_filter_is_empty(tmp_path):
+    store = _store(tmp_path)
+    store.add_many([_booking(store)])
+    app = FastAPI()
+    app.include_router(bookings.router, prefix="/api/v1/bookings")
+    app.state.booking_store = store
+
+    async def get():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get("/api/v1/bookings/")
+
+    response = asyncio.run(get())
+    assert response.status_code == 200
+    assert response.json() == []
+    assert store.find(temple="somnath") == ([], None)
@@ -0,0 +1,62 @@
+import sqlite3
+
+from app.services.dispatch_schedule import DispatchPlan, shard_hash, shard_of, shard_range
+from app.services.notifications_store import NotificationStore
+from app.services.sqlite_store import SqliteDatabase, SqliteNotificationStore
+
+
+def test_shard_range_matches_shard_of():
+    for shards in (1, 7, 12):
+        for i in range(2000):
+            key = f"SUB{i}"
+            low, high = shard_range(shard_of(key, shards), shards)
+            assert low <= shard_hash(key) < high
+
+
+def test_next_shard_visits_every_shard_once_per_round_whatever_the_timing():
+    plan = DispatchPlan(3600, shards=12)
+    # Late, early and repeated clock readings must not skip or repeat a shard.
+    times = [1000.0, 1000.1, 1299.9, 1300.0, 5000.0] + [1000.0] * 7
+    assert sorted(plan.next_shard(t) for t in times) == list(range(12))
+
+
+def _fill(store, count):
+    for i in range(count):
+        store.upsert(f"B{i}", "+919876543210", "Temple", i, "06:00 AM - 08:00 AM", True)
+
+
+def _shards(store, shards):
+    return [
+        {s.id for batch in store.iter_enabled(batch_size=7, shard=(i, shards)) for s in batch}
+        for i in range(shards)
+    ]
+
+
+def test_iter_enabled_by_shard_json_and_sqlite(tmp_path):
+    stores = [
+        NotificationStore(str(tmp_path / "subs.json"), shared=False),
+        SqliteNotificationStore(SqliteDatabase(str(tmp_path / "subs.db"))),
+    ]
+    for store in stores:
+        _fill(store, 300)
+        everyone = {s.id for batch in store.iter_enabled() for s in batch}
+        parts = _shards(store, 12)
+        assert set().union(*parts) == everyone
+        assert sum(len(p) for p in parts) == len(everyone)
+        for i, part in enumerate(parts):
+            assert all(shard_of(sub_id, 12) == i for sub_id in part)
+
+
+def test_sqlite_backfills_shard_keys_of_an_older_database(tmp_path):
+    path = str(tmp_path / "subs.db")
+    SqliteNotificationStore(SqliteDatabase(path))
+    _fill(SqliteNotificationStore(SqliteDatabase(path)), 50)
+    conn = sqlite3.connect(path)
+    conn.execute("DROP INDEX ix_notification_subscriptions_shard")
+    conn.execute("ALTER TABLE notification_subscriptions DROP COLUMN shard_key")
+    conn.commit()
+    conn.close()
+
+    store = SqliteNotificationStore(SqliteDatabase(path))
+    parts = _shards(store, 4)
+    assert sum(len(p) for p in parts) == 50
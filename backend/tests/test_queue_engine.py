@@ -0,0 +1,196 @@
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+import httpx
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.routes import live
+from app.services.booking_store import BookingStore
+from app.services.dispatch_schedule import _local_tz
+from app.services.queue_engine import QueueEngine
+from app.services.slot_inventory import SlotInventory
+from app.services.temple_snapshots import TempleSnapshotCache
+
+
+def _engine(tmp_path, inventory=None, **kwargs):
+    return QueueEngine(
+        event_log=str(tmp_path / "queue_events.jsonl"),
+        shared=False,
+        issued=inventory.issued if inventory is not None else None,
+        **kwargs,
+    )
+
+
+def _today() -> str:
+    return datetime.now(_local_tz()).date().isoformat()
+
+
+def test_polls_for_unknown_temples_store_nothing(tmp_path):
+    inventory = SlotInventory(capacity_per_slot=10)
+    engine = _engine(tmp_path, inventory)
+    app = FastAPI()
+    app.include_router(live.router, prefix="/api/v1/live")
+    app.state.queue_engine = engine
+    client = TestClient(app)
+
+    for i in range(200):
+        resp = client.post("/api/v1/live/queue/status", json={
+            "bookingId": f"BKG-poll-{i}",
+            "temple": f"temple-{random.random()}",
+            "queueNumber": 10 ** 9,
+        })
+        assert resp.status_code == 200
+
+    assert engine._temples == {}
+    assert not [name for name in os.listdir(tmp_path) if name.startswith("queue_events")]
+
+
+def test_queue_numbers_are_clamped_to_what_was_issued(tmp_path):
+    inventory = SlotInventory(capacity_per_slot=100)
+    for _ in range(5):
+        inventory.reserve("somnath", _today(), inventory.slots[0], 2)
+    engine = _engine(tmp_path, inventory)
+
+    assert engine.stats("somnath")["issued"] == 10
+    huge = engine.estimate("somnath", 10 ** 9)
+    assert huge.position <= 10
+    # Someone else's estimate is unaffected by that request.
+    assert engine.estimate("somnath", 3).position <= 3
+
+
+def test_state_resets_when_the_day_rolls_over(tmp_path):
+    engine = _engine(tmp_path)
+    now = time.time()
+    engine.record_entry("somnath", 40, at=now)
+    assert engine.stats("somnath")["admitted"] == 40
+
+    tomorrow = now + 86400
+    estimate = engine.estimate("somnath", 5, now=tomorrow)
+    assert estimate.admitted < 40
+    assert engine._temples == {}
+    # Restarting today replays only today's file.
+    assert _engine(tmp_path).stats("somnath")["admitted"] == 40
+
+
+def test_old_event_files_are_deleted(tmp_path):
+    old = (date.fromisoformat(_today()) - timedelta(days=30)).isoformat()
+    recent = (date.fromisoformat(_today()) - timedelta(days=1)).isoformat()
+    for day in (old, recent):
+        (tmp_path / f"queue_events.{day}.jsonl").write_text("")
+
+    _engine(tmp_path, retention_days=7)
+
+    names = os.listdir(tmp_path)
+    assert f"queue_events.{old}.jsonl" not in names
+    assert f"queue_events.{recent}.jsonl" in names
+
+
+def test_replay_runs_a_recorded_file_on_its_own_day(tmp_path):
+    noon = datetime.combine(date.fromisoformat(_today()) - timedelta(days=5), datetime.min.time(), tzinfo=_local_tz())
+    start = noon.timestamp() + 12 * 3600
+    recording = tmp_path / "recorded.jsonl"
+    lines = [json.dumps({"type": "entry", "temple": "somnath", "count": 1, "at": start + i * 5}) for i in range(100)]
+    lines.append(json.dumps({"type": "entry", "temple": "somnath", "count": 1, "at": start + 86400}))
+    lines.append("not json")
+    recording.write_text("\n".join(lines) + "\n")
+    engine = _engine(tmp_path)
+
+    assert engine.replay(str(recording)) == 100
+    last = start + 99 * 5
+    assert engine.stats("somnath", now=last)["admitted"] == 100
+    assert engine.stats("somnath", now=last)["ratePerMinute"] > 0
+    assert engine.estimate("somnath", 150, now=last).position == 50
+    # Nothing of the recording leaks into today.
+    assert engine.stats("somnath")["admitted"] == 0
+
+
+def test_queue_status_lookups_do_not_stall_the_event_loop(tmp_path):
+    inventory = SlotInventory(capacity_per_slot=10)
+    engine = _engine(tmp_path, inventory)
+    store = BookingStore(str(tmp_path / "bookings.json"), shared=False, fsync=False)
+    rec = store.create(temple="somnath", date=_today(), time_slot=inventory.slots[0], darshan_type="general",
+                       people=1, queue_number=1, name="Pilgrim", phone="9876543210")
+    app = FastAPI()
+    app.include_router(live.router, prefix="/api/v1/live")
+    app.state.queue_engine = engine
+    app.state.booking_store = store
+    channel = live.create_live_channel(engine, TempleSnapshotCache(), store)
+    held, release = threading.Event(), threading.Event()
+
+    def hold_store():
+        with store._lock:
+            held.set()
+            release.wait(5)
+
+    async def run():
+        sub = await channel.subscribe("somnath")
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            holder.start()
+            assert held.wait(5)
+            pending = [
+                asyncio.ensure_future(client.post("/api/v1/live/queue/status", json={
+                    "bookingId": rec.id, "temple": "somnath", "queueNumber": 1})),
+                asyncio.ensure_future(channel.watch_booking(sub, "somnath", f"{rec.id}-ws", 1)),
+            ]
+            # Both lookups wait for the store in the threadpool; the loop runs on.
+            started = time.monotonic()
+            await asyncio.sleep(0.05)
+            assert time.monotonic() - started < 1
+            assert await asyncio.wait_for(channel.tick(), 1) >= 0
+            assert not any(f.done() for f in pending)
+            release.set()
+            results = await asyncio.gather(*pending)
+        channel.unsubscribe(sub)
+        return results[0].status_code
+
+    holder = threading.Thread(target=hold_store)
+    try:
+        assert asyncio.run(run()) == 200
+    finally:
+        release.set()
+        holder.join()
+
+
+def test_entry_times_outside_today_are_rejected(tmp_path):
+    engine = _engine(tmp_path)
+    app = FastAPI()
+    app.include_router(live.router, prefix="/api/v1/live")
+    app.state.queue_engine = engine
+    client = TestClient(app)
+    url = "/api/v1/live/temple/somnath/entries"
+    now = time.time()
+
+    for at in (1e13, -1e13, now + 3 * 86400, now - 3 * 86400):
+        assert client.post(url, json={"count": 3, "at": at}).status_code == 400
+    assert engine.stats("somnath")["admitted"] == 0
+    assert [n for n in os.listdir(tmp_path) if n.startswith("queue_events")] == []
+
+    # A gate clock slightly ahead still counts, as now.
+    resp = client.post(url, json={"count": 3, "at": now + 30})
+    assert resp.status_code == 200
+    assert resp.json()["admitted"] == 3
+    assert resp.json()["lastEntryAt"] <= time.time()
+
+
+def test_without_entries_progress_starts_at_the_slot_or_first_poll(tmp_path):
+    engine = _engine(tmp_path, default_rate_per_minute=12, opens_at="06:00")
+    midnight = datetime.combine(date.fromisoformat(_today()), datetime.min.time(), tzinfo=_local_tz()).timestamp()
+    noon = midnight + 12 * 3600
+
+    # Nothing to anchor on: no progress is invented, however late it is.
+    assert engine.estimate("somnath", 500, now=noon).position == 500
+    # First asked ten minutes ago: 10 min x 12/min.
+    assert engine.estimate("somnath", 500, now=noon, since=noon - 600).position == 380
+    # The slot started at 11:30; the slot wins over when they asked.
+    assert engine.estimate("somnath", 500, now=noon, time_slot="11:30 AM - 01:30 PM", since=noon).position == 140
+    # A slot that hasn't started yet has not moved.
+    assert engine.estimate("somnath", 500, now=noon, time_slot="02:00 PM - 04:00 PM").position == 500
+    # Never before opening time.
+    assert engine.estimate("somnath", 500, now=midnight + 6 * 3600 + 60, since=midnight).position == 488
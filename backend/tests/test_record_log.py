@@ -0,0 +1,52 @@
+from app.services import record_log
+from app.services.record_log import RecordLog
+
+
+def _put(i):
+    return {"op": "put", "record": {"id": str(i)}}
+
+
+def test_refresh_reloads_after_compaction_seen_half_way(tmp_path):
+    path = str(tmp_path / "records.json")
+    writer, reader = RecordLog(path), RecordLog(path)
+    writer.append([_put(i) for i in range(50)])
+
+    # The reader catches the compaction between the snapshot replace and the
+    # log reset: new snapshot, old log position.
+    reader.read_log()
+    writer.write_snapshot([{"id": str(i)} for i in range(50)])
+    reader.read_snapshot()
+
+    # The fresh log grows past the reader's old offset.
+    writer.append([_put(i) for i in range(50, 200)])
+
+    assert reader.refresh() is None
+
+
+def test_refresh_returns_only_new_entries(tmp_path):
+    path = str(tmp_path / "records.json")
+    writer, reader = RecordLog(path), RecordLog(path)
+    writer.write_snapshot([])
+    reader.read_snapshot()
+    reader.read_log()
+    writer.append([_put(1), _put(2)])
+
+    assert [op["record"]["id"] for op in reader.refresh()] == ["1", "2"]
+    assert reader.refresh() == []
+
+
+def test_renames_and_new_log_files_are_made_durable(tmp_path, monkeypatch):
+    synced = []
+    monkeypatch.setattr(record_log, "_fsync_dir", synced.append)
+    log = RecordLog(str(tmp_path / "records.json"))
+
+    log.append([_put(1)], fsync=True)
+    assert synced == [log.log_path]  # the log file was just created
+    log.append([_put(2)], fsync=True)
+    assert synced == [log.log_path]
+
+    synced.clear()
+    log.write_snapshot([{"id": "1"}, {"id": "2"}])
+    assert synced == [log.path, log.log_path]
+    log.append([_put(3)], fsync=True)
+    assert synced == [log.path, log.log_path]
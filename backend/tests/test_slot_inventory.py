@@ -0,0 +1,109 @@
+import asyncio
+import random
+import threading
+from datetime import datetime
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app.api.routes import bookings
+from app.services.booking_store import BookingStore, restore_inventory
+from app.services.dispatch_schedule import _local_tz
+from app.services.group_commit import GroupCommitWriter
+from app.services.slot_inventory import SlotFullError, SlotInventory
+
+
+def _today() -> str:
+    return datetime.now(_local_tz()).date().isoformat()
+
+
+def _assert_numbers_disjoint(reservations):
+    """Each reservation owns [queue_number, queue_number + people)."""
+    taken = set()
+    for number, people in reservations:
+        block = set(range(number, number + people))
+        assert not taken & block
+        taken |= block
+
+
+def test_threaded_reserve_never_oversells():
+    capacity = 5000
+    inventory = SlotInventory(capacity_per_slot=capacity, darshan_types={"general": capacity})
+    slot = inventory.slots[0]
+    day = _today()
+    start = threading.Barrier(16)
+    results = [[] for _ in range(16)]
+
+    def worker(out):
+        rng = random.Random()
+        start.wait()
+        while True:
+            people = rng.randint(1, 4)
+            try:
+                reservation = inventory.reserve("somnath", day, slot, people)
+            except SlotFullError as e:
+                if e.remaining == 0:
+                    return
+                continue
+            out.append((reservation.queue_number, people))
+
+    threads = [threading.Thread(target=worker, args=(out,)) for out in results]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    reservations = [r for out in results for r in out]
+    assert sum(people for _, people in reservations) == capacity
+    assert inventory.remaining("somnath", day)[slot] == 0
+    _assert_numbers_disjoint(reservations)
+
+
+def test_concurrent_booking_requests_never_oversell(tmp_path):
+    capacity = 300
+    inventory = SlotInventory(capacity_per_slot=capacity, darshan_types={"general": capacity})
+    store = BookingStore(str(tmp_path / "bookings.json"), shared=False, fsync=False)
+    writer = GroupCommitWriter(store.add_many, window_seconds=0.002)
+    app = FastAPI()
+    app.include_router(bookings.router, prefix="/api/v1/bookings")
+    app.state.slot_inventory = inventory
+    app.state.booking_store = store
+    app.state.booking_writer = writer
+
+    async def storm():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            rng = random.Random(7)
+            requests = [
+                client.post("/api/v1/bookings/", json={
+                    "templeId": "somnath",
+                    "date": _today(),
+                    "timeSlot": inventory.slots[0],
+                    "name": f"Pilgrim {i}",
+                    "phone": "9876543210",
+                    "numberOfPeople": rng.randint(1, 3),
+                })
+                for i in range(600)
+            ]
+            return await asyncio.gather(*requests)
+
+    try:
+        responses = asyncio.run(storm())
+    finally:
+        writer.close()
+
+    assert {r.status_code for r in responses} <= {200, 409}
+    booked = [r.json() for r in responses if r.status_code == 200]
+    assert sum(b["numberOfPeople"] for b in booked) <= capacity
+    assert sum(b["numberOfPeople"] for b in booked) + inventory.remaining("somnath", _today())[inventory.slots[0]] == capacity
+    _assert_numbers_disjoint([(b["queueNumber"], b["numberOfPeople"]) for b in booked])
+    assert len({b["id"] for b in booked}) == len(booked)
+    stored, _ = store.find(temple="somnath", date=_today(), limit=100)
+    assert len(stored) == min(100, len(booked))
+
+
+def test_start_up_refuses_a_booking_store_shared_between_workers(tmp_path):
+    store = BookingStore(str(tmp_path / "bookings.json"), shared=True, fsync=False)
+    with pytest.raises(RuntimeError):
+        restore_inventory(store, SlotInventory(capacity_per_slot=10))